@@ -0,0 +1 @@
+from .audit_event import AuditEvent  # noqa
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.database import Base
+from sqlalchemy import JSON, BigInteger, DateTime, Index, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class AuditEvent(Base):
+    """
+    Security audit trail of authentication and user management events.
+
+    ``actor_id`` and ``subject_id`` are plain integers rather than foreign keys
+    so that events outlive the users they mention.
+    """
+
+    __tablename__ = "audit_events"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True
+    )
+    # Set when the event happens, not when the batch is written
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    event_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    actor_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), nullable=True
+    )
+    subject_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), nullable=True
+    )
+    username: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    ip_address: Mapped[Optional[str]] = mapped_column(String(45), nullable=True)
+    details: Mapped[Optional[Dict[str, Any]]] = mapped_column(
+        JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"),
+        nullable=True,
+    )
+
+    __table_args__ = (
+        Index("ix_audit_events_event_type_created_at", event_type, created_at),
+        Index("ix_audit_events_subject_id", subject_id),
+    )
@@ -0,0 +1,277 @@
+"""
+Audit service module for recording security events.
+
+Events are appended to an in-memory buffer and written by a background worker
+in bulk: ``COPY`` on Postgres (psycopg2), an executemany insert elsewhere. A
+batch is written when ``AUDIT_FLUSH_BATCH_SIZE`` events are waiting or every
+``AUDIT_FLUSH_INTERVAL_SECONDS``, so recording an event never waits on the
+database. When the buffer is full, producers wait up to
+``AUDIT_BACKPRESSURE_TIMEOUT`` for the writer to make room: the endpoints that
+record events await ``wait_for_audit_room`` before calling their service, and
+callers on a worker thread wait in ``record`` itself. Only an event that still
+finds the buffer full after that wait is dropped (and counted).
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.audit.models.audit_event import AuditEvent
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.core.database import bulk_engine
+from app.core.metrics import Counter, Gauge
+from fastapi import Request
+from sqlalchemy import Connection, Engine, insert
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+audit_events_written_total = Counter(
+    "audit_events_written_total", "Audit events written to the database"
+)
+audit_events_dropped_total = Counter(
+    "audit_events_dropped_total", "Audit events dropped because the buffer was full"
+)
+audit_buffer_size = Gauge("audit_buffer_size", "Audit events waiting to be written")
+
+COLUMNS = (
+    "created_at",
+    "event_type",
+    "actor_id",
+    "subject_id",
+    "username",
+    "ip_address",
+    "details",
+)
+
+
+class AuditEventType:
+    """Event types written to ``audit_events.event_type``."""
+
+    LOGIN = "login"
+    LOGIN_FAILED = "login_failed"
+    REGISTER = "register"
+    USER_CREATED = "user_created"
+    USER_UPDATED = "user_updated"
+    USER_DELETED = "user_deleted"
+    USERS_BULK_UPDATED = "users_bulk_updated"
+
+
+def client_ip(request: Optional[Request]) -> Optional[str]:
+    """Address of the client that sent the request, if known."""
+    if request is None or request.client is None:
+        return None
+    return request.client.host
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _resolve(room: "asyncio.Future[None]") -> None:
+    if not room.done():
+        room.set_result(None)
+
+
+def _csv_value(value: Any) -> Any:
+    # An empty unquoted field is NULL in COPY's csv format
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+class AuditWriter(BackgroundWorker):
+    """
+    Buffer audit events in memory and insert them in batches.
+    """
+
+    name = "audit-writer"
+
+    def __init__(
+        self,
+        db_engine: Engine,
+        interval: float,
+        batch_size: int,
+        buffer_size: int,
+        backpressure_timeout: float,
+    ) -> None:
+        super().__init__(interval)
+        self.engine = db_engine
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.backpressure_timeout = backpressure_timeout
+        self._buffer: List[Dict[str, Any]] = []
+        self._space = threading.Condition()
+        # Coroutines waiting for room, resolved on their loop by the writer
+        self._room_waiters: List[
+            Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]
+        ] = []
+
+    async def wait_for_room(self) -> bool:
+        """
+        Wait, without blocking the loop, until the buffer has room for an event.
+
+        Returns:
+            bool: False if the buffer was still full after ``backpressure_timeout``
+        """
+        loop = asyncio.get_running_loop()
+        room: "asyncio.Future[None]" = loop.create_future()
+        with self._space:
+            if len(self._buffer) < self.buffer_size:
+                return True
+            self._room_waiters.append((loop, room))
+        self.wake()
+        try:
+            await asyncio.wait_for(room, self.backpressure_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._space:
+                if (loop, room) in self._room_waiters:
+                    self._room_waiters.remove((loop, room))
+
+    def _notify_room(self) -> None:
+        # Called with self._space held
+        self._space.notify_all()
+        waiters, self._room_waiters = self._room_waiters, []
+        for loop, room in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, room)
+            except RuntimeError:
+                # The loop of the waiter is closed
+                pass
+
+    def record(
+        self,
+        event_type: str,
+        actor_id: Optional[int] = None,
+        subject_id: Optional[int] = None,
+        username: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Queue an audit event.
+
+        From a worker thread a full buffer makes this wait up to
+        ``backpressure_timeout`` for room. On the event loop it cannot wait
+        without stalling the worker: async callers await ``wait_for_room``
+        first, and an event that still finds the buffer full is dropped.
+
+        Returns:
+            bool: False if the buffer stayed full and the event was dropped
+        """
+        event = {
+            "created_at": datetime.now(timezone.utc),
+            "event_type": event_type,
+            "actor_id": actor_id,
+            "subject_id": subject_id,
+            "username": username,
+            "ip_address": ip_address,
+            "details": details,
+        }
+        with self._space:
+            if len(self._buffer) >= self.buffer_size:
+                self.wake()
+                if self.backpressure_timeout and not _on_event_loop():
+                    self._space.wait_for(
+                        lambda: len(self._buffer) < self.buffer_size,
+                        self.backpressure_timeout,
+                    )
+                if len(self._buffer) >= self.buffer_size:
+                    audit_events_dropped_total.inc()
+                    logger.warning(f"Audit buffer full, dropped {event_type} event")
+                    return False
+            self._buffer.append(event)
+            pending = len(self._buffer)
+        audit_buffer_size.set(pending)
+        if pending >= self.batch_size:
+            self.wake()
+        return True
+
+    def run_once(self) -> None:
+        with self._space:
+            events, self._buffer = self._buffer, []
+            self._notify_room()
+        audit_buffer_size.set(0)
+
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start : start + self.batch_size]  # noqa: E203
+            try:
+                self.write(batch)
+            except Exception:
+                self._requeue(events[start:])
+                raise
+            audit_events_written_total.inc(len(batch))
+
+    def _requeue(self, events: List[Dict[str, Any]]) -> None:
+        """Put unwritten events back in front, dropping what no longer fits."""
+        with self._space:
+            room = max(self.buffer_size - len(self._buffer), 0)
+            self._buffer[:0] = events[:room]
+            pending = len(self._buffer)
+        if len(events) > room:
+            audit_events_dropped_total.inc(len(events) - room)
+        audit_buffer_size.set(pending)
+
+    def write(self, events: List[Dict[str, Any]]) -> None:
+        """Insert one batch of events in a single transaction."""
+        with self.engine.begin() as connection:
+            if connection.dialect.driver == "psycopg2":
+                self._copy(connection, events)
+            else:
+                connection.execute(insert(AuditEvent.__table__), events)
+        logger.debug(f"Wrote {len(events)} audit events")
+
+    @staticmethod
+    def _copy(connection: Connection, events: List[Dict[str, Any]]) -> None:
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for event in events:
+            writer.writerow([_csv_value(event[name]) for name in COLUMNS])
+        data.seek(0)
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {AuditEvent.__tablename__} ({', '.join(COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                data,
+            )
+        finally:
+            cursor.close()
+
+
+# Module-level writer shared by the services and the lifespan of the application
+audit_writer = AuditWriter(
+    bulk_engine,
+    interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.AUDIT_FLUSH_BATCH_SIZE,
+    buffer_size=settings.AUDIT_BUFFER_SIZE,
+    backpressure_timeout=settings.AUDIT_BACKPRESSURE_TIMEOUT,
+)
+
+
+async def wait_for_audit_room() -> None:
+    """
+    Dependency of the endpoints that record audit events.
+
+    Waits for room in a full audit buffer before the endpoint runs, so that
+    requests slow down instead of losing their events.
+    """
+    await audit_writer.wait_for_room()
@@ -2,8 +2,9 @@ import logging
 
 import jwt
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_auth_db
 from app.user.models.user import User
+from app.user.services.activity_service import activity_buffer
 from app.user.services.user_service import UserService
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -15,8 +16,8 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Module-level variable for Depends(get_db)
-db_dependency = Depends(get_db)
+# Module-level variable for Depends(get_auth_db)
+db_dependency = Depends(get_auth_db)
 
 token_dependency = Depends(oauth2_scheme)
 
@@ -54,14 +55,26 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # Get user from database
+        # Get user from database, then give the auth pool connection back right
+        # away; the user is fully loaded and the endpoint uses its own session
         user = UserService.get_user_by_username(db, username)
+        db.close()
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User account not found or has been deleted",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        # Checked on every request, not only at login, so that deactivating a
+        # user also revokes the tokens they already hold
+        if not user.is_active:
+            logger.warning(f"Request with the token of inactive user: {user.username}")
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user"
+            )
+
+        # Buffered, written in the background
+        activity_buffer.record_seen(user.id)
         return user
 
     except jwt.ExpiredSignatureError:
@@ -87,3 +100,20 @@ async def get_current_user(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred",
         )
+
+
+# Module-level variable for Depends(get_current_user)
+current_user_dependency = Depends(get_current_user)
+
+
+async def get_current_superuser(current_user: User = current_user_dependency) -> User:
+    """
+    Get the current user and require superuser privileges.
+    """
+    if not current_user.is_superuser:
+        logger.warning(f"Superuser access denied for user: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Superuser privileges required",
+        )
+    return current_user
@@ -1,35 +1,62 @@
+from typing import Optional
+
+from app.audit.services.audit_service import wait_for_audit_room
 from app.auth.schemas.auth import AuthResponse
 from app.auth.services.auth_service import AuthService
-from app.core.database import get_db
+from app.core.database import get_auth_db
+from app.core.idempotency import run_idempotent
+from app.core.routing import SessionReleasingRoute
 from app.user.schemas.user import UserCreate
-from fastapi import APIRouter, Depends, Request, status
+from fastapi import APIRouter, Depends, Header, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.orm import Session
 
 # Create router with auth prefix and consistent tags
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=SessionReleasingRoute)
 
-# Module-level variable for Depends(get_db)
-db_dependency = Depends(get_db)
+# Module-level variable for Depends(get_auth_db); login and registration use
+# the auth pool so that heavy queries elsewhere cannot hold them up
+db_dependency = Depends(get_auth_db)
 
 # Module-level variable for Depends(OAuth2PasswordRequestForm)
 form_dependency = Depends(OAuth2PasswordRequestForm)
 
+# Module-level variable for Depends(wait_for_audit_room): both endpoints record
+# audit events and wait for room in the audit buffer before running
+audit_backpressure = Depends(wait_for_audit_room)
+
+# Module-level variable for the optional Idempotency-Key header
+idempotency_key_header = Header(None, alias="Idempotency-Key", max_length=255)
+
 
 @router.post(
-    "/register", response_model=AuthResponse, status_code=status.HTTP_201_CREATED
+    "/register",
+    response_model=AuthResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[audit_backpressure],
 )
 async def register(
-    user: UserCreate, request: Request, db: Session = db_dependency
+    user: UserCreate,
+    request: Request,
+    db: Session = db_dependency,
+    idempotency_key: Optional[str] = idempotency_key_header,
 ) -> AuthResponse:
-    return AuthService.register_user(db=db, user_data=user, request=request)
+    # Retries with the same Idempotency-Key get the first response back
+    # without hashing the password or touching the database again
+    return await run_idempotent(
+        request,
+        idempotency_key,
+        payload=user,
+        handler=lambda: AuthService.register_user(db=db, user_data=user, request=request),
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.post(
     "/login",
     response_model=AuthResponse,
-    dependencies=[Depends(RateLimiter(times=3, seconds=60))],
+    dependencies=[Depends(RateLimiter(times=3, seconds=60)), audit_backpressure],
 )
 async def login_for_access_token(
     request: Request,
@@ -1,10 +1,12 @@
 import logging
 from datetime import timedelta
 
+from app.audit.services.audit_service import AuditEventType, audit_writer, client_ip
 from app.auth.schemas.auth import AuthResponse
 from app.auth.utils import generate_access_token, verify_password
 from app.core.config import settings
 from app.user.schemas.user import UserCreate, UserInDB
+from app.user.services.activity_service import activity_buffer
 from app.user.services.user_service import UserService
 from fastapi import HTTPException, Request, status
 from sqlalchemy.orm import Session
@@ -20,7 +22,12 @@ class AuthService:
     ) -> AuthResponse[UserInDB]:
         try:
             # Create new user using UserService
-            user = UserService.create_user(db, user_data)
+            user = UserService.create_user(
+                db,
+                user_data,
+                event_type=AuditEventType.REGISTER,
+                ip_address=client_ip(request),
+            )
 
             logger.info(f"New user registered: {user_data.username}")
 
@@ -63,6 +70,13 @@ class AuthService:
             # Check if user exists and is active
             if not user or not verify_password(password, user.hashed_password):
                 logger.warning(f"Failed login attempt for user: {username}")
+                audit_writer.record(
+                    AuditEventType.LOGIN_FAILED,
+                    subject_id=user.id if user else None,
+                    username=username[:50],
+                    ip_address=client_ip(request),
+                    details={"reason": "invalid_credentials"},
+                )
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Incorrect username or password",
@@ -71,6 +85,13 @@ class AuthService:
 
             if not user.is_active:
                 logger.warning(f"Login attempt for inactive user: {user.username}")
+                audit_writer.record(
+                    AuditEventType.LOGIN_FAILED,
+                    subject_id=user.id,
+                    username=user.username,
+                    ip_address=client_ip(request),
+                    details={"reason": "inactive"},
+                )
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user"
                 )
@@ -82,6 +103,14 @@ class AuthService:
             )
 
             logger.info(f"User logged in: {user.username}")
+            activity_buffer.record_login(user.id)
+            audit_writer.record(
+                AuditEventType.LOGIN,
+                actor_id=user.id,
+                subject_id=user.id,
+                username=user.username,
+                ip_address=client_ip(request),
+            )
 
             # Convert user to Pydantic model for response
             user_in_db = UserInDB.from_orm(user)
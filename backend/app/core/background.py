@@ -0,0 +1,79 @@
+"""
+Periodic background workers.
+
+A worker runs ``run_once`` on its own thread every ``interval`` seconds, or
+sooner when woken. Work is done with the sync engine, off the event loop.
+Stopping the worker runs a final pass so that nothing buffered is lost on
+shutdown.
+"""
+
+import abc
+import logging
+import threading
+from typing import Optional
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker(abc.ABC):
+    """
+    Base class for a thread that periodically does a unit of work.
+    """
+
+    name = "background-worker"
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @abc.abstractmethod
+    def run_once(self) -> None:
+        """Do one unit of work; called on the worker thread and on stop."""
+
+    def _safe_run_once(self) -> None:
+        try:
+            self.run_once()
+        except Exception as e:
+            logger.error(f"{self.name} failed: {str(e)}", exc_info=True)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            self._safe_run_once()
+
+    def wake(self) -> None:
+        """Run the next pass now instead of at the end of the interval."""
+        self._wake.set()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Stop the thread, then optionally run a final pass on the caller's thread.
+
+        Args:
+            flush: Run ``run_once`` one last time after the thread has stopped
+            timeout: Seconds to wait for a pass in progress to finish
+        """
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if flush:
+            self._safe_run_once()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
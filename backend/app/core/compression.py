@@ -0,0 +1,302 @@
+"""
+Response compression middleware.
+
+This module provides an ASGI middleware that negotiates zstd, brotli or gzip
+compression from the request's ``Accept-Encoding`` header, skips bodies below a
+size threshold, compresses ``StreamingResponse`` bodies chunk by chunk and keeps
+the compressed form of immutable payloads (such as the OpenAPI schema) in memory.
+"""
+
+import hashlib
+import importlib
+import logging
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+# Encodings in order of preference when the client weights them equally
+PREFERRED_ENCODINGS = ("zstd", "br", "gzip")
+
+# Optional third-party codecs, imported on first use
+OPTIONAL_CODEC_MODULES = {"br": "brotli", "zstd": "zstandard"}
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+@lru_cache(maxsize=None)
+def _load_codec(encoding: str) -> Optional[Any]:
+    """
+    Import the module backing an optional encoding, or None if it is not installed.
+    """
+    module_name = OPTIONAL_CODEC_MODULES.get(encoding)
+    if module_name is None:
+        return None
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        logger.info(f"{module_name} is not installed; {encoding} compression disabled")
+        return None
+
+
+def _require_codec(encoding: str) -> Any:
+    """
+    Import the module backing an optional encoding that negotiation selected.
+
+    Raises:
+        ValueError: The codec is unknown or not installed
+    """
+    codec = _load_codec(encoding)
+    if codec is None:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    return codec
+
+
+def is_encoding_available(encoding: str) -> bool:
+    """
+    Check whether the codec for an encoding can be used in this process.
+    """
+    if encoding == "gzip":
+        return True
+    return _load_codec(encoding) is not None
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best supported encoding for an ``Accept-Encoding`` header value.
+
+    Args:
+        accept_encoding: The raw header value, e.g. ``"gzip, br;q=0.9"``
+
+    Returns:
+        Optional[str]: The chosen encoding, or None if nothing acceptable is available
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    best: Optional[str] = None
+    best_quality = 0.0
+    for encoding in PREFERRED_ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality and is_encoding_available(encoding):
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    """
+    Incremental compressor with a uniform interface over gzip, brotli and zstd.
+    """
+
+    def __init__(self, encoding: str, level: int) -> None:
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._codec: Any = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        elif encoding == "br":
+            self._codec = _require_codec("br").Compressor(quality=level)
+        elif encoding == "zstd":
+            self._codec = _require_codec("zstd").ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so streamed clients see it immediately."""
+        if self.encoding == "gzip":
+            return self._codec.compress(data) + self._codec.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._codec.process(data) + self._codec.flush()
+        zstd = _require_codec("zstd")
+        return self._codec.compress(data) + self._codec.flush(
+            zstd.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        """Compress the final chunk and close the stream."""
+        if self.encoding == "gzip":
+            return self._codec.compress(data) + self._codec.flush(zlib.Z_FINISH)
+        if self.encoding == "br":
+            return self._codec.process(data) + self._codec.finish()
+        return self._codec.compress(data) + self._codec.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compress HTTP responses with the best encoding the client accepts.
+
+    Args:
+        app: The wrapped ASGI application
+        minimum_size: Bodies smaller than this many bytes are sent uncompressed
+        levels: Compression level per encoding
+        cacheable_paths: Paths whose payloads never change between requests;
+            their compressed bodies are cached per encoding
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        levels: Optional[Dict[str, int]] = None,
+        cacheable_paths: Iterable[str] = (),
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+        self.cacheable_paths = frozenset(cacheable_paths)
+        self._cache: Dict[Tuple[str, str], Tuple[bytes, bytes]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, scope, encoding)
+        await self.app(scope, receive, responder.wrap(send))
+
+    def compress_cached(self, path: str, encoding: str, body: bytes) -> bytes:
+        """
+        Compress a complete body, reusing the cached result for immutable paths.
+        """
+        if path not in self.cacheable_paths:
+            return _Compressor(encoding, self.levels[encoding]).finish(body)
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        cached = self._cache.get((path, encoding))
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+
+        compressed = _Compressor(encoding, self.levels[encoding]).finish(body)
+        self._cache[(path, encoding)] = (digest, compressed)
+        return compressed
+
+
+class _CompressionResponder:
+    """
+    Per-request state machine that rewrites the response messages.
+    """
+
+    def __init__(
+        self, middleware: CompressionMiddleware, scope: Scope, encoding: str
+    ) -> None:
+        self.middleware = middleware
+        self.path: str = scope.get("path", "")
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def wrap(self, send: Send) -> Send:
+        async def send_compressed(message: Message) -> None:
+            await self.send(send, message)
+
+        return send_compressed
+
+    def _should_compress(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return False
+        content_length = headers.get("content-length")
+        if (
+            content_length is not None
+            and int(content_length) < self.middleware.minimum_size
+        ):
+            return False
+        return True
+
+    def _set_encoding_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+    async def send(self, send: Send, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the start message until the first body chunk tells us
+            # whether the response is small, complete or streamed.
+            self.start_message = message
+            self.passthrough = not self._should_compress(Headers(raw=message["headers"]))
+            return
+
+        if message_type != "http.response.body":
+            await send(message)
+            return
+
+        if self.passthrough:
+            if self.start_message is not None:
+                await send(self.start_message)
+                self.start_message = None
+            await send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start_message["headers"])
+
+            if not more_body:
+                if len(body) < self.middleware.minimum_size:
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                # Complete body: compress in one shot, using the immutable cache
+                # when the path allows it.
+                compressed = self.middleware.compress_cached(
+                    self.path, self.encoding, body
+                )
+                self._set_encoding_headers(headers)
+                headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+                await send({**message, "body": compressed})
+                return
+
+            # Streaming body: the total length is unknown, compress chunk by chunk.
+            self.compressor = _Compressor(
+                self.encoding, self.middleware.levels[self.encoding]
+            )
+            self._set_encoding_headers(headers)
+            del headers["Content-Length"]
+            await send(start_message)
+
+        if self.compressor is None:
+            await send(message)
+            return
+
+        if more_body:
+            chunk = self.compressor.compress(body)
+        else:
+            chunk = self.compressor.finish(body)
+        await send({**message, "body": chunk})
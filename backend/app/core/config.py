@@ -5,14 +5,11 @@ This module contains the application configuration
 settings using Pydantic Settings.
 """
 
-from typing import Any, List, Union
+from typing import Any, List, Optional, Union
 
-from dotenv import load_dotenv
-from pydantic import AnyHttpUrl
+from pydantic import AnyHttpUrl, Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-load_dotenv("/Users/yosifelessawi/Desktop/FastAPI/.env")
-
 
 class Settings(BaseSettings):
     # Application Settings
@@ -22,10 +19,126 @@ class Settings(BaseSettings):
 
     # API Settings
     API_V1_STR: str = "/api/v1"
+    # Serialized schema written by `python -m app.core.openapi build`
+    OPENAPI_SCHEMA_PATH: Optional[str] = None
 
     # Database
     DATABASE_URL: str
 
+    # Connection budget shared by every worker process; each worker gets
+    # DB_MAX_CONNECTIONS / WEB_CONCURRENCY, split between the sync and async engines
+    DB_MAX_CONNECTIONS: int = 60
+    DB_ASYNC_POOL_SHARE: float = Field(default=0.5, gt=0, lt=1)
+    DB_POOL_WARM: bool = True
+    # Bulkhead pools splitting the sync share: "auth" for authentication lookups,
+    # "bulk" for listings, admin and background jobs, "default" gets the rest
+    # (so AUTH + BULK must stay below 1). Every pool has at least one
+    # connection, and together they must fit in the budget of a worker.
+    # Timeouts are pool checkout waits in seconds; statement timeouts apply on
+    # Postgres, in milliseconds, 0 for none
+    DB_AUTH_POOL_SHARE: float = Field(default=0.25, gt=0, lt=1)
+    DB_AUTH_POOL_TIMEOUT: float = 2.0
+    DB_AUTH_STATEMENT_TIMEOUT_MS: int = 2000
+    DB_BULK_POOL_SHARE: float = Field(default=0.25, gt=0, lt=1)
+    DB_BULK_POOL_TIMEOUT: float = 30.0
+    DB_BULK_STATEMENT_TIMEOUT_MS: int = 120000
+    DB_DEFAULT_POOL_TIMEOUT: float = 10.0
+    DB_DEFAULT_STATEMENT_TIMEOUT_MS: int = 15000
+    # Horizontal sharding of the user tables (users, todos, user_outbox): one URL
+    # per shard, empty for a single database. DATABASE_URL keeps the other
+    # tables. Users are placed by a consistent hash of their username and their
+    # ids carry the shard index, so at most 64 shards
+    SHARD_DATABASE_URLS: List[str] = Field(default_factory=list, max_length=64)
+    SHARD_VIRTUAL_NODES: int = Field(default=64, ge=1, le=1024)  # ring points per shard
+    SHARD_SCATTER_THREADS: int = Field(default=8, ge=1)  # per worker, for listings
+    # Compiled SQL statements kept per engine, and server-side prepared
+    # statements kept per asyncpg connection (0 disables)
+    DB_QUERY_CACHE_SIZE: int = Field(default=1200, ge=0)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = Field(default=500, ge=0)
+
+    # Process Model (see app.core.server)
+    WEB_CONCURRENCY: int = 1
+    WORKER_MAX_REQUESTS: int = 0  # 0 disables request-count recycling
+    WORKER_MAX_REQUESTS_JITTER: int = 0
+    WORKER_MAX_RSS_GROWTH_MB: int = 0  # 0 disables RSS recycling
+    # A crashed worker is replaced after a delay that doubles with each crash in a
+    # row; the supervisor gives up after that many crashes (0 retries forever)
+    WORKER_RESTART_BACKOFF: float = 0.5  # seconds
+    WORKER_RESTART_BACKOFF_MAX: float = 30.0  # seconds
+    WORKER_MAX_CONSECUTIVE_FAILURES: int = 5
+    SHUTDOWN_DRAIN_TIMEOUT: int = 30  # seconds
+
+    # Redis
+    REDIS_URL: str = "redis://localhost:6379"
+
+    # Health Probes (checks run in the background, probes read the cached result)
+    HEALTH_CHECK_INTERVAL: float = 5.0  # seconds
+    HEALTH_CHECK_TIMEOUT: float = 2.0  # seconds
+    HEALTH_MAX_POOL_SATURATION: float = 0.9
+    # Pools smaller than this only warn when saturated: one in-flight request
+    # saturates a pool of one or two connections under normal load
+    HEALTH_MIN_GATED_POOL_SIZE: int = Field(default=4, ge=1)
+    HEALTH_MAX_LOOP_LAG: float = 0.5  # seconds, readiness
+    HEALTH_MAX_LOOP_LAG_LIVENESS: float = 10.0  # seconds
+
+    # Event-Loop Monitoring (the watchdog also runs whenever DEBUG is set)
+    LOOP_MONITOR_INTERVAL: float = 0.5  # seconds
+    LOOP_WATCHDOG_ENABLED: bool = False
+    LOOP_WATCHDOG_THRESHOLD: float = 0.1  # seconds
+
+    # Response Cache for opted-in listings ("memory" or "redis")
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_TTL_SECONDS: float = Field(default=5.0, gt=0, le=300)
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=256, ge=1)
+
+    # Idempotency-Key support ("memory" or "redis")
+    IDEMPOTENCY_BACKEND: str = "memory"
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 30  # seconds a duplicate waits for the first request
+
+    # Write-behind of last_login_at / last_seen_at
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = Field(default=10.0, gt=0, le=300)
+    ACTIVITY_FLUSH_MAX_BATCH: int = Field(default=500, ge=1, le=10000)
+
+    # Soft Delete (users are purged in the background after the grace period)
+    USER_PURGE_GRACE_SECONDS: int = Field(default=60 * 60 * 24, ge=0)
+    USER_PURGE_INTERVAL_SECONDS: float = Field(default=60.0, gt=0, le=3600)
+    USER_PURGE_BATCH_SIZE: int = Field(default=100, ge=1, le=10000)
+    USER_PURGE_MAX_BATCHES: int = Field(default=10, ge=1)  # per pass
+
+    # Audit Log (buffered in memory, written in batches by a background worker)
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = Field(default=2.0, gt=0, le=60)
+    AUDIT_FLUSH_BATCH_SIZE: int = Field(default=500, ge=1, le=10000)
+    AUDIT_BUFFER_SIZE: int = Field(default=10000, ge=1)
+    # Seconds a full buffer makes producers wait for room before dropping events
+    AUDIT_BACKPRESSURE_TIMEOUT: float = Field(default=0.05, ge=0, le=1)
+
+    # User Change Feed (outbox relayed to GET /users/changes). Without
+    # LISTEN/NOTIFY (SQLite) the relay polls every USER_FEED_POLL_INTERVAL_SECONDS;
+    # with it, the poll is only a safety net
+    USER_FEED_POLL_INTERVAL_SECONDS: float = Field(default=1.0, gt=0, le=60)
+    USER_FEED_SAFETY_POLL_SECONDS: float = Field(default=30.0, gt=0, le=3600)
+    USER_FEED_BATCH_SIZE: int = Field(default=500, ge=1, le=10000)
+    USER_FEED_QUEUE_SIZE: int = Field(
+        default=1000, ge=1
+    )  # events buffered per connection
+    USER_FEED_MAX_SUBSCRIBERS: int = Field(default=100, ge=1)  # per worker
+    USER_FEED_KEEPALIVE_SECONDS: float = Field(default=15.0, gt=0, le=300)
+    USER_FEED_RETENTION_SECONDS: int = Field(default=60 * 60 * 24 * 7, ge=60)
+
+    # Memory Diagnostics (admin endpoints under /diagnostics/memory). Tracing
+    # allocations slows the worker down, so tracemalloc starts with the worker
+    # only if enabled; admins can start it at runtime
+    MEMORY_TRACEMALLOC_ENABLED: bool = False
+    MEMORY_TRACEMALLOC_FRAMES: int = Field(default=1, ge=1, le=64)
+    MEMORY_CHECK_INTERVAL_SECONDS: float = Field(default=30.0, gt=0, le=3600)
+    # Dump diagnostics each time RSS grows by this much more, 0 disables; keep it
+    # below WORKER_MAX_RSS_GROWTH_MB so the dump happens before recycling
+    MEMORY_DUMP_RSS_GROWTH_MB: int = Field(default=0, ge=0)
+    MEMORY_DUMP_DIR: str = "logs/memory"
+    MEMORY_DUMP_MAX_FILES: int = Field(default=10, ge=1)  # per dump directory
+
     # JWT Settings
     JWT_SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -36,6 +149,8 @@ class Settings(BaseSettings):
         """Return the async database URL."""
         if self.DATABASE_URL.startswith("postgresql://"):
             return self.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+        if self.DATABASE_URL.startswith("sqlite://"):
+            return self.DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://")
         return self.DATABASE_URL
 
     # CORS
@@ -48,6 +163,12 @@ class Settings(BaseSettings):
         "http://127.0.0.1:3000",
     ]
 
+    # Response Compression
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # bytes
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
     # First Superuser
     FIRST_SUPERUSER_EMAIL: str
     FIRST_SUPERUSER_PASSWORD: str
@@ -58,6 +179,43 @@ class Settings(BaseSettings):
         case_sensitive=True,
     )
 
+    def pool_connections(self, share: float) -> int:
+        """Connections of a pool given ``share`` of a worker's budget, at least 1."""
+        per_worker = self.DB_MAX_CONNECTIONS // max(self.WEB_CONCURRENCY, 1)
+        return max(int(per_worker * share), 1)
+
+    @model_validator(mode="after")
+    def check_pool_budget(self) -> "Settings":
+        """Refuse pool shares that do not fit the connection budget of a worker."""
+        if self.DB_AUTH_POOL_SHARE + self.DB_BULK_POOL_SHARE >= 1:
+            raise ValueError(
+                "DB_AUTH_POOL_SHARE + DB_BULK_POOL_SHARE must be below 1, "
+                "the default pool gets the rest"
+            )
+        # SQLite engines are not sized from the budget (see app.core.database)
+        if self.DATABASE_URL.startswith("sqlite"):
+            return self
+
+        sync_share = 1 - self.DB_ASYNC_POOL_SHARE
+        default_share = 1 - self.DB_AUTH_POOL_SHARE - self.DB_BULK_POOL_SHARE
+        needed = sum(
+            self.pool_connections(share)
+            for share in (
+                self.DB_ASYNC_POOL_SHARE,
+                sync_share * self.DB_AUTH_POOL_SHARE,
+                sync_share * default_share,
+                sync_share * self.DB_BULK_POOL_SHARE,
+            )
+        )
+        per_worker = self.DB_MAX_CONNECTIONS // max(self.WEB_CONCURRENCY, 1)
+        if needed > per_worker:
+            raise ValueError(
+                f"The pools of a worker need {needed} connections but "
+                f"DB_MAX_CONNECTIONS / WEB_CONCURRENCY allows {per_worker}; raise "
+                "DB_MAX_CONNECTIONS or lower WEB_CONCURRENCY"
+            )
+        return self
+
     @classmethod
     def parse_env_var(cls, field_name: str, raw_val: str) -> Any:
         if field_name == "BACKEND_CORS_ORIGINS" and raw_val:
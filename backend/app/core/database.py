@@ -1,63 +1,604 @@
-from typing import Generator
+import bisect
+import hashlib
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    cast,
+)
 
 from app.core.config import settings
-from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.core.metrics import Histogram
+from app.core.routing import release_on_return
+from sqlalchemy import URL, Engine, create_engine, event, make_url, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-# Create SQLAlchemy engine for sync operations
-SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=20,
-    max_overflow=10,
-    pool_recycle=3600,
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+pool_checkout_wait_seconds = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    labelnames=("pool",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+connection_hold_seconds = Histogram(
+    "db_connection_hold_seconds",
+    "Time a connection stays checked out of the pool",
+    labelnames=("pool",),
 )
 
-# Create SQLAlchemy engine for async operations
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection.
+
+    The pool is named after the engine's ``pool_logging_name``, which survives
+    ``dispose()`` recreating the pool.
+    """
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait_seconds.observe(
+                time.perf_counter() - started, pool=self.logging_name or "default"
+            )
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """Instrumented pool for the async engine."""
+
+
+def track_connection_hold_time(db_engine: Engine, name: str) -> None:
+    """
+    Record how long connections of an engine stay checked out.
+
+    Args:
+        db_engine: A sync engine, or the ``sync_engine`` of an async one
+        name: Value of the ``pool`` label
+    """
+
+    @event.listens_for(db_engine, "checkout")
+    def _checkout(dbapi_connection: Any, record: Any, proxy: Any) -> None:
+        record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(db_engine, "checkin")
+    def _checkin(dbapi_connection: Any, record: Any) -> None:
+        started = record.info.pop("checked_out_at", None)
+        if started is not None:
+            connection_hold_seconds.observe(time.perf_counter() - started, pool=name)
+
+
+def pool_limits(url: str, share: float, timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    Size a connection pool from this worker's share of the global budget.
+
+    Every worker process gets ``DB_MAX_CONNECTIONS / WEB_CONCURRENCY``
+    connections; ``share`` is the fraction of that given to one engine. Two
+    thirds are kept open in the pool and the rest is allowed as overflow.
+
+    Args:
+        url: Database URL of the engine
+        share: Fraction of the per-worker budget for this engine
+        timeout: Seconds a checkout waits for a free connection before failing
+
+    Returns:
+        Dict[str, Any]: ``pool_size``, ``max_overflow``, ``pool_timeout`` and an
+        instrumented ``poolclass``, empty for SQLite where SQLAlchemy picks the
+        pool class itself
+    """
+    if url.startswith("sqlite"):
+        return {}
+    connections = settings.pool_connections(share)
+    pool_size = max(connections * 2 // 3, 1)
+    poolclass = (
+        InstrumentedAsyncAdaptedQueuePool
+        if make_url(url).get_dialect().is_async
+        else InstrumentedQueuePool
+    )
+    return {
+        "pool_size": pool_size,
+        "max_overflow": connections - pool_size,
+        "pool_timeout": timeout,
+        "poolclass": poolclass,
+    }
+
+
+def create_pool_engine(
+    name: str,
+    share: float,
+    timeout: float,
+    statement_timeout_ms: int,
+    url: Optional[str] = None,
+) -> Engine:
+    """
+    Create one of the named sync engines, each with its own connection pool.
+
+    Args:
+        name: Pool name, used as the ``pool`` label of the pool metrics
+        share: Fraction of the sync connection budget given to this pool
+        timeout: Seconds a checkout waits for a free connection
+        statement_timeout_ms: Postgres ``statement_timeout`` for every
+            connection of the pool, 0 for none
+        url: Database URL, ``DATABASE_URL`` by default
+
+    Returns:
+        Engine: The configured engine
+    """
+    url = url or SQLALCHEMY_DATABASE_URL
+    connect_args = {}
+    if statement_timeout_ms and url.startswith("postgresql"):
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+
+    pool_engine = create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        pool_logging_name=name,
+        connect_args=connect_args,
+        **pool_limits(url, (1 - settings.DB_ASYNC_POOL_SHARE) * share, timeout=timeout),
+    )
+    track_connection_hold_time(pool_engine, name)
+    return pool_engine
+
+
+# Sync engines: bulkheads so that heavy listings, bulk updates and background
+# jobs cannot starve the user lookups every authenticated request makes
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+POOL_OPTIONS: Dict[str, Dict[str, Any]] = {
+    "auth": {
+        "share": settings.DB_AUTH_POOL_SHARE,
+        "timeout": settings.DB_AUTH_POOL_TIMEOUT,
+        "statement_timeout_ms": settings.DB_AUTH_STATEMENT_TIMEOUT_MS,
+    },
+    "default": {
+        "share": 1 - settings.DB_AUTH_POOL_SHARE - settings.DB_BULK_POOL_SHARE,
+        "timeout": settings.DB_DEFAULT_POOL_TIMEOUT,
+        "statement_timeout_ms": settings.DB_DEFAULT_STATEMENT_TIMEOUT_MS,
+    },
+    "bulk": {
+        "share": settings.DB_BULK_POOL_SHARE,
+        "timeout": settings.DB_BULK_POOL_TIMEOUT,
+        "statement_timeout_ms": settings.DB_BULK_STATEMENT_TIMEOUT_MS,
+    },
+}
+auth_engine = create_pool_engine("auth", **POOL_OPTIONS["auth"])
+bulk_engine = create_pool_engine("bulk", **POOL_OPTIONS["bulk"])
+engine = create_pool_engine("default", **POOL_OPTIONS["default"])
+engines: Dict[str, Engine] = {"auth": auth_engine, "default": engine, "bulk": bulk_engine}
+
+
+# Sharding of the user tables. Shards are named after their index in
+# SHARD_DATABASE_URLS and each gets the same three pools as DATABASE_URL (every
+# shard is its own server with its own connection budget). Without sharding
+# the user tables live on DATABASE_URL, seen as the single shard "0".
+SHARD_IDS = [str(index) for index in range(len(settings.SHARD_DATABASE_URLS))]
+SHARDING_ENABLED = bool(SHARD_IDS)
+SINGLE_SHARD_ID = "0"
+# User ids carry their shard: shard index = id % SHARD_ID_STRIDE
+SHARD_ID_STRIDE = 64
+
+shard_engines: Dict[str, Dict[str, Engine]] = {
+    pool: {
+        shard_id: create_pool_engine(f"{pool}_shard{shard_id}", url=url, **options)
+        for shard_id, url in zip(SHARD_IDS, settings.SHARD_DATABASE_URLS)
+    }
+    for pool, options in POOL_OPTIONS.items()
+    if SHARDING_ENABLED
+}
+for pool, pool_shard_engines in shard_engines.items():
+    for shard_id, shard_engine in pool_shard_engines.items():
+        engines[f"{pool}_shard{shard_id}"] = shard_engine
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class ShardRing:
+    """
+    Consistent-hash ring placing usernames on shards.
+
+    Each shard owns ``virtual_nodes`` points of the ring and a key belongs to
+    the first point after its hash, so adding a shard only moves the keys
+    that land on the new shard's points (about 1/N of them).
+    """
+
+    def __init__(self, shard_ids: Sequence[str], virtual_nodes: int) -> None:
+        points = sorted(
+            (_ring_hash(f"{shard_id}#{node}"), shard_id)
+            for shard_id in shard_ids
+            for node in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard_id for _, shard_id in points]
+
+    def shard_for(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, _ring_hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+shard_ring = ShardRing(SHARD_IDS or [SINGLE_SHARD_ID], settings.SHARD_VIRTUAL_NODES)
+
+
+def shard_for_username(username: str) -> str:
+    """Shard that holds, or will hold, the user with this username."""
+    return shard_ring.shard_for(username) if SHARDING_ENABLED else SINGLE_SHARD_ID
+
+
+def shard_for_user_id(user_id: int) -> Optional[str]:
+    """Shard tagged in a user id; None if the tag names no shard."""
+    if not SHARDING_ENABLED:
+        return SINGLE_SHARD_ID
+    shard_id = str(user_id % SHARD_ID_STRIDE)
+    return shard_id if shard_id in SHARD_IDS else None
+
+
+def tag_user_id(local_id: int, shard_id: str) -> int:
+    """Build a user id from a per-shard sequence value and the shard index."""
+    return local_id * SHARD_ID_STRIDE + int(shard_id)
+
+
+def shard_hint(
+    user_id: Optional[int] = None, username: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    ``bind_arguments`` that route a statement to the shard of one user.
+
+    None without sharding, or when the shard is unknown, so that a sharded
+    session runs the statement on every shard.
+    """
+    if not SHARDING_ENABLED:
+        return None
+    if user_id is not None:
+        shard_id = shard_for_user_id(user_id)
+    elif username is not None:
+        shard_id = shard_for_username(username)
+    else:
+        shard_id = None
+    return {"shard_id": shard_id} if shard_id is not None else None
+
+
+def user_engines(pool: str) -> Dict[str, Engine]:
+    """Engines of a pool holding the user tables, by shard id."""
+    if SHARDING_ENABLED:
+        return shard_engines[pool]
+    return {SINGLE_SHARD_ID: engines[pool]}
+
+
+def _choose_shard(mapper: Any, instance: Any, clause: Any = None, **kw: Any) -> str:
+    # Models on the user shards name the attribute holding their user id in
+    # __shard_key__ (the id itself for users)
+    model = mapper.class_
+    key = getattr(model, "__shard_key__", None)
+    if key is None:
+        raise ValueError(f"{model.__name__} is not stored on the user shards")
+    user_id = getattr(instance, key, None) if instance is not None else None
+    shard_id = shard_for_user_id(user_id) if user_id is not None else None
+    if shard_id is None and getattr(instance, "username", None):
+        shard_id = shard_for_username(instance.username)
+    if shard_id is None:
+        raise ValueError(f"Cannot choose a shard for {model.__name__} without {key}")
+    return shard_id
+
+
+def _choose_identity_shards(
+    mapper: Any, primary_key: Any, *, lazy_loaded_from: Any, **kw: Any
+) -> Iterable[str]:
+    if lazy_loaded_from is not None:
+        return [lazy_loaded_from.identity_token]
+    if getattr(mapper.class_, "__shard_key__", None) == "id":
+        shard_id = shard_for_user_id(primary_key[0])
+        return [shard_id] if shard_id is not None else []
+    return SHARD_IDS
+
+
+def _choose_execute_shards(context: ORMExecuteState) -> Iterable[str]:
+    # Statements without a shard_hint() run on every shard, results concatenated
+    if context.is_select and context.lazy_loaded_from is not None:
+        return [cast(str, context.lazy_loaded_from.identity_token)]
+    return SHARD_IDS
+
+
 ASYNC_SQLALCHEMY_DATABASE_URL = settings.ASYNC_DATABASE_URL
-async_engine = create_async_engine(
-    ASYNC_SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=20,
-    max_overflow=10,
-    pool_recycle=3600,
-)
 
-# Session factories
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-AsyncSessionLocal = sessionmaker(
-    bind=async_engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+
+def async_database_url(url: str) -> URL:
+    """
+    Add driver options to the async database URL.
+
+    asyncpg prepares every statement on the server and keeps up to
+    ``prepared_statement_cache_size`` of them per connection; with the
+    SQLAlchemy compiled cache in front, the hot queries are parsed and planned
+    once per connection instead of once per call.
+    """
+    async_url = make_url(url)
+    if async_url.drivername.endswith("+asyncpg"):
+        async_url = async_url.update_query_dict(
+            {
+                "prepared_statement_cache_size": str(
+                    settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+                )
+            }
+        )
+    return async_url
+
+
+def _sessionmaker(pool: str) -> sessionmaker:
+    if not SHARDING_ENABLED:
+        return sessionmaker(autocommit=False, autoflush=False, bind=engines[pool])
+    return sessionmaker(
+        class_=ShardedSession,
+        autocommit=False,
+        autoflush=False,
+        shards=shard_engines[pool],
+        shard_chooser=_choose_shard,
+        identity_chooser=_choose_identity_shards,
+        execute_chooser=_choose_execute_shards,
+    )
+
+
+# Session factories; sharded sessions when SHARD_DATABASE_URLS is set
+SessionLocal = _sessionmaker("default")
+AuthSessionLocal = _sessionmaker("auth")
+BulkSessionLocal = _sessionmaker("bulk")
+
+# Plain per-shard session factories, for scatter_gather
+shard_sessionmakers: Dict[str, Dict[str, sessionmaker]] = {
+    pool: {
+        shard_id: sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+        for shard_id, shard_engine in pool_shard_engines.items()
+    }
+    for pool, pool_shard_engines in shard_engines.items()
+}
+
+
+@lru_cache(maxsize=None)
+def get_scatter_executor() -> ThreadPoolExecutor:
+    """Threads that query the shards in parallel, created on first use."""
+    return ThreadPoolExecutor(
+        max_workers=settings.SHARD_SCATTER_THREADS, thread_name_prefix="shard-scatter"
+    )
+
+
+def scatter_gather(
+    query: Callable[[Session], List[T]],
+    key: Callable[[T], Any],
+    limit: int,
+    pool: str = "bulk",
+) -> List[T]:
+    """
+    Run a query on every shard in parallel and merge the results.
+
+    Each shard runs ``query`` with its own session; its results must be sorted
+    by ``key``. The merge keeps that order and stops after ``limit`` results,
+    so a shard never needs to return more than ``limit`` rows.
+
+    Args:
+        query: Runs the query on one shard's session
+        key: Sort key the per-shard results are ordered by
+        limit: Number of merged results to return
+        pool: Pool to take the shard connections from
+
+    Returns:
+        List[T]: The first ``limit`` results across all shards
+    """
+
+    def run(factory: sessionmaker) -> List[T]:
+        with factory() as session:
+            return query(session)
+
+    factories = shard_sessionmakers[pool].values()
+    results = list(get_scatter_executor().map(run, factories))
+    return list(itertools.islice(heapq.merge(*results, key=key), limit))
+
+
+@lru_cache(maxsize=None)
+def get_async_engine() -> AsyncEngine:
+    """
+    Create the SQLAlchemy engine for async operations on first use.
+
+    Deferring creation keeps the async driver (asyncpg) out of the import path
+    of processes that never use it, such as migrations and CLI tools.
+    """
+    async_engine = create_async_engine(
+        async_database_url(ASYNC_SQLALCHEMY_DATABASE_URL),
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        pool_logging_name="async",
+        **pool_limits(ASYNC_SQLALCHEMY_DATABASE_URL, settings.DB_ASYNC_POOL_SHARE),
+    )
+    track_connection_hold_time(async_engine.sync_engine, "async")
+    return async_engine
+
+
+@lru_cache(maxsize=None)
+def get_async_sessionmaker() -> sessionmaker:
+    """
+    Return the async session factory bound to the async engine.
+    """
+    return sessionmaker(
+        bind=get_async_engine(),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db() -> Generator[Session, None, None]:
+def warm_pool() -> None:
     """
-    Dependency function to get DB session.
+    Open ``pool_size`` connections on each sync engine and return them to the pool.
 
-    Yields:
-        Session: Database session
+    Called before the worker accepts traffic so the first requests don't pay
+    for connection setup.
+    """
+    for name, pool_engine in engines.items():
+        if not isinstance(pool_engine.pool, QueuePool):
+            continue
+
+        connections = []
+        try:
+            for _ in range(pool_engine.pool.size()):
+                connections.append(pool_engine.connect())
+        finally:
+            for connection in connections:
+                connection.close()
+        logger.info(f"Warmed {name} pool with {len(connections)} connections")
+
+
+async def warm_async_pool() -> None:
+    """
+    Open ``pool_size`` connections on the async engine and return them to the pool.
     """
-    db = SessionLocal()
+    async_engine = get_async_engine()
+    if not isinstance(async_engine.pool, QueuePool):
+        return
+
+    connections = []
+    try:
+        for _ in range(async_engine.pool.size()):
+            connections.append(await async_engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+    logger.info(f"Warmed async pool with {len(connections)} connections")
+
+
+def ping_database() -> None:
+    """
+    Run ``SELECT 1`` on the sync engine and on every shard; raises if a
+    database is unreachable.
+    """
+    for ping_engine in [engine, *shard_engines.get("default", {}).values()]:
+        with ping_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+
+def pool_capacity(db_engine: Engine) -> Optional[int]:
+    """
+    Connections an engine's pool can hand out at once (size plus overflow).
+
+    Returns:
+        Optional[int]: None for pools without a fixed capacity
+    """
+    pool = db_engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    return pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+
+
+def pool_saturation(db_engine: Engine) -> Optional[float]:
+    """
+    Fraction of an engine's pool capacity (size plus overflow) currently checked out.
+
+    Returns:
+        Optional[float]: Between 0 and 1, or None for pools without a fixed capacity
+    """
+    pool, capacity = db_engine.pool, pool_capacity(db_engine)
+    if not isinstance(pool, QueuePool) or not capacity:
+        return None
+    return pool.checkedout() / capacity
+
+
+async def dispose_engines() -> None:
+    """
+    Close every pooled connection of the sync and async engines.
+    """
+    for pool_engine in engines.values():
+        pool_engine.dispose()
+    # Only dispose the async engine if something created it
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_scatter_executor.cache_info().currsize:
+        get_scatter_executor().shutdown(wait=False)
+    logger.info("Database engines disposed")
+
+
+def _request_session(factory: sessionmaker) -> Generator[Session, None, None]:
+    db = factory()
+    # Closed as soon as the endpoint returns on SessionReleasingRoute routes
+    release_on_return(db)
     try:
         yield db
     finally:
         db.close()
 
 
-async def get_async_db() -> AsyncSession:
+def get_db() -> Generator[Session, None, None]:
+    """
+    Dependency function to get DB session.
+
+    Yields:
+        Session: Database session
+    """
+    yield from _request_session(SessionLocal)
+
+
+def get_auth_db() -> Generator[Session, None, None]:
+    """
+    Dependency function to get a DB session from the auth pool.
+
+    For the short lookups of authentication and login only.
+
+    Yields:
+        Session: Database session
+    """
+    yield from _request_session(AuthSessionLocal)
+
+
+def get_bulk_db() -> Generator[Session, None, None]:
+    """
+    Dependency function to get a DB session from the bulk pool.
+
+    For large listings, exports and admin operations.
+
+    Yields:
+        Session: Database session
+    """
+    yield from _request_session(BulkSessionLocal)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency function to get async DB session.
 
     Yields:
         AsyncSession: Async database session
     """
-    async with AsyncSessionLocal() as session:
+    async with get_async_sessionmaker()() as session:
         yield session
+
+
+def __getattr__(name: str) -> Any:
+    # Keep `async_engine` and `AsyncSessionLocal` importable as module attributes
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "AsyncSessionLocal":
+        return get_async_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,225 @@
+"""
+Idempotency-Key support for non-idempotent endpoints.
+
+The first request carrying a key runs normally and its response is recorded.
+Concurrent requests with the same key wait for that response, and later
+retries get it back without running the handler again. Keys are scoped per
+route and expire after ``IDEMPOTENCY_TTL_SECONDS``. Records live in process
+memory or, with ``IDEMPOTENCY_BACKEND=redis``, in Redis so that every worker
+sees them.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+PENDING = b"__pending__"
+
+
+class StoredResponse(NamedTuple):
+    """A recorded response and the fingerprint of the request that produced it."""
+
+    status_code: int
+    body: bytes
+    fingerprint: str
+
+
+class MemoryIdempotencyStore:
+    """
+    Per-process store; waiters are woken through asyncio events.
+    """
+
+    def __init__(self, ttl: int, max_entries: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._responses: "OrderedDict[str, Tuple[float, StoredResponse]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Event] = {}
+
+    def _get(self, key: str) -> Optional[StoredResponse]:
+        entry = self._responses.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._responses[key]
+            return None
+        return response
+
+    async def begin(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        """
+        Return the recorded response for a key, waiting if it is being produced.
+
+        Returns None when the caller now owns the key and must run the handler.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            response = self._get(key)
+            if response is not None:
+                return response
+
+            event = self._in_flight.get(key)
+            if event is None:
+                self._in_flight[key] = asyncio.Event()
+                return None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise _still_processing()
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise _still_processing()
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        self._responses[key] = (time.monotonic() + self.ttl, response)
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+        self._wake(key)
+
+    async def release(self, key: str) -> None:
+        self._wake(key)
+
+    def _wake(self, key: str) -> None:
+        event = self._in_flight.pop(key, None)
+        if event is not None:
+            event.set()
+
+
+class RedisIdempotencyStore:
+    """
+    Store shared by all workers; ownership is taken with ``SET NX``.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, redis_connection: Any, ttl: int, lock_timeout: int) -> None:
+        self.redis = redis_connection
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    async def begin(self, key: str, timeout: float) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + timeout
+        while True:
+            if await self.redis.set(key, PENDING, nx=True, ex=self.lock_timeout):
+                return None
+
+            value = await self.redis.get(key)
+            if value is not None and value != PENDING:
+                data = json.loads(value)
+                return StoredResponse(
+                    data["status_code"], data["body"].encode("utf-8"), data["fingerprint"]
+                )
+
+            if time.monotonic() >= deadline:
+                raise _still_processing()
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        value = json.dumps(
+            {
+                "status_code": response.status_code,
+                "body": response.body.decode("utf-8"),
+                "fingerprint": response.fingerprint,
+            }
+        )
+        await self.redis.set(key, value, ex=self.ttl)
+
+    async def release(self, key: str) -> None:
+        await self.redis.delete(key)
+
+
+def _still_processing() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still being processed",
+    )
+
+
+def create_idempotency_store(redis_connection: Any = None) -> Any:
+    """
+    Build the store selected by ``IDEMPOTENCY_BACKEND``.
+    """
+    if settings.IDEMPOTENCY_BACKEND == "redis" and redis_connection is not None:
+        return RedisIdempotencyStore(
+            redis_connection,
+            ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+            lock_timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT,
+        )
+    return MemoryIdempotencyStore(ttl=settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+# Fallback used when the lifespan has not installed a store on app.state
+_default_store = MemoryIdempotencyStore(ttl=settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+async def run_idempotent(
+    request: Request,
+    key: Optional[str],
+    payload: BaseModel,
+    handler: Callable[[], BaseModel],
+    status_code: int = status.HTTP_200_OK,
+) -> Any:
+    """
+    Run a handler at most once per Idempotency-Key.
+
+    Args:
+        request: The current request; its route path scopes the key
+        key: Value of the Idempotency-Key header, or None to run unconditionally
+        payload: The request body, fingerprinted to detect key reuse
+        handler: Produces the response model
+        status_code: Status code of a successful response
+
+    Returns:
+        The handler's result when no key is given, otherwise a JSON response
+        that is replayed verbatim for retries
+    """
+    if key is None:
+        return handler()
+
+    store = getattr(request.app.state, "idempotency_store", None) or _default_store
+    scoped_key = f"idempotency:{request.url.path}:{key}"
+    # Keyed so that recorded fingerprints do not leak hashes of submitted passwords
+    fingerprint = hmac.new(
+        settings.JWT_SECRET_KEY.encode("utf-8"),
+        payload.model_dump_json().encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+
+    stored = await store.begin(scoped_key, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    if stored is not None:
+        if stored.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request",
+            )
+        logger.info(f"Replaying response for Idempotency-Key {key}")
+        return Response(
+            stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    try:
+        result = handler()
+    except BaseException:
+        # Let a retry run the handler again
+        await store.release(scoped_key)
+        raise
+
+    body = result.model_dump_json().encode("utf-8")
+    await store.complete(scoped_key, StoredResponse(status_code, body, fingerprint))
+    return Response(body, status_code=status_code, media_type="application/json")
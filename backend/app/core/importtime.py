@@ -0,0 +1,86 @@
+"""
+Import-time profile of the application.
+
+Runs ``python -X importtime`` in a fresh interpreter, reports the slowest
+imports and fails when importing the application exceeds a time budget, so
+startup regressions show up in CI before they slow down new pods:
+
+    python -m app.core.importtime --budget-ms 1500
+"""
+
+import argparse
+import subprocess
+import sys
+from typing import List, NamedTuple, Optional
+
+
+class ImportTiming(NamedTuple):
+    """Self and cumulative import time of one module, in microseconds."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def profile_imports(module: str = "app.main") -> List[ImportTiming]:
+    """
+    Import a module in a subprocess and collect the ``-X importtime`` report.
+
+    Args:
+        module: Dotted name of the module to import
+
+    Returns:
+        List[ImportTiming]: One entry per imported module, in import order
+
+    Raises:
+        RuntimeError: If the import fails
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point; returns a non-zero exit code when over budget.
+    """
+    parser = argparse.ArgumentParser(description="Import-time profile")
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--top", type=int, default=20, help="Slowest imports to show")
+    parser.add_argument(
+        "--budget-ms", type=float, default=None, help="Fail if the import takes longer"
+    )
+    args = parser.parse_args(argv)
+
+    timings = profile_imports(args.module)
+    total = next(t for t in reversed(timings) if t.module == args.module)
+
+    print(f"{'self [ms]':>10} {'cumulative [ms]':>16}  module")
+    for timing in sorted(timings, key=lambda t: t.self_us, reverse=True)[: args.top]:
+        print(
+            f"{timing.self_us / 1000:>10.1f} {timing.cumulative_us / 1000:>16.1f}"
+            f"  {timing.module}"
+        )
+    total_ms = total.cumulative_us / 1000
+    print(f"\nimport {args.module}: {total_ms:.1f} ms")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"Import time budget of {args.budget_ms:.0f} ms exceeded")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Application lifecycle helpers.
+
+Tracks in-flight requests so shutdown can stop taking new work and wait for
+running requests to finish, and provides the startup readiness check and the
+log flush used at the end of the shutdown sequence.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List
+
+from app.core.database import ping_database
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class RequestTracker:
+    """
+    Count in-flight HTTP requests and signal when the last one finishes.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._drain_callbacks: List[Callable[[], None]] = []
+
+    def started(self) -> None:
+        self.in_flight += 1
+        self._idle.clear()
+
+    def finished(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    def on_drain(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` on the event loop once draining starts."""
+        self._drain_callbacks.append(callback)
+
+    def start_draining(self) -> None:
+        """Reject new requests from now on and end long-lived responses."""
+        if self.draining:
+            return
+        self.draining = True
+        for callback in self._drain_callbacks:
+            callback()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        Wait until no requests are in flight.
+
+        Returns:
+            bool: True if all requests finished before the timeout
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+# Shared by the middleware and the lifespan of the application
+request_tracker = RequestTracker()
+
+
+class RequestDrainMiddleware:
+    """
+    Track in-flight requests and answer 503 once the application is draining.
+    """
+
+    def __init__(self, app: ASGIApp, tracker: RequestTracker = request_tracker) -> None:
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.tracker.draining:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is shutting down"},
+                headers={"Connection": "close", "Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.tracker.started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.tracker.finished()
+
+
+async def check_readiness(redis_connection: Any) -> Dict[str, bool]:
+    """
+    Check that the database and Redis answer.
+
+    Args:
+        redis_connection: The asyncio Redis client used by the application
+
+    Returns:
+        Dict[str, bool]: Result per dependency
+    """
+    results = {}
+    try:
+        await asyncio.to_thread(ping_database)
+        results["database"] = True
+    except Exception as e:
+        logger.error(f"Database readiness check failed: {str(e)}")
+        results["database"] = False
+
+    try:
+        results["redis"] = bool(await redis_connection.ping())
+    except Exception as e:
+        logger.error(f"Redis readiness check failed: {str(e)}")
+        results["redis"] = False
+    return results
+
+
+def flush_logs() -> None:
+    """
+    Flush every handler attached to the root logger and configured loggers.
+    """
+    loggers = [logging.getLogger()] + [
+        candidate
+        for candidate in logging.Logger.manager.loggerDict.values()
+        if isinstance(candidate, logging.Logger)
+    ]
+    for configured_logger in loggers:
+        for handler in configured_logger.handlers:
+            try:
+                handler.flush()
+            except Exception:
+                # Never fail the shutdown sequence over logging
+                pass
@@ -4,9 +4,7 @@ from pathlib import Path
 
 from app.core.config import settings
 
-# Create logs directory if it doesn't exist
 log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
 
 # Logging configuration
 LOGGING_CONFIG = {
@@ -64,15 +62,28 @@ LOGGING_CONFIG = {
 }
 
 
+# Set once dictConfig has run so repeated calls don't rebuild handlers
+_configured = False
+
+
 def setup_logging() -> logging.Logger:
     """
     Configure logging for the application.
 
+    Safe to call more than once; the configuration is only applied the first time.
+
     Returns:
         logging.Logger: Configured logger instance
     """
-    logging.config.dictConfig(LOGGING_CONFIG)
+    global _configured
     logger = logging.getLogger(__name__)
+    if _configured:
+        return logger
+
+    # Create logs directory if it doesn't exist
+    log_dir.mkdir(exist_ok=True)
+    logging.config.dictConfig(LOGGING_CONFIG)
+    _configured = True
 
     # Set SQLAlchemy logging level
     if settings.DEBUG:
@@ -80,7 +91,3 @@ def setup_logging() -> logging.Logger:
 
     logger.info("Logging configured successfully")
     return logger
-
-
-# Create a module-level logger that can be imported by other modules
-logger = setup_logging()
@@ -0,0 +1,118 @@
+"""
+Event-loop lag monitor and blocking-call watchdog.
+
+The monitor wakes up on a fixed interval and records how late it was woken:
+any delay beyond the requested sleep is time the loop spent running something
+else without yielding. Lag is exported as metrics.
+
+When the watchdog is enabled (``LOOP_WATCHDOG_ENABLED``, or ``DEBUG``) a
+separate thread watches the monitor's heartbeat. If the loop stops ticking for
+longer than ``LOOP_WATCHDOG_THRESHOLD`` it captures the loop thread's current
+stack, which points straight at the blocking call (a sync database query, a
+bcrypt hash, ...), and logs it once per stall.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+loop_lag_seconds = Gauge(
+    "event_loop_lag_seconds", "Delay of the most recent event-loop lag probe"
+)
+loop_lag_histogram = Histogram(
+    "event_loop_lag_distribution_seconds",
+    "Distribution of event-loop lag probe delays",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+loop_blocked_total = Counter(
+    "event_loop_blocked_total", "Stalls longer than the watchdog threshold"
+)
+
+
+class LoopMonitor:
+    """
+    Measure event-loop lag and optionally capture the stack of blocking calls.
+    """
+
+    def __init__(self) -> None:
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.lag = max(now - expected, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            loop_lag_seconds.set(self.lag)
+            loop_lag_histogram.observe(self.lag)
+
+    def _watch(self, interval: float, threshold: float) -> None:
+        reported_heartbeat = None
+        while not self._stopped.wait(min(threshold / 2, interval)):
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat - interval
+            if stalled_for < threshold or heartbeat == reported_heartbeat:
+                continue
+
+            # Report each stall once, with the stack the loop is stuck in
+            reported_heartbeat = heartbeat
+            loop_blocked_total.inc()
+            frame = sys._current_frames().get(self._loop_thread_id or 0)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+            logger.warning(
+                f"Event loop blocked for more than {stalled_for:.3f}s, "
+                f"current stack:\n{stack}"
+            )
+
+    def start(self) -> None:
+        """Start the lag probe on the running loop, and the watchdog if enabled."""
+        interval = settings.LOOP_MONITOR_INTERVAL
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = threading.get_ident()
+        self._task = asyncio.create_task(self._run(interval), name="loop-monitor")
+
+        if settings.LOOP_WATCHDOG_ENABLED or settings.DEBUG:
+            self._stopped.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch,
+                args=(interval, settings.LOOP_WATCHDOG_THRESHOLD),
+                name="loop-watchdog",
+                daemon=True,
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+
+# Module-level monitor shared by the lifespan and the health checks
+loop_monitor = LoopMonitor()
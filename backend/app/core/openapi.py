@@ -0,0 +1,152 @@
+"""
+Precompiled OpenAPI schema.
+
+FastAPI builds the OpenAPI schema lazily on the first request to the schema or
+docs URL and re-serializes it on every request. This module renders the schema
+once into JSON bytes with an ETag, optionally loading it from a file produced at
+build time, and swaps FastAPI's schema route for one that serves those bytes.
+
+Build the schema file with:
+
+    python -m app.core.openapi build --output openapi.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import FastAPI, Request, Response, status
+from starlette.routing import Route
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+
+class OpenAPIDocument:
+    """
+    A serialized OpenAPI schema together with its ETag.
+    """
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    @classmethod
+    def from_app(cls, app: FastAPI) -> "OpenAPIDocument":
+        """Render the schema the same way FastAPI's JSONResponse would."""
+        body = json.dumps(
+            app.openapi(),
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        return cls(body)
+
+    @classmethod
+    def from_file(cls, path: Path, version: str) -> Optional["OpenAPIDocument"]:
+        """
+        Load a schema written by the build step.
+
+        Returns None when the file is missing, unreadable or was built for a
+        different application version, so callers can fall back to rendering.
+        """
+        try:
+            body = path.read_bytes()
+            built_version = json.loads(body)["info"]["version"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring precompiled OpenAPI schema {path}: {str(e)}")
+            return None
+
+        if built_version != version:
+            logger.warning(
+                f"Ignoring precompiled OpenAPI schema {path}: built for version "
+                f"{built_version}, running {version}"
+            )
+            return None
+        return cls(body)
+
+    def response(self, request: Request) -> Response:
+        """Serve the schema, answering conditional requests with 304."""
+        headers = {"ETag": self.etag, "Cache-Control": "public, max-age=300"}
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+def load_openapi_document(
+    app: FastAPI, schema_path: Optional[str] = None
+) -> OpenAPIDocument:
+    """
+    Load the precompiled schema if available, otherwise render it from the app.
+    """
+    if schema_path:
+        document = OpenAPIDocument.from_file(Path(schema_path), app.version)
+        if document is not None:
+            logger.info(f"Loaded precompiled OpenAPI schema from {schema_path}")
+            return document
+    return OpenAPIDocument.from_app(app)
+
+
+def install_precompiled_openapi(app: FastAPI, schema_path: Optional[str] = None) -> None:
+    """
+    Replace FastAPI's schema route with one serving precompiled bytes.
+
+    The document is rendered (or loaded) on first use; call
+    ``warm_openapi_document`` during startup to do it before taking traffic.
+    The docs pages keep pointing at the same URL.
+    """
+    if not app.openapi_url:
+        return
+
+    app.state.openapi_schema_path = schema_path
+    app.state.openapi_document = None
+
+    async def openapi(request: Request) -> Response:
+        return warm_openapi_document(app).response(request)
+
+    for index, route in enumerate(app.router.routes):
+        if isinstance(route, Route) and route.path == app.openapi_url:
+            app.router.routes[index] = Route(
+                app.openapi_url, openapi, methods=["GET"], include_in_schema=False
+            )
+            return
+
+
+def warm_openapi_document(app: FastAPI) -> OpenAPIDocument:
+    """
+    Return the application's OpenAPI document, building it on the first call.
+    """
+    document: Optional[OpenAPIDocument] = getattr(app.state, "openapi_document", None)
+    if document is None:
+        document = load_openapi_document(
+            app, getattr(app.state, "openapi_schema_path", None)
+        )
+        app.state.openapi_document = document
+    return document
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point for the schema build step.
+    """
+    parser = argparse.ArgumentParser(description="Precompiled OpenAPI schema")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="Write the OpenAPI schema to disk")
+    build.add_argument("--output", default="openapi.json", help="Destination file")
+    args = parser.parse_args(argv)
+
+    from app.main import app
+
+    output = Path(args.output)
+    output.write_bytes(OpenAPIDocument.from_app(app).body)
+    print(f"Wrote OpenAPI schema for {app.title} {app.version} to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""
+Facts about the current process, shared by the launcher and the application.
+
+Kept free of server and framework imports so that either side can use it.
+"""
+
+import os
+import sys
+
+
+def current_rss_bytes() -> int:
+    """
+    Return the resident set size of the current process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
@@ -0,0 +1,175 @@
+"""
+Short-lived cache of serialized responses.
+
+Routes opt in by rendering their response through ``cached_response``. Entries
+are keyed by namespace, query parameters and the namespace's generation. A
+write bumps the generation with ``bump_generation``, so every entry built
+before it stops matching at once and no keys are ever scanned or deleted;
+old entries fall out of the LRU or expire after ``RESPONSE_CACHE_TTL_SECONDS``.
+
+A hit skips the route's queries and serialization, not its dependencies:
+authentication still looks the user up on the auth pool for every request, so
+that deactivated users are refused even from cached listings.
+
+With ``RESPONSE_CACHE_BACKEND=redis`` bodies and generations are also shared
+between workers through Redis. A worker's own writes invalidate its local
+entries immediately; other workers see them one Redis round trip later.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from fastapi import Request, Response
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+response_cache_requests_total = Counter(
+    "response_cache_requests_total",
+    "Cacheable requests by namespace and result (hit or miss)",
+    labelnames=("namespace", "result"),
+)
+
+
+class ResponseCache:
+    """
+    Bounded LRU of response bodies with TTL and generation-based invalidation.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._redis: Any = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+
+    def configure(self, redis_connection: Any) -> None:
+        """Share bodies and generations through Redis; call from the event loop."""
+        self._redis = redis_connection
+        self._loop = asyncio.get_running_loop()
+
+    def bump_generation(self, namespace: str) -> None:
+        """
+        Invalidate every cached response of a namespace.
+
+        Safe to call from sync code on the event loop or in a worker thread.
+        """
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        if self._redis is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._spawn_shared_bump, namespace)
+
+    def _spawn_shared_bump(self, namespace: str) -> None:
+        task = asyncio.create_task(self._redis.incr(f"cache:generation:{namespace}"))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _shared_generation(self, namespace: str) -> int:
+        value = await self._redis.get(f"cache:generation:{namespace}")
+        return int(value or 0)
+
+    def _get_local(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, body = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    def _set_local(self, key: str, body: bytes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_render(
+        self, namespace: str, params: str, render: Callable[[], bytes]
+    ) -> Tuple[bytes, bool]:
+        """
+        Return the cached body for a request, rendering and storing it on a miss.
+
+        Returns:
+            Tuple[bytes, bool]: The body and whether it came from the cache
+        """
+        local_generation = self._generations.get(namespace, 0)
+        shared_generation = None
+        shared_key = None
+        if self._redis is not None:
+            try:
+                shared_generation = await self._shared_generation(namespace)
+                shared_key = f"cache:{namespace}:{shared_generation}:{params}"
+            except Exception as e:
+                logger.warning(f"Response cache Redis lookup failed: {str(e)}")
+        local_key = f"{namespace}:{local_generation}:{shared_generation}:{params}"
+
+        body = self._get_local(local_key)
+        if body is None and shared_key is not None:
+            try:
+                body = await self._redis.get(shared_key)
+            except Exception as e:
+                logger.warning(f"Response cache Redis lookup failed: {str(e)}")
+            if body is not None:
+                self._set_local(local_key, body)
+        if body is not None:
+            response_cache_requests_total.inc(namespace=namespace, result="hit")
+            return body, True
+
+        response_cache_requests_total.inc(namespace=namespace, result="miss")
+        body = render()
+        # Don't store a body rendered while a write bumped the generation
+        if self._generations.get(namespace, 0) == local_generation:
+            self._set_local(local_key, body)
+            if shared_key is not None:
+                try:
+                    await self._redis.set(shared_key, body, ex=max(int(self.ttl), 1))
+                except Exception as e:
+                    logger.warning(f"Response cache Redis store failed: {str(e)}")
+        return body, False
+
+
+# Module-level cache shared by the opted-in routes, the services that bump
+# generations and the lifespan of the application
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+
+def bump_generation(namespace: str) -> None:
+    """Invalidate every cached response of a namespace."""
+    response_cache.bump_generation(namespace)
+
+
+async def cached_response(
+    request: Request, namespace: str, render: Callable[[], bytes]
+) -> Response:
+    """
+    Serve a JSON response from the cache, keyed by the request's query string.
+
+    Args:
+        request: The current request
+        namespace: Cache namespace; ``bump_generation(namespace)`` invalidates it
+        render: Produces the serialized JSON body on a miss
+
+    Returns:
+        Response: The JSON response, with ``X-Cache: HIT`` or ``MISS``
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return Response(render(), media_type="application/json")
+
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    body, hit = await response_cache.get_or_render(namespace, params, render)
+    return Response(
+        body,
+        media_type="application/json",
+        headers={"X-Cache": "HIT" if hit else "MISS"},
+    )
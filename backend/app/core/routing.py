@@ -0,0 +1,90 @@
+"""
+Route class that returns database connections to the pool early.
+
+A ``yield`` dependency such as ``get_db`` is only closed once the response has
+been serialized, so a request holds its pool connection through response
+validation and serialization even though its last query ran long before.
+Routes built with ``SessionReleasingRoute`` close every session handed out by
+``get_db`` as soon as the endpoint function returns. Sessions check out a
+connection lazily on their first query, so a request that never queries never
+touches the pool at all.
+"""
+
+import asyncio
+import functools
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, List, Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+
+# Sessions opened for the current request; the list is shared with the
+# threadpool that runs sync dependencies, which gets a copy of the context
+_request_sessions: ContextVar[Optional[List[Session]]] = ContextVar(
+    "request_sessions", default=None
+)
+
+
+def release_on_return(session: Session) -> None:
+    """Close a session when the endpoint of the current request returns."""
+    sessions = _request_sessions.get()
+    if sessions is not None:
+        sessions.append(session)
+
+
+def _close_sessions() -> None:
+    sessions = _request_sessions.get()
+    while sessions:
+        sessions.pop().close()
+
+
+class SessionReleasingRoute(APIRoute):
+    """
+    APIRoute that closes request sessions before the response is serialized.
+
+    Endpoints must return data that is already loaded: objects are detached
+    once their session is closed.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, endpoint, **kwargs)
+        call = self.dependant.call
+        assert call is not None
+
+        # The request handler was built for the original call; the wrapper
+        # must keep it sync or async accordingly
+        if asyncio.iscoroutinefunction(call):
+
+            @functools.wraps(call)
+            async def release_after(**values: Any) -> Any:
+                try:
+                    return await call(**values)
+                finally:
+                    _close_sessions()
+
+            self.dependant.call = release_after
+        else:
+
+            @functools.wraps(call)
+            def release_after_sync(**values: Any) -> Any:
+                try:
+                    return call(**values)
+                finally:
+                    _close_sessions()
+
+            self.dependant.call = release_after_sync
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            token = _request_sessions.set([])
+            try:
+                return await handler(request)
+            finally:
+                # Sessions of requests that failed before the endpoint ran
+                _close_sessions()
+                _request_sessions.reset(token)
+
+        return route_handler
@@ -0,0 +1,296 @@
+"""
+Multi-process server launcher.
+
+Binds one listening socket in a supervisor process and spawns uvicorn worker
+processes that all accept on it. The worker count is exported as
+``WEB_CONCURRENCY`` before the workers start, so each worker's database pools
+get their share of ``DB_MAX_CONNECTIONS`` (see ``app.core.database``). Workers
+are recycled after ``WORKER_MAX_REQUESTS`` requests or once their RSS has grown
+by ``WORKER_MAX_RSS_GROWTH_MB``, and the supervisor replaces any worker that exits.
+A worker that crashes is replaced after a backoff that doubles with each crash
+in a row, up to ``WORKER_RESTART_BACKOFF_MAX``; after
+``WORKER_MAX_CONSECUTIVE_FAILURES`` crashes in a row the supervisor stops and
+exits with status 1 instead of restarting a broken deployment forever.
+
+Run with:
+
+    python -m app.core.server --workers 4 --port 8000
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from multiprocessing.context import SpawnProcess
+from types import FrameType
+from typing import Dict, List, Optional
+
+import uvicorn
+from app.core.config import Settings, settings
+from app.core.process import current_rss_bytes
+from pydantic import ValidationError
+
+# Get logger for this module; named explicitly since it usually runs as __main__
+logger = logging.getLogger("app.core.server")
+
+multiprocessing.allow_connection_pickling()
+spawn = multiprocessing.get_context("spawn")
+
+APP_IMPORT_STRING = "app.main:app"
+
+# How often the supervisor and the RSS watchdog check on workers, in seconds
+SUPERVISOR_INTERVAL = 0.5
+RSS_CHECK_INTERVAL = 10.0
+# A worker that stayed up this long, in seconds, clears its slot's crash count
+WORKER_STABLE_UPTIME = 60.0
+
+
+def _watch_rss(server: uvicorn.Server, max_growth_bytes: int) -> None:
+    """
+    Ask the worker to exit gracefully once its RSS has grown past the limit.
+    """
+    baseline = current_rss_bytes()
+    while not server.should_exit:
+        time.sleep(RSS_CHECK_INTERVAL)
+        growth = current_rss_bytes() - baseline
+        if growth > max_growth_bytes:
+            logger.warning(
+                f"Worker {os.getpid()} RSS grew by {growth // (1024 * 1024)} MB, "
+                "recycling"
+            )
+            server.should_exit = True
+            return
+
+
+class _DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that starts draining the application before it waits for
+    open connections, so streaming responses end instead of running into
+    ``timeout_graceful_shutdown``.
+    """
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        # Imported here: the supervisor never loads the application
+        from app.core.lifecycle import request_tracker
+
+        request_tracker.start_draining()
+        await super().shutdown(sockets)
+
+
+def _run_worker(
+    sockets: List[socket.socket], host: str, port: int, log_level: str
+) -> None:
+    """
+    Entry point of a worker process.
+    """
+    max_requests = settings.WORKER_MAX_REQUESTS or None
+    if max_requests and settings.WORKER_MAX_REQUESTS_JITTER:
+        # Spread recycling out so workers don't all restart at once
+        max_requests += random.randint(0, settings.WORKER_MAX_REQUESTS_JITTER)
+
+    config = uvicorn.Config(
+        APP_IMPORT_STRING,
+        host=host,
+        port=port,
+        log_level=log_level,
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=settings.SHUTDOWN_DRAIN_TIMEOUT,
+    )
+    server = _DrainingServer(config)
+
+    if settings.WORKER_MAX_RSS_GROWTH_MB:
+        threading.Thread(
+            target=_watch_rss,
+            args=(server, settings.WORKER_MAX_RSS_GROWTH_MB * 1024 * 1024),
+            name="rss-watchdog",
+            daemon=True,
+        ).start()
+
+    server.run(sockets=sockets)
+
+
+class Supervisor:
+    """
+    Keep a fixed number of worker processes running on a shared socket.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        log_level: str,
+        restart_backoff: float = settings.WORKER_RESTART_BACKOFF,
+        restart_backoff_max: float = settings.WORKER_RESTART_BACKOFF_MAX,
+        max_consecutive_failures: int = settings.WORKER_MAX_CONSECUTIVE_FAILURES,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self.restart_backoff = restart_backoff
+        self.restart_backoff_max = restart_backoff_max
+        self.max_consecutive_failures = max_consecutive_failures
+        self.processes: Dict[int, SpawnProcess] = {}
+        # Per slot: when its worker started, its crashes in a row and, while it
+        # waits out its backoff, when it is restarted
+        self.started_at: Dict[int, float] = {}
+        self.failures: Dict[int, int] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.exit_code = 0
+        self.should_exit = threading.Event()
+        self.socket: Optional[socket.socket] = None
+
+    def _bind_socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, slot: int) -> None:
+        process = spawn.Process(
+            target=_run_worker,
+            args=([self.socket], self.host, self.port, self.log_level),
+            name=f"worker-{slot}",
+        )
+        process.start()
+        self.processes[slot] = process
+        self.started_at[slot] = time.monotonic()
+        logger.info(f"Started worker {slot} [{process.pid}]")
+
+    def reap(self, now: float) -> None:
+        """
+        Schedule the replacement of every worker that exited.
+
+        A clean exit (recycling) is replaced right away. A crash is replaced after
+        ``restart_backoff * 2 ** (crashes in a row - 1)`` seconds, at most
+        ``restart_backoff_max``; reaching ``max_consecutive_failures`` stops the
+        supervisor.
+        """
+        for slot, process in list(self.processes.items()):
+            if process.is_alive():
+                if now - self.started_at[slot] >= WORKER_STABLE_UPTIME:
+                    self.failures[slot] = 0
+                continue
+
+            process.join()
+            del self.processes[slot]
+            if process.exitcode == 0:
+                logger.info(f"Worker {slot} [{process.pid}] exited, replacing")
+                self.failures[slot] = 0
+                self.restart_at[slot] = now
+                continue
+
+            failures = self.failures.get(slot, 0) + 1
+            self.failures[slot] = failures
+            if (
+                self.max_consecutive_failures
+                and failures >= self.max_consecutive_failures
+            ):
+                logger.error(
+                    f"Worker {slot} [{process.pid}] exited with code "
+                    f"{process.exitcode}, {failures} crashes in a row, giving up"
+                )
+                self.exit_code = 1
+                self.should_exit.set()
+                return
+
+            delay = min(
+                self.restart_backoff * 2 ** (failures - 1), self.restart_backoff_max
+            )
+            logger.warning(
+                f"Worker {slot} [{process.pid}] exited with code {process.exitcode}, "
+                f"replacing in {delay:.1f}s"
+            )
+            self.restart_at[slot] = now + delay
+
+    def respawn(self, now: float) -> None:
+        """
+        Start the workers whose restart is due.
+        """
+        for slot, restart_at in list(self.restart_at.items()):
+            if restart_at <= now:
+                del self.restart_at[slot]
+                self._spawn(slot)
+
+    def handle_signal(self, sig: int, frame: Optional[FrameType]) -> None:
+        self.should_exit.set()
+
+    def run(self) -> int:
+        # Workers size their connection pools from the worker count
+        os.environ["WEB_CONCURRENCY"] = str(self.workers)
+
+        self.socket = self._bind_socket()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.handle_signal)
+
+        logger.info(
+            f"Supervisor [{os.getpid()}] listening on {self.host}:{self.port} "
+            f"with {self.workers} workers"
+        )
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self.should_exit.wait(SUPERVISOR_INTERVAL):
+            self.reap(time.monotonic())
+            if not self.should_exit.is_set():
+                self.respawn(time.monotonic())
+
+        self.shutdown()
+        return self.exit_code
+
+    def shutdown(self) -> None:
+        logger.info("Stopping workers")
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        # Give workers time to drain in-flight requests before killing them
+        deadline = time.monotonic() + settings.SHUTDOWN_DRAIN_TIMEOUT + 5
+        for process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f"Worker [{process.pid}] did not stop in time, killing")
+                process.kill()
+                process.join()
+
+        if self.socket is not None:
+            self.socket.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point for the launcher.
+    """
+    parser = argparse.ArgumentParser(description="Multi-process server launcher")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    workers = max(args.workers, 1)
+
+    # Refuse here rather than in every worker once they start
+    try:
+        Settings.model_validate({**settings.model_dump(), "WEB_CONCURRENCY": workers})
+    except ValidationError as e:
+        # Only the messages: the input would print every setting, secrets included
+        messages = "; ".join(error["msg"] for error in e.errors())
+        parser.error(f"the database pools do not fit {workers} workers: {messages}")
+
+    from app.core.logging_config import setup_logging
+
+    setup_logging()
+    return Supervisor(args.host, args.port, workers, args.log_level).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+from .diagnostics_router import router as diagnostics_router
+
+__all__ = ["diagnostics_router"]
@@ -0,0 +1,117 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from app.auth.deps.auth_deps import get_current_superuser
+from app.core.routing import SessionReleasingRoute
+from app.diagnostics.schemas.memory import (
+    AllocationReport,
+    MemoryDump,
+    MemoryStatus,
+    ObjectHistogram,
+)
+from app.user.models.user import User as UserModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+if TYPE_CHECKING:
+    from app.diagnostics.services.memory_service import MemoryMonitor
+
+# Every endpoint reports on the worker process that serves the request; the
+# pid in each response tells the workers apart
+router = APIRouter(
+    prefix="/diagnostics", tags=["diagnostics"], route_class=SessionReleasingRoute
+)
+
+
+def get_memory_monitor() -> "MemoryMonitor":
+    """
+    Return the memory monitor of this worker.
+
+    Imported on first use so that tracemalloc and the diagnostics service stay
+    out of the import path of the application.
+    """
+    from app.diagnostics.services.memory_service import memory_monitor
+
+    return memory_monitor
+
+
+# Module-level variables for Depends(get_current_superuser) and
+# Depends(get_memory_monitor)
+superuser_authentication = Depends(get_current_superuser)
+worker_memory_monitor = Depends(get_memory_monitor)
+
+
+@router.get("/memory", response_model=MemoryStatus)
+async def memory_status(
+    current_user: UserModel = superuser_authentication,
+    memory_monitor: "MemoryMonitor" = worker_memory_monitor,
+) -> MemoryStatus:
+    """RSS, traced memory and garbage collector counts of this worker."""
+    return await asyncio.to_thread(memory_monitor.status)
+
+
+@router.post("/memory/baseline", response_model=MemoryStatus)
+async def take_memory_baseline(
+    current_user: UserModel = superuser_authentication,
+    memory_monitor: "MemoryMonitor" = worker_memory_monitor,
+) -> MemoryStatus:
+    """
+    Start tracing allocations if needed and make now the baseline of
+    ``GET /diagnostics/memory/allocations``.
+    """
+    await asyncio.to_thread(memory_monitor.take_baseline)
+    return await asyncio.to_thread(memory_monitor.status)
+
+
+@router.delete("/memory/tracing", status_code=status.HTTP_204_NO_CONTENT)
+async def stop_memory_tracing(
+    current_user: UserModel = superuser_authentication,
+    memory_monitor: "MemoryMonitor" = worker_memory_monitor,
+) -> Response:
+    """Stop tracing allocations and drop the baseline."""
+    await asyncio.to_thread(memory_monitor.stop_tracing)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/memory/allocations", response_model=AllocationReport)
+async def memory_allocations(
+    depth: int = Query(3, ge=1, le=10),
+    limit: int = Query(25, ge=1, le=500),
+    current_user: UserModel = superuser_authentication,
+    memory_monitor: "MemoryMonitor" = worker_memory_monitor,
+) -> AllocationReport:
+    """
+    Growth of traced memory since the baseline, grouped by module.
+
+    ``depth`` is the number of module name parts to group by: 3 groups
+    ``app.user.services.user_service`` under ``app.user.services``.
+    """
+    from app.diagnostics.services.memory_service import TracingDisabled
+
+    try:
+        return await asyncio.to_thread(memory_monitor.allocations, depth, limit)
+    except TracingDisabled:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Allocations are not traced, POST /diagnostics/memory/baseline first",
+        )
+
+
+@router.get("/memory/objects", response_model=ObjectHistogram)
+async def memory_objects(
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: UserModel = superuser_authentication,
+    memory_monitor: "MemoryMonitor" = worker_memory_monitor,
+) -> ObjectHistogram:
+    """Live objects by type, with the change since the previous call."""
+    return await asyncio.to_thread(memory_monitor.object_histogram, limit)
+
+
+@router.post(
+    "/memory/dumps", response_model=MemoryDump, status_code=status.HTTP_201_CREATED
+)
+async def dump_memory(
+    current_user: UserModel = superuser_authentication,
+    memory_monitor: "MemoryMonitor" = worker_memory_monitor,
+) -> MemoryDump:
+    """Write the diagnostics of this worker to ``MEMORY_DUMP_DIR``."""
+    return await asyncio.to_thread(memory_monitor.dump)
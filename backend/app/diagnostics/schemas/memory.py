@@ -0,0 +1,62 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class MemoryStatus(BaseModel):
+    """Memory of the worker process that served the request."""
+
+    pid: int
+    rss_bytes: int
+    baseline_rss_bytes: int
+    peak_rss_bytes: int
+    rss_growth_bytes: int
+    tracing: bool
+    traced_bytes: Optional[int] = None
+    traced_peak_bytes: Optional[int] = None
+    gc_counts: List[int]
+    dumps: List[str] = []
+
+
+class AllocationDiff(BaseModel):
+    """Change of the memory allocated from one module since the baseline."""
+
+    module: str
+    size_bytes: int
+    size_diff_bytes: int
+    count: int
+    count_diff: int
+
+
+class AllocationReport(BaseModel):
+    """Traced allocations grouped by module, compared with the baseline snapshot."""
+
+    pid: int
+    baseline_taken_at: float
+    taken_at: float
+    total_diff_bytes: int
+    modules: List[AllocationDiff]
+
+
+class ObjectCount(BaseModel):
+    """Live objects of one type, and the change since the previous histogram."""
+
+    type: str
+    count: int
+    count_diff: int
+
+
+class ObjectHistogram(BaseModel):
+    """Live objects tracked by the garbage collector, by type."""
+
+    pid: int
+    total: int
+    types: List[ObjectCount]
+
+
+class MemoryDump(BaseModel):
+    """Files written by a memory dump."""
+
+    pid: int
+    report: str
+    snapshot: Optional[str] = None
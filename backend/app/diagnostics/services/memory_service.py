@@ -0,0 +1,328 @@
+"""
+Memory diagnostics of a worker process.
+
+Every worker samples its RSS every ``MEMORY_CHECK_INTERVAL_SECONDS`` and exports
+it as metrics. For leak hunting, admins get three views of the worker that
+serves their request:
+
+- traced allocations (tracemalloc) compared with a baseline snapshot and
+  grouped by module, e.g. ``app.user.services`` or ``sqlalchemy.orm``;
+- a histogram of the live objects tracked by the garbage collector, by type,
+  with the change since the previous histogram;
+- RSS now, at start and at its peak.
+
+Tracing slows every allocation down, so it starts with the worker only with
+``MEMORY_TRACEMALLOC_ENABLED``; otherwise an admin starts it by taking a
+baseline. With ``MEMORY_DUMP_RSS_GROWTH_MB`` set, each time RSS grows by that
+much more a report (and the tracemalloc snapshot, when tracing) is written to
+``MEMORY_DUMP_DIR``. Keep it below ``WORKER_MAX_RSS_GROWTH_MB`` so that the
+evidence is on disk before the worker is recycled.
+"""
+
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter as CountMap
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+from app.core.process import current_rss_bytes
+from app.diagnostics.schemas.memory import (
+    AllocationDiff,
+    AllocationReport,
+    MemoryDump,
+    MemoryStatus,
+    ObjectCount,
+    ObjectHistogram,
+)
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+process_rss_bytes = Gauge(
+    "process_resident_memory_bytes", "Resident set size of this worker process"
+)
+process_rss_growth_bytes = Gauge(
+    "process_resident_memory_growth_bytes", "RSS growth of this worker since it started"
+)
+tracemalloc_traced_bytes = Gauge(
+    "tracemalloc_traced_bytes", "Memory traced by tracemalloc, 0 when not tracing"
+)
+memory_dumps_total = Counter(
+    "memory_dumps_total", "Memory dumps written, by trigger", labelnames=("trigger",)
+)
+
+# Allocations made by tracemalloc and the import system are not the app's
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class TracingDisabled(Exception):
+    """Raised when allocations are requested while tracemalloc is not tracing."""
+
+
+@lru_cache(maxsize=4096)
+def module_name(filename: str, depth: int) -> str:
+    """
+    Dotted module of a source file, cut to its first ``depth`` parts.
+
+    ``.../backend/app/user/services/user_service.py`` at depth 3 is
+    ``app.user.services``. Files outside ``sys.path`` keep their name.
+    """
+    path = os.path.abspath(filename)
+    roots = sorted((os.path.abspath(p) for p in sys.path if p), key=len, reverse=True)
+    for root in roots:
+        if path.startswith(root + os.sep):
+            relative = os.path.splitext(path[len(root) + 1 :])[0]  # noqa: E203
+            parts = [part for part in relative.split(os.sep) if part != "__init__"]
+            return ".".join(parts[:depth])
+    return filename
+
+
+class MemoryMonitor(BackgroundWorker):
+    """
+    Track the RSS of this worker and serve allocation and object diagnostics.
+    """
+
+    name = "memory-monitor"
+
+    def __init__(
+        self,
+        interval: float,
+        tracemalloc_frames: int,
+        dump_growth_bytes: int,
+        dump_dir: str,
+        max_dump_files: int,
+    ) -> None:
+        super().__init__(interval)
+        self.tracemalloc_frames = tracemalloc_frames
+        self.dump_growth_bytes = dump_growth_bytes
+        self.dump_dir = Path(dump_dir)
+        self.max_dump_files = max_dump_files
+        self.baseline_rss = current_rss_bytes()
+        self.peak_rss = self.baseline_rss
+        self._next_dump_growth = dump_growth_bytes
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_taken_at = 0.0
+        self._object_counts: Dict[str, int] = {}
+        # Snapshots and histograms are expensive; one at a time
+        self._lock = threading.Lock()
+
+    def start(self, trace: bool = False) -> None:
+        """Start sampling RSS, and tracing allocations if asked to."""
+        self.baseline_rss = current_rss_bytes()
+        self.peak_rss = self.baseline_rss
+        self._next_dump_growth = self.dump_growth_bytes
+        if trace:
+            self.take_baseline()
+        super().start()
+
+    def stop(self, flush: bool = True, timeout: Optional[float] = None) -> None:
+        super().stop(flush=flush, timeout=timeout)
+        self.stop_tracing()
+
+    def run_once(self) -> None:
+        rss = current_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        growth = rss - self.baseline_rss
+        process_rss_bytes.set(rss)
+        process_rss_growth_bytes.set(growth)
+        tracemalloc_traced_bytes.set(tracemalloc.get_traced_memory()[0])
+
+        if self.dump_growth_bytes and growth >= self._next_dump_growth:
+            # Next dump after another step of growth
+            steps = growth // self.dump_growth_bytes + 1
+            self._next_dump_growth = steps * self.dump_growth_bytes
+            logger.warning(
+                f"Worker {os.getpid()} RSS grew by {growth // (1024 * 1024)} MB, "
+                "dumping memory diagnostics"
+            )
+            self.dump(trigger="threshold")
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def take_baseline(self) -> None:
+        """Start tracing if needed and compare later allocations with now."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.tracemalloc_frames)
+                logger.info(f"Tracing allocations in worker {os.getpid()}")
+            self._baseline = self._snapshot()
+            self._baseline_taken_at = time.time()
+
+    def stop_tracing(self) -> None:
+        with self._lock:
+            self._baseline = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info(f"Stopped tracing allocations in worker {os.getpid()}")
+
+    def status(self) -> MemoryStatus:
+        rss = current_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        return MemoryStatus(
+            pid=os.getpid(),
+            rss_bytes=rss,
+            baseline_rss_bytes=self.baseline_rss,
+            peak_rss_bytes=self.peak_rss,
+            rss_growth_bytes=rss - self.baseline_rss,
+            tracing=self.tracing,
+            traced_bytes=traced if self.tracing else None,
+            traced_peak_bytes=traced_peak if self.tracing else None,
+            gc_counts=list(gc.get_count()),
+            dumps=[path.name for path in self._dump_reports()],
+        )
+
+    def allocations(
+        self,
+        depth: int = 3,
+        limit: int = 25,
+        snapshot: Optional[tracemalloc.Snapshot] = None,
+    ) -> AllocationReport:
+        """
+        Traced memory by module, compared with the baseline snapshot.
+
+        Args:
+            depth: Number of module name parts to group by
+            limit: Number of modules to return, largest growth first
+            snapshot: Snapshot to compare, a new one by default
+
+        Raises:
+            TracingDisabled: tracemalloc is not tracing
+        """
+        with self._lock:
+            if self._baseline is None or not tracemalloc.is_tracing():
+                raise TracingDisabled("Allocations are not being traced")
+            baseline, baseline_taken_at = self._baseline, self._baseline_taken_at
+            snapshot = snapshot or self._snapshot()
+        taken_at = time.time()
+
+        # size, size_diff, count, count_diff per module
+        totals: Dict[str, List[int]] = {}
+        for diff in snapshot.compare_to(baseline, "filename"):
+            module = module_name(diff.traceback[0].filename, depth)
+            entry = totals.setdefault(module, [0, 0, 0, 0])
+            entry[0] += diff.size
+            entry[1] += diff.size_diff
+            entry[2] += diff.count
+            entry[3] += diff.count_diff
+
+        modules = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return AllocationReport(
+            pid=os.getpid(),
+            baseline_taken_at=baseline_taken_at,
+            taken_at=taken_at,
+            total_diff_bytes=sum(entry[1] for entry in totals.values()),
+            modules=[
+                AllocationDiff(
+                    module=module,
+                    size_bytes=size,
+                    size_diff_bytes=size_diff,
+                    count=count,
+                    count_diff=count_diff,
+                )
+                for module, (size, size_diff, count, count_diff) in modules[:limit]
+            ],
+        )
+
+    def object_histogram(self, limit: int = 50) -> ObjectHistogram:
+        """
+        Live objects tracked by the garbage collector by type, most common first.
+
+        The change is relative to the previous histogram of this worker.
+        """
+        with self._lock:
+            counts = CountMap(
+                f"{type(obj).__module__}.{type(obj).__qualname__}"
+                for obj in gc.get_objects()
+            )
+            previous, self._object_counts = self._object_counts, dict(counts)
+        return ObjectHistogram(
+            pid=os.getpid(),
+            total=sum(counts.values()),
+            types=[
+                ObjectCount(
+                    type=name, count=count, count_diff=count - previous.get(name, 0)
+                )
+                for name, count in counts.most_common(limit)
+            ],
+        )
+
+    def _dump_reports(self) -> List[Path]:
+        if not self.dump_dir.is_dir():
+            return []
+        return sorted(
+            self.dump_dir.glob("memory-*.json"), key=lambda p: p.stat().st_mtime
+        )
+
+    def dump(self, trigger: str = "manual") -> MemoryDump:
+        """
+        Write a report, and the tracemalloc snapshot when tracing, to the dump dir.
+
+        The snapshot loads with ``tracemalloc.Snapshot.load`` for offline
+        analysis. Only the newest ``max_dump_files`` dumps are kept.
+        """
+        self.dump_dir.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        timestamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        stem = f"memory-{os.getpid()}-{timestamp}.{int(now * 1000) % 1000:03d}-{trigger}"
+        report: Dict[str, object] = {
+            "trigger": trigger,
+            "status": self.status().model_dump(),
+            "objects": self.object_histogram().model_dump(),
+        }
+
+        snapshot_path = None
+        if self.tracing:
+            snapshot = self._snapshot()
+            snapshot_path = self.dump_dir / f"{stem}.tracemalloc"
+            snapshot.dump(str(snapshot_path))
+            try:
+                report["allocations"] = self.allocations(snapshot=snapshot).model_dump()
+            except TracingDisabled:
+                pass
+
+        report_path = self.dump_dir / f"{stem}.json"
+        report_path.write_text(json.dumps(report, indent=2))
+        memory_dumps_total.inc(trigger=trigger)
+        logger.info(f"Wrote memory dump {report_path}")
+
+        for old_report in self._dump_reports()[: -self.max_dump_files]:
+            old_report.unlink(missing_ok=True)
+            old_report.with_suffix(".tracemalloc").unlink(missing_ok=True)
+
+        return MemoryDump(
+            pid=os.getpid(),
+            report=str(report_path),
+            snapshot=str(snapshot_path) if snapshot_path else None,
+        )
+
+
+# Module-level monitor shared by the diagnostics routes and the lifespan of the
+# application
+memory_monitor = MemoryMonitor(
+    interval=settings.MEMORY_CHECK_INTERVAL_SECONDS,
+    tracemalloc_frames=settings.MEMORY_TRACEMALLOC_FRAMES,
+    dump_growth_bytes=settings.MEMORY_DUMP_RSS_GROWTH_MB * 1024 * 1024,
+    dump_dir=settings.MEMORY_DUMP_DIR,
+    max_dump_files=settings.MEMORY_DUMP_MAX_FILES,
+)
@@ -0,0 +1,69 @@
+from app.core.metrics import registry
+from app.health.schemas.health import HealthStatus, ProbeStatus
+from app.health.services.health_service import health_monitor
+from fastapi import APIRouter, Request, Response, status
+from fastapi.responses import PlainTextResponse
+
+# Probe endpoints live at the root, outside the versioned API prefix
+router = APIRouter(tags=["health"])
+
+LIVE_BODY = b'{"status":"ok"}'
+DEAD_BODY = b'{"status":"unhealthy"}'
+NOT_READY_BODY = b'{"status":"not ready"}'
+
+
+@router.get(
+    "/healthz",
+    response_class=Response,
+    responses={
+        status.HTTP_200_OK: {"model": ProbeStatus},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ProbeStatus},
+    },
+)
+async def liveness() -> Response:
+    """Liveness probe: the process is serving and its event loop is not stalled."""
+    if health_monitor.alive:
+        return Response(LIVE_BODY, media_type="application/json")
+    return Response(
+        DEAD_BODY,
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        media_type="application/json",
+    )
+
+
+@router.get(
+    "/readyz",
+    response_class=Response,
+    responses={
+        status.HTTP_200_OK: {"model": HealthStatus},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"model": HealthStatus},
+    },
+)
+async def readiness(request: Request) -> Response:
+    """
+    Readiness probe: serves the cached result of the background dependency checks.
+
+    Checks marked ``advisory`` (saturation of the bulk pools) are reported but do
+    not fail readiness.
+    """
+    if not getattr(request.app.state, "ready", False):
+        return Response(
+            NOT_READY_BODY,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            media_type="application/json",
+        )
+
+    ready = health_monitor.healthy and health_monitor.fresh
+    return Response(
+        health_monitor.body,
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        media_type="application/json",
+    )
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Metrics of this worker process in the Prometheus text format."""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,27 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class CheckResult(BaseModel):
+    """Outcome of a single dependency check."""
+
+    ok: bool
+    value: Optional[float] = None
+    detail: Optional[str] = None
+    # Set on checks that only warn: a failure does not fail readiness
+    advisory: Optional[bool] = None
+
+
+class ProbeStatus(BaseModel):
+    """Body of the liveness probe."""
+
+    status: str
+
+
+class HealthStatus(BaseModel):
+    """Cached health snapshot served by the probe endpoints."""
+
+    status: str
+    checked_at: Optional[float] = None
+    checks: Dict[str, CheckResult] = {}
@@ -0,0 +1,145 @@
+"""
+Health service module for liveness and readiness probes.
+
+Dependency checks run on a background interval and their result is cached as
+pre-rendered JSON, so probes are answered from memory no matter how often the
+orchestrator calls them.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.database import engines, pool_capacity, pool_saturation
+from app.core.lifecycle import check_readiness
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import Gauge
+from app.health.schemas.health import CheckResult, HealthStatus
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+db_pool_saturation = Gauge(
+    "db_pool_saturation",
+    "Fraction of a connection pool's capacity checked out",
+    labelnames=("pool",),
+)
+
+
+def _is_advisory_pool(name: str, capacity: Optional[int]) -> bool:
+    # The bulk pools run listings, admin and background jobs with long checkout
+    # timeouts; filling them up slows those down but does not make the worker
+    # unfit for traffic, so their saturation only warns. Neither does filling a
+    # pool too small to be anything but full or empty (e.g. an auth pool of one
+    # connection with many workers), or readiness would flap with every request
+    if name == "bulk" or name.startswith("bulk_shard"):
+        return True
+    return capacity is not None and capacity < settings.HEALTH_MIN_GATED_POOL_SIZE
+
+
+def _render(snapshot: HealthStatus) -> bytes:
+    return snapshot.model_dump_json(exclude_none=True).encode("utf-8")
+
+
+class HealthMonitor:
+    """
+    Run dependency checks periodically and keep the latest result in memory.
+    """
+
+    def __init__(self) -> None:
+        self.snapshot = HealthStatus(status="starting")
+        self.body = _render(self.snapshot)
+        self.healthy = False
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._redis: Any = None
+
+    async def run_checks(self) -> None:
+        """Run every dependency check once and cache the outcome."""
+        checks: Dict[str, CheckResult] = {}
+
+        try:
+            readiness = await asyncio.wait_for(
+                check_readiness(self._redis), settings.HEALTH_CHECK_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            readiness = {"database": False, "redis": False}
+        for name, ok in readiness.items():
+            checks[name] = CheckResult(ok=ok)
+
+        for name, pool_engine in engines.items():
+            saturation = pool_saturation(pool_engine)
+            if saturation is None:
+                continue
+            db_pool_saturation.set(saturation, pool=name)
+            checks[f"db_pool_{name}"] = CheckResult(
+                ok=saturation < settings.HEALTH_MAX_POOL_SATURATION,
+                value=saturation,
+                advisory=(
+                    True if _is_advisory_pool(name, pool_capacity(pool_engine)) else None
+                ),
+            )
+
+        checks["event_loop_lag"] = CheckResult(
+            ok=loop_monitor.lag < settings.HEALTH_MAX_LOOP_LAG, value=loop_monitor.lag
+        )
+
+        self.healthy = all(check.ok or check.advisory for check in checks.values())
+        self.snapshot = HealthStatus(
+            status="ok" if self.healthy else "degraded",
+            checked_at=time.time(),
+            checks=checks,
+        )
+        self.body = _render(self.snapshot)
+        if not self.healthy:
+            logger.warning(f"Health check degraded: {self.body.decode()}")
+        else:
+            for name, check in checks.items():
+                if not check.ok:
+                    logger.warning(f"Health check {name} failed: {check.value}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL)
+            try:
+                await self.run_checks()
+            except Exception as e:
+                logger.error(f"Health check failed: {str(e)}", exc_info=True)
+
+    async def start(self, redis_connection: Any) -> None:
+        """Run the first checks immediately, then keep refreshing in the background."""
+        self._redis = redis_connection
+        await self.run_checks()
+        self._task = asyncio.create_task(self._run(), name="health-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def alive(self) -> bool:
+        """The monitor task is running and the event loop is not stalled."""
+        return (
+            self._task is not None
+            and not self._task.done()
+            and loop_monitor.lag < settings.HEALTH_MAX_LOOP_LAG_LIVENESS
+        )
+
+    @property
+    def fresh(self) -> bool:
+        """The cached result is recent enough to be trusted."""
+        checked_at = self.snapshot.checked_at
+        return (
+            checked_at is not None
+            and time.time() - checked_at < settings.HEALTH_CHECK_INTERVAL * 3
+        )
+
+
+# Module-level monitor shared by the lifespan and the probe routes
+health_monitor = HealthMonitor()
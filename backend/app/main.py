@@ -1,11 +1,26 @@
+import asyncio
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
 import redis.asyncio as redis  # type: ignore
+from app.audit.services.audit_service import audit_writer
 from app.auth.routes.auth_router import router as auth_router
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.database import dispose_engines, warm_async_pool, warm_pool
+from app.core.idempotency import create_idempotency_store
+from app.core.lifecycle import RequestDrainMiddleware, flush_logs, request_tracker
 from app.core.logging_config import setup_logging
+from app.core.loop_monitor import loop_monitor
+from app.core.openapi import install_precompiled_openapi, warm_openapi_document
+from app.core.response_cache import response_cache
+from app.diagnostics.routes.diagnostics_router import router as diagnostics_router
+from app.health.routes.health_router import router as health_router
+from app.health.services.health_service import health_monitor
 from app.user.routes.user_router import router as user_router
+from app.user.services.activity_service import activity_buffer
+from app.user.services.change_feed_service import user_change_relays
+from app.user.services.purge_service import user_purger
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -19,13 +34,69 @@ logger = setup_logging()
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # Startup
-    redis_connection = redis.from_url("redis://localhost:6379", encoding="utf8")
+    logger.info("Application startup")
+    loop_monitor.start()
+    redis_connection = redis.from_url(settings.REDIS_URL, encoding="utf8")
+    app.state.redis = redis_connection
     await FastAPILimiter.init(redis_connection)
+    app.state.idempotency_store = create_idempotency_store(redis_connection)
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        response_cache.configure(redis_connection)
+
+    # Render the OpenAPI schema now rather than on the first docs request
+    warm_openapi_document(app)
+
+    # Open pool connections before the worker starts accepting traffic
+    if settings.DB_POOL_WARM:
+        try:
+            warm_pool()
+            await warm_async_pool()
+        except Exception as e:
+            logger.warning(f"Could not warm database pools: {str(e)}")
+
+    # Run the readiness checks once, then keep them running in the background
+    # for the probe endpoints
+    await health_monitor.start(redis_connection)
+    logger.info(f"Startup readiness check: {health_monitor.body.decode()}")
+    activity_buffer.start()
+    audit_writer.start()
+    user_purger.start()
+    for relay in user_change_relays.values():
+        relay.start()
+    # After startup, so the RSS baseline includes the warmed pools and caches;
+    # imported here to keep tracemalloc out of the import path of the app
+    from app.diagnostics.services.memory_service import memory_monitor
+
+    memory_monitor.start(trace=settings.MEMORY_TRACEMALLOC_ENABLED)
+    app.state.ready = True
 
     yield
 
-    # Shutdown
+    # Shutdown: stop taking new requests and let in-flight ones finish
+    logger.info("Application shutdown")
+    app.state.ready = False
+    request_tracker.start_draining()
+    if not await request_tracker.wait_idle(settings.SHUTDOWN_DRAIN_TIMEOUT):
+        logger.warning(
+            f"{request_tracker.in_flight} requests still in flight after "
+            f"{settings.SHUTDOWN_DRAIN_TIMEOUT}s, shutting down anyway"
+        )
+
+    await health_monitor.stop()
+    await loop_monitor.stop()
+    await asyncio.gather(*(relay.stop() for relay in user_change_relays.values()))
+
+    # Write buffered login/activity timestamps and audit events before the
+    # pools go away
+    await asyncio.to_thread(activity_buffer.stop, flush=True)
+    await asyncio.to_thread(user_purger.stop, flush=False)
+    await asyncio.to_thread(audit_writer.stop, flush=True)
+    await asyncio.to_thread(memory_monitor.stop, flush=False)
+
+    # Closes the limiter's Redis connection, which is the shared one
     await FastAPILimiter.close()
+    await dispose_engines()
+    flush_logs()
 
 
 # Initialize FastAPI application with lifespan
@@ -43,6 +114,11 @@ app = FastAPI(
 # Include API routers
 app.include_router(auth_router, prefix=settings.API_V1_STR, tags=["auth"])
 app.include_router(user_router, prefix=settings.API_V1_STR, tags=["users"])
+app.include_router(health_router)
+app.include_router(diagnostics_router, prefix=settings.API_V1_STR, tags=["diagnostics"])
+
+# Serve the OpenAPI schema as precompiled bytes with an ETag
+install_precompiled_openapi(app, schema_path=settings.OPENAPI_SCHEMA_PATH)
 
 # Set up CORS middleware
 app.add_middleware(
@@ -62,6 +138,21 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Compress responses; added last so it wraps CORS and sees the final headers
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    levels={
+        "gzip": settings.COMPRESSION_GZIP_LEVEL,
+        "br": settings.COMPRESSION_BROTLI_QUALITY,
+        "zstd": settings.COMPRESSION_ZSTD_LEVEL,
+    },
+    cacheable_paths=[app.openapi_url],
+)
+
+# Outermost middleware: tracks in-flight requests and rejects new ones while draining
+app.add_middleware(RequestDrainMiddleware)
+
 # Include API routes here
 # from app.api.v1.routers import router as api_router
 # app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -96,20 +187,6 @@ async def validation_exception_handler(
     )
 
 
-@app.on_event("startup")
-async def startup_event() -> None:
-    """Run application startup events."""
-    logger.info("Application startup")
-    # Add any startup events here (e.g., database initialization)
-
-
-@app.on_event("shutdown")
-async def shutdown_event() -> None:
-    """Run application shutdown events."""
-    logger.info("Application shutdown")
-    # Add any cleanup events here
-
-
 @app.get("/")
 async def root() -> dict[str, str]:
     """Root endpoint that returns a welcome message.
@@ -0,0 +1 @@
+from .todo import Todo  # noqa
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from app.core.database import Base
+from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func
+
+if TYPE_CHECKING:
+    from app.user.models.user import User
+
+
+class Todo(Base):
+    """
+    Todo model representing a task owned by a user.
+    """
+
+    __tablename__ = "todos"
+    # Stored on the shard of the owner
+    __shard_key__ = "owner_id"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    completed: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    owner_id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        onupdate=func.now(),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    # Relationships
+    owner: Mapped["User"] = relationship("User", back_populates="todos", lazy="raise")
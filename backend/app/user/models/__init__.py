@@ -1 +1,2 @@
 from .user import User  # noqa
+from .user_outbox import UserOutbox  # noqa
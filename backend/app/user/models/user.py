@@ -1,8 +1,24 @@
-from app.core.database import Base
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
-from sqlalchemy.orm import relationship
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional
+
+from app.core.database import SHARDING_ENABLED, Base
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Boolean,
+    DateTime,
+    Index,
+    Integer,
+    Sequence,
+    String,
+    event,
+)
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
+if TYPE_CHECKING:
+    from app.todo.models.todo import Todo
+
 
 class User(Base):
     """
@@ -10,25 +26,102 @@ class User(Base):
     """
 
     __tablename__ = "users"
+    # Sharded by the user itself (see app.core.database); ids carry the shard
+    __shard_key__ = "id"
 
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String(50), unique=True, index=True, nullable=False)
-    email = Column(String(255), unique=True, index=True, nullable=False)
-    hashed_password = Column(String(255), nullable=False)
-    fullname = Column(String(100), nullable=True)
-    is_active = Column(Boolean, default=True, nullable=False)
-    is_superuser = Column(Boolean, default=False, nullable=False)
+    # 64-bit: sharded ids are a sequence value times SHARD_ID_STRIDE
+    id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True
+    )
+    username: Mapped[str] = mapped_column(
+        String(50), unique=True, index=True, nullable=False
+    )
+    email: Mapped[str] = mapped_column(
+        String(255), unique=True, index=True, nullable=False
+    )
+    hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
+    fullname: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    is_superuser: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
     # Timestamps
-    created_at = Column(
+    created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
-    updated_at = Column(
+    updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         onupdate=func.now(),
         server_default=func.now(),
         nullable=False,
     )
+    # Written in batches by app.user.services.activity_service
+    last_login_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    last_seen_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # Set by a soft delete; the row is purged in the background later
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    # Relationships; never lazy loaded, ask for them with
+    # UserService.get_user(..., with_todos=True). Deleting a user leaves the
+    # todos to the ON DELETE CASCADE foreign key instead of loading them.
+    todos: Mapped[List["Todo"]] = relationship(
+        "Todo",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        lazy="raise",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        # Partial indexes: live users for reads, deleted users for the purger
+        Index(
+            "ix_users_live_id",
+            id,
+            postgresql_where=deleted_at.is_(None),
+            sqlite_where=deleted_at.is_(None),
+        ),
+        Index(
+            "ix_users_deleted_at",
+            deleted_at,
+            postgresql_where=deleted_at.isnot(None),
+            sqlite_where=deleted_at.isnot(None),
+        ),
+        # Case-insensitive prefix search (lower(col) LIKE 'abc%'); text_pattern_ops
+        # lets Postgres use the index for LIKE regardless of the collation
+        Index(
+            "ix_users_username_lower",
+            func.lower(username).label("username_lower"),
+            postgresql_ops={"username_lower": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_users_email_lower",
+            func.lower(email).label("email_lower"),
+            postgresql_ops={"email_lower": "text_pattern_ops"},
+        ),
+        # Trigram index for fuzzy fullname matching, Postgres only (needs pg_trgm)
+        Index(
+            "ix_users_fullname_trgm",
+            fullname,
+            postgresql_using="gin",
+            postgresql_ops={"fullname": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# Per-shard counter of sharded user ids on Postgres: id = value * 64 + shard.
+# Unsharded databases number users with the id column itself and get no sequence
+user_shard_sequence: Optional[Sequence] = (
+    Sequence("users_shard_seq", metadata=Base.metadata) if SHARDING_ENABLED else None
+)
 
-    # Relationships
-    todos = relationship("Todo", back_populates="owner", cascade="all, delete-orphan")
+# Make sure pg_trgm exists before the trigram index is created by create_all
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
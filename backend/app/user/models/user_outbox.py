@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.database import Base
+from sqlalchemy import JSON, BigInteger, DateTime, Index, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+
+class UserOutbox(Base):
+    """
+    Outbox of user changes, written in the transaction of the change itself.
+
+    Rows are read in ``position`` order by the change feed relay
+    (see app.user.services.change_feed_service); the position, given to a row
+    once it has committed, is the cursor consumers resume from. ``user_id`` is
+    not a foreign key so that changes outlive the purge of the user they
+    describe.
+    """
+
+    __tablename__ = "user_outbox"
+    # Written on the shard of the user, in the transaction of the change
+    __shard_key__ = "user_id"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    event_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), nullable=False
+    )
+    # Commit order of the change, NULL until the relay sequences the row
+    position: Mapped[Optional[int]] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), nullable=True
+    )
+    payload: Mapped[Optional[Dict[str, Any]]] = mapped_column(
+        JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"),
+        nullable=True,
+    )
+
+    __table_args__ = (
+        # Retention pruning deletes by age
+        Index("ix_user_outbox_created_at", created_at),
+        Index("ix_user_outbox_position", position, unique=True),
+        # Rows waiting for a position
+        Index(
+            "ix_user_outbox_unsequenced",
+            id,
+            postgresql_where=position.is_(None),
+            sqlite_where=position.is_(None),
+        ),
+    )
@@ -1,22 +1,68 @@
-from typing import List
+import asyncio
+from typing import AsyncIterator, List, Optional
 
-from app.auth.deps.auth_deps import get_current_user
-from app.core.database import get_db
+from app.audit.services.audit_service import client_ip, wait_for_audit_room
+from app.auth.deps.auth_deps import get_current_superuser, get_current_user
+from app.core.database import get_bulk_db, get_db
+from app.core.idempotency import run_idempotent
+from app.core.response_cache import cached_response
+from app.core.routing import SessionReleasingRoute
 from app.user.models.user import User as UserModel
-from app.user.schemas.user import UserCreate, UserInDB, UserUpdate
-from app.user.services.user_service import UserService
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from app.user.schemas.user import (
+    UserBulkUpdate,
+    UserBulkUpdateResult,
+    UserCreate,
+    UserInDB,
+    UserListItem,
+    UserSearchResults,
+    UserUpdate,
+)
+from app.user.services.change_feed_service import user_change_relays
+from app.user.services.user_service import USERS_CACHE_NAMESPACE, UserService
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=SessionReleasingRoute)
 
 
 # Module-level variable for Depends(get_db)
 db_dependency = Depends(get_db)
 
+# Module-level variable for Depends(get_bulk_db), for listings and admin work
+bulk_db_dependency = Depends(get_bulk_db)
+
 # Module-level variable for Depends(get_current_user)
 authentication = Depends(get_current_user)
 
+# Module-level variable for Depends(get_current_superuser)
+superuser_authentication = Depends(get_current_superuser)
+
+# Module-level variable for Depends(wait_for_audit_room), for the endpoints that
+# record audit events
+audit_backpressure = Depends(wait_for_audit_room)
+
+# Serializers for cached user listings; todo_count only appears when requested
+user_list_adapter: TypeAdapter[List[UserInDB]] = TypeAdapter(List[UserInDB])
+user_count_list_adapter: TypeAdapter[List[UserListItem]] = TypeAdapter(List[UserListItem])
+
+# Module-level variable for the optional Idempotency-Key header
+idempotency_key_header = Header(None, alias="Idempotency-Key", max_length=255)
+
+# Module-level variable for the Last-Event-ID header sent by reconnecting
+# EventSource clients
+last_event_id_header = Header(None, alias="Last-Event-ID", ge=0)
+
 
 @router.get("/me", response_model=UserInDB)
 async def read_users_me(
@@ -25,16 +71,151 @@ async def read_users_me(
     return current_user
 
 
-@router.get("/", response_model=List[UserInDB])
+@router.get("/", response_model=List[UserListItem])
 async def read_users(
     request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: Session = db_dependency,
+    with_todo_counts: bool = False,
+    db: Session = bulk_db_dependency,
+    current_user: UserModel = authentication,
+) -> Response:
+    def render() -> bytes:
+        if with_todo_counts:
+            return user_count_list_adapter.dump_json(
+                [
+                    UserListItem.model_validate(user).model_copy(
+                        update={"todo_count": count}
+                    )
+                    for user, count in UserService.get_users_with_todo_counts(
+                        db, skip=skip, limit=limit
+                    )
+                ]
+            )
+        return user_list_adapter.dump_json(
+            [
+                UserInDB.model_validate(user)
+                for user in UserService.get_users(db, skip=skip, limit=limit)
+            ]
+        )
+
+    # Dashboards poll this listing; serve it from the response cache, which
+    # every user write invalidates. A hit runs no listing query, but the
+    # authentication above still looks the user up on the auth pool
+    return await cached_response(request, USERS_CACHE_NAMESPACE, render)
+
+
+@router.get("/search", response_model=UserSearchResults)
+async def search_users(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = None,
+    db: Session = bulk_db_dependency,
     current_user: UserModel = authentication,
-) -> List[UserInDB]:
-    users = UserService.get_users(db, skip=skip, limit=limit)
-    return users
+) -> UserSearchResults:
+    # Fetch one extra row to know whether there is a next page
+    users = UserService.search_users(db, query=q, limit=limit + 1, cursor=cursor)
+    next_cursor = users[limit - 1].id if len(users) > limit else None
+    return UserSearchResults(
+        items=[UserInDB.model_validate(user) for user in users[:limit]],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get(
+    "/changes",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Stream of UserChangeEvent",
+            "content": {"text/event-stream": {}, "application/x-ndjson": {}},
+        }
+    },
+)
+async def stream_user_changes(
+    request: Request,
+    cursor: Optional[int] = Query(None, ge=0),
+    stream_format: Optional[str] = Query(None, alias="format", pattern="^(sse|ndjson)$"),
+    shard: Optional[str] = Query(None),
+    last_event_id: Optional[int] = last_event_id_header,
+    current_user: UserModel = authentication,
+) -> StreamingResponse:
+    """
+    Stream user changes as server-sent events or NDJSON.
+
+    Every event carries its id; pass the last one seen as ``cursor`` (or
+    ``Last-Event-ID``) to resume, otherwise the stream starts with the next
+    change. The format is ``format``, else ``application/x-ndjson`` in Accept,
+    else server-sent events.
+
+    With sharding each shard has its own stream and ids: ``shard`` is
+    required, and consumers follow every shard.
+    """
+    if shard is None and len(user_change_relays) == 1:
+        shard = next(iter(user_change_relays))
+    if shard is None or shard not in user_change_relays:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"shard must be one of {', '.join(user_change_relays)}",
+        )
+    user_change_relay = user_change_relays[shard]
+    if not user_change_relay.accepting:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Change feed unavailable",
+            headers={"Retry-After": "5"},
+        )
+
+    if cursor is None:
+        cursor = last_event_id
+    if cursor is None:
+        cursor = user_change_relay.last_id or 0
+    elif await asyncio.to_thread(user_change_relay.cursor_expired, cursor):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Cursor is older than the retained changes, list the users again",
+        )
+
+    start = cursor
+
+    if stream_format is None:
+        accept = request.headers.get("accept", "")
+        stream_format = "ndjson" if "application/x-ndjson" in accept else "sse"
+
+    async def ndjson() -> AsyncIterator[str]:
+        async for event in user_change_relay.events_after(start):
+            yield "\n" if event is None else event.body + "\n"
+
+    async def sse() -> AsyncIterator[str]:
+        async for event in user_change_relay.events_after(start):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"id: {event.id}\nevent: {event.type}\ndata: {event.body}\n\n"
+
+    # No-buffering hint for nginx, which would otherwise hold events back
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if stream_format == "ndjson":
+        return StreamingResponse(
+            ndjson(), media_type="application/x-ndjson", headers=headers
+        )
+    return StreamingResponse(sse(), media_type="text/event-stream", headers=headers)
+
+
+@router.patch(
+    "/bulk", response_model=UserBulkUpdateResult, dependencies=[audit_backpressure]
+)
+async def bulk_update_users(
+    request: Request,
+    bulk_update: UserBulkUpdate,
+    db: Session = bulk_db_dependency,
+    current_user: UserModel = superuser_authentication,
+) -> UserBulkUpdateResult:
+    user_ids = UserService.bulk_update_users(
+        db, bulk_update=bulk_update, actor_id=current_user.id
+    )
+    return UserBulkUpdateResult(updated=len(user_ids), ids=user_ids)
 
 
 @router.get("/{user_id}", response_model=UserInDB)
@@ -52,16 +233,30 @@ async def read_user_by_id(
     return db_user
 
 
-@router.post("/", response_model=UserInDB, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/",
+    response_model=UserInDB,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[audit_backpressure],
+)
 async def create_user(
     request: Request,
     user: UserCreate,
     db: Session = db_dependency,
+    idempotency_key: Optional[str] = idempotency_key_header,
 ) -> UserInDB:
-    return UserService.create_user(db=db, user=user)
+    return await run_idempotent(
+        request,
+        idempotency_key,
+        payload=user,
+        handler=lambda: UserInDB.model_validate(
+            UserService.create_user(db=db, user=user, ip_address=client_ip(request))
+        ),
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
-@router.put("/{user_id}", response_model=UserInDB)
+@router.put("/{user_id}", response_model=UserInDB, dependencies=[audit_backpressure])
 async def update_user(
     request: Request,
     user_id: int,
@@ -75,10 +270,16 @@ async def update_user(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    return UserService.update_user(db=db, db_user=db_user, user_update=user_update)
+    return UserService.update_user(
+        db=db, db_user=db_user, user_update=user_update, actor_id=current_user.id
+    )
 
 
-@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{user_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[audit_backpressure],
+)
 async def delete_user(
     request: Request,
     user_id: int,
@@ -91,5 +292,5 @@ async def delete_user(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    UserService.delete_user(db=db, user_id=user_id)
+    UserService.delete_user(db=db, user_id=user_id, actor_id=current_user.id)
     return None
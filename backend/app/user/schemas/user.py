@@ -1,7 +1,8 @@
 import re
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, EmailStr, Field, field_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
 
 
 class UserBase(BaseModel):
@@ -52,11 +53,26 @@ class UserInDB(UserBase):
     id: int
     is_active: bool = True
     is_superuser: bool = False
+    last_login_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class UserListItem(UserInDB):
+    """Schema for a user in a listing, optionally with its number of todos."""
+
+    todo_count: Optional[int] = None
+
+
+class UserSearchResults(BaseModel):
+    """Schema for a page of user search results."""
+
+    items: List[UserInDB]
+    next_cursor: Optional[int] = None
+
+
 class UserUpdate(BaseModel):
     """Schema for updating user information."""
 
@@ -68,3 +84,55 @@ class UserUpdate(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class UserBulkUpdate(BaseModel):
+    """
+    Schema for changing the status of many users at once.
+
+    Users are selected by ``ids`` and/or a filter; every selector given must
+    match. At least one selector and one change are required.
+    """
+
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    email_domain: Optional[str] = Field(
+        None, min_length=1, max_length=255, pattern=r"^[A-Za-z0-9.-]+$"
+    )
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    is_active: Optional[bool] = None
+    is_superuser: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def validate_selection(self) -> "UserBulkUpdate":
+        selectors = (self.ids, self.email_domain, self.created_after, self.created_before)
+        if all(selector is None for selector in selectors):
+            raise ValueError(
+                "Select users with ids, email_domain, created_after or created_before"
+            )
+        if self.is_active is None and self.is_superuser is None:
+            raise ValueError("Nothing to update: set is_active and/or is_superuser")
+        return self
+
+
+class UserBulkUpdateResult(BaseModel):
+    """Summary of a bulk update."""
+
+    updated: int
+    ids: List[int]
+
+
+class UserChangeEvent(BaseModel):
+    """
+    One entry of the user change feed.
+
+    ``data`` holds the user as created, the fields that changed, or only the
+    id for a deletion.
+    """
+
+    id: int
+    type: str
+    user_id: int
+    created_at: datetime
+    data: Optional[Dict[str, Any]] = None
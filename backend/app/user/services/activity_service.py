@@ -0,0 +1,188 @@
+"""
+Write-behind tracking of user login and activity timestamps.
+
+Logins and authenticated requests only record a timestamp in memory. Updates
+are coalesced per user, so a user making a hundred requests between flushes
+costs one row, and a background worker writes them in batches: a single
+``UPDATE ... FROM (VALUES ...)`` per batch on Postgres, an executemany
+elsewhere. With sharding, batches are split by the shard of each user.
+When a batch fails, it and the batches after it stay buffered for the next
+pass. Whatever is still buffered is flushed on shutdown.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.core.database import shard_for_user_id, user_engines
+from app.core.metrics import Counter, Gauge
+from app.user.models.user import User
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Engine,
+    bindparam,
+    cast,
+    column,
+    func,
+    update,
+    values,
+)
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+activity_flushed_total = Counter(
+    "user_activity_flushed_total", "User activity rows written to the database"
+)
+activity_pending = Gauge(
+    "user_activity_pending", "Users with activity waiting to be flushed"
+)
+
+# (last_login_at, last_seen_at) waiting to be written for one user
+PendingActivity = Tuple[Optional[datetime], datetime]
+
+
+class ActivityBuffer(BackgroundWorker):
+    """
+    Coalesce last-login and last-seen updates per user and flush them in batches.
+    """
+
+    name = "user-activity-flush"
+
+    def __init__(
+        self, db_engines: Dict[str, Engine], interval: float, max_batch: int
+    ) -> None:
+        super().__init__(interval)
+        self.engines = db_engines  # by shard id
+        self.max_batch = max_batch
+        self._pending: Dict[int, PendingActivity] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, user_id: int, login: bool) -> None:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            last_login_at, _ = self._pending.get(user_id, (None, now))
+            self._pending[user_id] = (now if login else last_login_at, now)
+            pending = len(self._pending)
+        activity_pending.set(pending)
+        if pending >= self.max_batch:
+            self.wake()
+
+    def record_login(self, user_id: int) -> None:
+        """A successful login; also counts as activity."""
+        self._record(user_id, login=True)
+
+    def record_seen(self, user_id: int) -> None:
+        """An authenticated request."""
+        self._record(user_id, login=False)
+
+    def run_once(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        activity_pending.set(0)
+
+        by_shard: Dict[str, List[Tuple[int, PendingActivity]]] = defaultdict(list)
+        for user_id, activity in pending.items():
+            shard_id = shard_for_user_id(user_id)
+            if shard_id is not None:
+                by_shard[shard_id].append((user_id, activity))
+        batches = [
+            (shard_id, items[start : start + self.max_batch])  # noqa: E203
+            for shard_id, items in by_shard.items()
+            for start in range(0, len(items), self.max_batch)
+        ]
+
+        for index, (shard_id, batch) in enumerate(batches):
+            try:
+                self.flush(self.engines[shard_id], batch)
+            except Exception:
+                # Keep this batch and every one not written yet for the next pass
+                self._requeue(
+                    [item for _, unwritten in batches[index:] for item in unwritten]
+                )
+                raise
+            activity_flushed_total.inc(len(batch))
+
+    def _requeue(self, items: List[Tuple[int, PendingActivity]]) -> None:
+        """Put unwritten activity back, merged with what was recorded since."""
+        with self._lock:
+            for user_id, (last_login_at, last_seen_at) in items:
+                newer = self._pending.get(user_id)
+                if newer is not None:
+                    newer_login_at, newer_seen_at = newer
+                    if last_login_at is None or (
+                        newer_login_at is not None and newer_login_at > last_login_at
+                    ):
+                        last_login_at = newer_login_at
+                    last_seen_at = max(last_seen_at, newer_seen_at)
+                self._pending[user_id] = (last_login_at, last_seen_at)
+            pending = len(self._pending)
+        activity_pending.set(pending)
+
+    def flush(self, db_engine: Engine, batch: List[Tuple[int, PendingActivity]]) -> None:
+        """
+        Write one batch of activity timestamps to the shard of its users.
+
+        ``updated_at`` is set to itself so that activity tracking does not
+        count as a profile change.
+        """
+        users = User.__table__
+        timestamp = DateTime(timezone=True)
+        with db_engine.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                activity = values(
+                    column("id", BigInteger),
+                    column("last_login_at", timestamp),
+                    column("last_seen_at", timestamp),
+                    name="activity",
+                ).data([(user_id, login, seen) for user_id, (login, seen) in batch])
+                # GREATEST ignores NULLs and keeps the newest value when
+                # several workers flush the same user. The casts type a VALUES
+                # column that holds only NULLs, which Postgres would read as text
+                connection.execute(
+                    update(users)
+                    .where(users.c.id == activity.c.id)
+                    .values(
+                        last_login_at=func.greatest(
+                            cast(activity.c.last_login_at, timestamp),
+                            users.c.last_login_at,
+                        ),
+                        last_seen_at=func.greatest(
+                            cast(activity.c.last_seen_at, timestamp),
+                            users.c.last_seen_at,
+                        ),
+                        updated_at=users.c.updated_at,
+                    )
+                )
+            else:
+                connection.execute(
+                    update(users)
+                    .where(users.c.id == bindparam("user_id"))
+                    .values(
+                        last_login_at=func.coalesce(
+                            bindparam("login", type_=timestamp),
+                            users.c.last_login_at,
+                        ),
+                        last_seen_at=bindparam("seen", type_=timestamp),
+                        updated_at=users.c.updated_at,
+                    ),
+                    [
+                        {"user_id": user_id, "login": login, "seen": seen}
+                        for user_id, (login, seen) in batch
+                    ],
+                )
+        logger.debug(f"Flushed activity for {len(batch)} users")
+
+
+# Module-level buffer shared by the auth service, the auth dependency and the
+# lifespan of the application
+activity_buffer = ActivityBuffer(
+    user_engines("bulk"),
+    interval=settings.ACTIVITY_FLUSH_INTERVAL_SECONDS,
+    max_batch=settings.ACTIVITY_FLUSH_MAX_BATCH,
+)
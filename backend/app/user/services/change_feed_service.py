@@ -0,0 +1,517 @@
+"""
+User change feed: a transactional outbox relayed to streaming consumers.
+
+``UserService`` adds a ``user_outbox`` row to the transaction of every user
+change, so a change is published if and only if it commits. On Postgres the
+transaction also sends ``NOTIFY user_changes``, which is delivered on commit.
+
+Each worker runs one relay. On Postgres (psycopg2) it LISTENs on a dedicated
+connection and wakes up on every notification, polling only every
+``USER_FEED_SAFETY_POLL_SECONDS``; elsewhere, or while the listener reconnects,
+it polls every ``USER_FEED_POLL_INTERVAL_SECONDS``. A pass sequences the rows
+committed since the last one, then reads them in batches of
+``USER_FEED_BATCH_SIZE`` and hands each event, serialized once, to the bounded
+queue of every open stream.
+
+Events are ordered by commit, not by outbox id: ids are taken on insert, so a
+transaction can commit id 12 while id 11 is still in flight, and a feed read by
+id would have to either wait for 11 or skip it for good. Instead every committed
+row gets the next ``position`` from ``sequence_changes``, which runs one
+transaction at a time; a position is only ever visible after every lower one,
+so the relay reads without gaps and the position is the cursor consumers
+resume from. A stream that falls
+``USER_FEED_QUEUE_SIZE`` events behind is unsubscribed and catches up from the
+table, so a slow consumer costs database reads rather than memory.
+
+With sharding the outbox is written on the shard of the changed user, and each
+shard has its own relay, positions and stream: consumers follow one
+``GET /users/changes?shard=...`` stream per shard.
+"""
+
+import asyncio
+import logging
+import selectors
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncGenerator, Dict, List, NamedTuple, Optional, Set
+
+from app.core.config import settings
+from app.core.database import shard_hint, user_engines
+from app.core.lifecycle import request_tracker
+from app.core.metrics import Counter, Gauge
+from app.user.models.user_outbox import UserOutbox
+from app.user.schemas.user import UserChangeEvent
+from sqlalchemy import Engine, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+user_changes_relayed_total = Counter(
+    "user_changes_relayed_total",
+    "User changes published to the streams of this worker",
+    labelnames=("shard",),
+)
+user_feed_subscribers = Gauge(
+    "user_feed_subscribers", "Open user change streams", labelnames=("shard",)
+)
+user_feed_overflows_total = Counter(
+    "user_feed_overflows_total",
+    "User change streams that fell behind and caught up from the table",
+    labelnames=("shard",),
+)
+
+NOTIFY_CHANNEL = "user_changes"
+
+# Seconds between two retention passes, and before the listener reconnects
+PRUNE_INTERVAL_SECONDS = 60 * 60
+LISTEN_RECONNECT_SECONDS = 5.0
+
+# Postgres advisory lock serializing the sequencing of the relays of every worker
+SEQUENCER_LOCK_KEY = 0x75736572  # "user"
+
+
+class UserChangeType:
+    """Event types written to ``user_outbox.event_type``."""
+
+    CREATED = "user.created"
+    UPDATED = "user.updated"
+    DELETED = "user.deleted"
+
+
+def record_user_changes(
+    db: Session, event_type: str, changes: List[Dict[str, Any]]
+) -> None:
+    """
+    Add outbox rows to the current transaction of a session.
+
+    Nothing is committed here: the rows commit, or roll back, with the change.
+
+    Args:
+        db: Session making the change
+        event_type: One of ``UserChangeType``
+        changes: ``{"user_id": ..., "payload": ...}`` per changed user
+    """
+    # One insert per shard, with the shard's own NOTIFY
+    by_shard: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    for change in changes:
+        hint = shard_hint(user_id=change["user_id"])
+        by_shard[hint["shard_id"] if hint else None].append(change)
+
+    for shard_id, shard_changes in by_shard.items():
+        hint = {"shard_id": shard_id} if shard_id is not None else None
+        db.execute(
+            insert(UserOutbox.__table__),
+            [{"event_type": event_type, **change} for change in shard_changes],
+            bind_arguments=hint,
+        )
+        if db.get_bind(**(hint or {})).dialect.name == "postgresql":
+            db.execute(select(func.pg_notify(NOTIFY_CHANNEL, "")), bind_arguments=hint)
+
+
+class FeedEvent(NamedTuple):
+    id: int
+    type: str
+    body: str  # UserChangeEvent as JSON, serialized once for every stream
+
+
+def sequence_changes(db_engine: Engine, limit: int) -> int:
+    """
+    Give up to ``limit`` committed outbox rows the next positions of the feed.
+
+    Rows are numbered after the highest position in a single statement. On
+    Postgres the transaction holds an advisory lock, so sequencers run one at
+    a time and each sees every position handed out before it; it also sends
+    NOTIFY so that the relays of the other workers read the new positions.
+    SQLite serializes writers on its own.
+
+    Returns:
+        int: Rows sequenced; 0 as well when another worker is sequencing
+    """
+    outbox = UserOutbox.__table__
+    with db_engine.begin() as connection:
+        postgresql = connection.dialect.name == "postgresql"
+        if postgresql and not connection.scalar(
+            select(func.pg_try_advisory_xact_lock(SEQUENCER_LOCK_KEY))
+        ):
+            return 0
+        highest = select(func.coalesce(func.max(outbox.c.position), 0)).scalar_subquery()
+        numbered = (
+            select(
+                outbox.c.id,
+                (highest + func.row_number().over(order_by=outbox.c.id)).label(
+                    "position"
+                ),
+            )
+            .where(outbox.c.position.is_(None))
+            .order_by(outbox.c.id)
+            .limit(limit)
+            .subquery()
+        )
+        sequenced = connection.execute(
+            update(outbox)
+            .where(outbox.c.id == numbered.c.id)
+            .values(position=numbered.c.position)
+        ).rowcount
+        if postgresql and sequenced:
+            connection.execute(select(func.pg_notify(NOTIFY_CHANNEL, "")))
+    return sequenced
+
+
+def fetch_changes(
+    db_engine: Engine, after: int, upto: Optional[int], limit: int
+) -> List[FeedEvent]:
+    """Read outbox rows with ``after < position <= upto`` in position order."""
+    outbox = UserOutbox.__table__
+    stmt = (
+        select(outbox)
+        .where(outbox.c.position > after)
+        .order_by(outbox.c.position)
+        .limit(limit)
+    )
+    if upto is not None:
+        stmt = stmt.where(outbox.c.position <= upto)
+    with db_engine.connect() as connection:
+        rows = connection.execute(stmt).all()
+    return [
+        FeedEvent(
+            row.position,
+            row.event_type,
+            UserChangeEvent(
+                id=row.position,
+                type=row.event_type,
+                user_id=row.user_id,
+                created_at=row.created_at,
+                data=row.payload,
+            ).model_dump_json(),
+        )
+        for row in rows
+    ]
+
+
+class Subscription:
+    """Bounded queue of live events for one stream."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: "asyncio.Queue[Optional[FeedEvent]]" = asyncio.Queue(maxsize)
+        self.overflowed = False
+        self.closed = False
+
+
+class UserChangeRelay:
+    """
+    Publish committed outbox rows to the open change streams of this worker.
+
+    One relay per shard; ``shard_id`` labels its metrics and tasks.
+    """
+
+    def __init__(
+        self,
+        shard_id: str,
+        db_engine: Engine,
+        poll_interval: float,
+        safety_poll_interval: float,
+        batch_size: int,
+        queue_size: int,
+        max_subscribers: int,
+        keepalive: float,
+        retention_seconds: int,
+    ) -> None:
+        self.shard_id = shard_id
+        self.engine = db_engine
+        self.poll_interval = poll_interval
+        self.safety_poll_interval = safety_poll_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.keepalive = keepalive
+        self.retention_seconds = retention_seconds
+        # Position of the last published event; None until the relay knows the tail
+        self.last_id: Optional[int] = None
+        self.listening = False
+        self._subscribers: Set[Subscription] = set()
+        self._pruned_at: Optional[float] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._listener: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._closing = False
+
+    def start(self) -> None:
+        """Start relaying on the running loop, and the listener on Postgres."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopped.clear()
+        self._closing = False
+        self._task = asyncio.create_task(
+            self._run(), name=f"user-change-relay-{self.shard_id}"
+        )
+        if self.engine.dialect.driver == "psycopg2":
+            self._listener = threading.Thread(
+                target=self._listen,
+                name=f"user-change-listener-{self.shard_id}",
+                daemon=True,
+            )
+            self._listener.start()
+
+    def close_streams(self) -> None:
+        """End every open stream and refuse new ones; relaying goes on."""
+        self._closing = True
+        for subscription in list(self._subscribers):
+            self._close(subscription)
+
+    async def stop(self) -> None:
+        """Stop relaying and end every open stream."""
+        self._stopped.set()
+        self.close_streams()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._listener is not None:
+            await asyncio.to_thread(self._listener.join)
+            self._listener = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def accepting(self) -> bool:
+        """Whether a new stream can be opened on this worker."""
+        return (
+            self.running
+            and not self._closing
+            and self.last_id is not None
+            and len(self._subscribers) < self.max_subscribers
+        )
+
+    def subscribe(self) -> Optional[Subscription]:
+        """Register a stream for live events; None when the relay is full."""
+        if len(self._subscribers) >= self.max_subscribers or self._closing:
+            return None
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        user_feed_subscribers.set(len(self._subscribers), shard=self.shard_id)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        user_feed_subscribers.set(len(self._subscribers), shard=self.shard_id)
+
+    def _close(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        self.unsubscribe(subscription)
+        try:
+            subscription.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            # The stream is not waiting and sees ``closed`` on its next event
+            pass
+
+    def _publish(self, event: FeedEvent) -> None:
+        self.last_id = event.id
+        user_changes_relayed_total.inc(shard=self.shard_id)
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+                user_feed_overflows_total.inc(shard=self.shard_id)
+
+    async def relay_pending(self) -> None:
+        """Sequence committed changes and publish every one after ``last_id``."""
+        if self.last_id is None:
+            self.last_id = await asyncio.to_thread(self.tail_id)
+        while (
+            await asyncio.to_thread(sequence_changes, self.engine, self.batch_size)
+            == self.batch_size
+        ):
+            pass
+        while True:
+            events = await asyncio.to_thread(
+                fetch_changes, self.engine, self.last_id, None, self.batch_size
+            )
+            for event in events:
+                self._publish(event)
+            if len(events) < self.batch_size:
+                return
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while True:
+            try:
+                await self.relay_pending()
+                if (
+                    self._pruned_at is None
+                    or time.monotonic() - self._pruned_at >= PRUNE_INTERVAL_SECONDS
+                ):
+                    self._pruned_at = time.monotonic()
+                    await asyncio.to_thread(self.prune)
+            except Exception as e:
+                logger.error(f"User change relay failed: {str(e)}", exc_info=True)
+
+            if self.listening:
+                timeout = self.safety_poll_interval
+            else:
+                timeout = self.poll_interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _wake_threadsafe(self) -> None:
+        if self._loop is None or self._wake is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            # The loop is already closed during shutdown
+            pass
+
+    def _listen(self) -> None:
+        """Wake the relay on every NOTIFY; runs on its own thread."""
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                # Detached from the pool, so it does not hold a pool slot
+                connection = self.engine.raw_connection()
+                connection.detach()
+                dbapi_connection: Any = connection.driver_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                self.listening = True
+                # Catch up on whatever committed while nobody was listening
+                self._wake_threadsafe()
+
+                with selectors.DefaultSelector() as selector:
+                    selector.register(dbapi_connection, selectors.EVENT_READ)
+                    while not self._stopped.is_set():
+                        if not selector.select(timeout=1.0):
+                            continue
+                        dbapi_connection.poll()
+                        if dbapi_connection.notifies:
+                            dbapi_connection.notifies.clear()
+                            self._wake_threadsafe()
+            except Exception as e:
+                logger.warning(
+                    f"User change listener failed, polling until it reconnects: {str(e)}"
+                )
+            finally:
+                self.listening = False
+                if connection is not None:
+                    connection.close()
+            self._stopped.wait(LISTEN_RECONNECT_SECONDS)
+
+    def tail_id(self) -> int:
+        """Position of the newest sequenced outbox row, 0 when there is none."""
+        with self.engine.connect() as connection:
+            return (
+                connection.execute(
+                    select(func.coalesce(func.max(UserOutbox.position), 0))
+                ).scalar_one()
+                or 0
+            )
+
+    def cursor_expired(self, cursor: int) -> bool:
+        """Whether changes after ``cursor`` have already been pruned."""
+        with self.engine.connect() as connection:
+            oldest = connection.scalar(select(func.min(UserOutbox.position)))
+        if oldest is None:
+            oldest = (self.last_id or 0) + 1
+        return cursor < oldest - 1
+
+    def prune(self) -> int:
+        """Delete outbox rows older than the retention period."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention_seconds)
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                delete(UserOutbox.__table__).where(UserOutbox.created_at < cutoff)
+            )
+        if result.rowcount:
+            logger.info(f"Pruned {result.rowcount} user outbox rows")
+        return result.rowcount
+
+    async def events_after(
+        self, cursor: int
+    ) -> AsyncGenerator[Optional[FeedEvent], None]:
+        """
+        Yield every change after ``cursor``: first from the table, then live.
+
+        The stream subscribes before reading the table, so no event falls
+        between the two; events it already sent are skipped when they arrive
+        live. None is yielded when nothing happened for ``keepalive`` seconds.
+        The stream ends when the relay stops or has no room for it.
+        """
+        subscription = self.subscribe()
+        if subscription is None:
+            return
+        try:
+            while True:
+                upto = self.last_id or 0
+                while cursor < upto:
+                    events = await asyncio.to_thread(
+                        fetch_changes, self.engine, cursor, upto, self.batch_size
+                    )
+                    if not events:
+                        break
+                    for event in events:
+                        yield event
+                    cursor = events[-1].id
+
+                while not subscription.closed:
+                    if subscription.overflowed and subscription.queue.empty():
+                        break
+                    try:
+                        live = await asyncio.wait_for(
+                            subscription.queue.get(), self.keepalive
+                        )
+                    except asyncio.TimeoutError:
+                        yield None
+                        continue
+                    if live is None:
+                        return
+                    if live.id > cursor:
+                        cursor = live.id
+                        yield live
+                if subscription.closed:
+                    return
+
+                # Fell behind: subscribe again and catch up from the table
+                self.unsubscribe(subscription)
+                resubscribed = self.subscribe()
+                if resubscribed is None:
+                    return
+                subscription = resubscribed
+        finally:
+            self.unsubscribe(subscription)
+
+
+# Module-level relays, one per shard, shared by the change stream route and the
+# lifespan of the application
+user_change_relays: Dict[str, UserChangeRelay] = {
+    shard_id: UserChangeRelay(
+        shard_id,
+        shard_engine,
+        poll_interval=settings.USER_FEED_POLL_INTERVAL_SECONDS,
+        safety_poll_interval=settings.USER_FEED_SAFETY_POLL_SECONDS,
+        batch_size=settings.USER_FEED_BATCH_SIZE,
+        queue_size=settings.USER_FEED_QUEUE_SIZE,
+        max_subscribers=settings.USER_FEED_MAX_SUBSCRIBERS,
+        keepalive=settings.USER_FEED_KEEPALIVE_SECONDS,
+        retention_seconds=settings.USER_FEED_RETENTION_SECONDS,
+    )
+    for shard_id, shard_engine in user_engines("bulk").items()
+}
+
+# Streams never finish on their own; end them as soon as the worker drains
+for relay in user_change_relays.values():
+    request_tracker.on_drain(relay.close_streams)
@@ -0,0 +1,96 @@
+"""
+Background purge of soft-deleted users.
+
+Deleting a user only sets ``deleted_at``. Once ``USER_PURGE_GRACE_SECONDS`` have
+passed, this worker removes the user and everything it owns with set-based
+``DELETE ... WHERE owner_id IN (...)`` statements, ``USER_PURGE_BATCH_SIZE``
+users per transaction and at most ``USER_PURGE_MAX_BATCHES`` transactions per
+pass, so the load is spread over time instead of landing on a request. With
+sharding each shard is purged in turn, with the same limits.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from app.core.background import BackgroundWorker
+from app.core.config import settings
+from app.core.database import user_engines
+from app.core.metrics import Counter
+from app.todo.models.todo import Todo
+from app.user.models.user import User
+from sqlalchemy import Engine, delete, select
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+users_purged_total = Counter(
+    "users_purged_total", "Soft-deleted users removed by the purger"
+)
+
+
+class UserPurger(BackgroundWorker):
+    """
+    Hard-delete soft-deleted users and their todos in bounded batches.
+    """
+
+    name = "user-purger"
+
+    def __init__(
+        self,
+        db_engines: Dict[str, Engine],
+        interval: float,
+        grace_seconds: int,
+        batch_size: int,
+        max_batches: int,
+    ) -> None:
+        super().__init__(interval)
+        self.engines = db_engines  # by shard id
+        self.grace_seconds = grace_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+
+    def run_once(self) -> None:
+        for db_engine in self.engines.values():
+            for _ in range(self.max_batches):
+                if len(self.purge_batch(db_engine)) < self.batch_size:
+                    break
+
+    def purge_batch(self, db_engine: Engine) -> List[int]:
+        """
+        Purge one batch of users whose grace period is over, on one shard.
+
+        Returns:
+            List[int]: IDs of the purged users
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace_seconds)
+        with db_engine.begin() as connection:
+            # SKIP LOCKED lets purgers in several workers take disjoint batches
+            user_ids = list(
+                connection.scalars(
+                    select(User.id)
+                    .where(User.deleted_at.isnot(None), User.deleted_at < cutoff)
+                    .order_by(User.deleted_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            )
+            if not user_ids:
+                return []
+
+            connection.execute(delete(Todo).where(Todo.owner_id.in_(user_ids)))
+            connection.execute(delete(User).where(User.id.in_(user_ids)))
+
+        users_purged_total.inc(len(user_ids))
+        logger.info(f"Purged {len(user_ids)} soft-deleted users")
+        return user_ids
+
+
+# Module-level purger started and stopped by the lifespan of the application
+user_purger = UserPurger(
+    user_engines("bulk"),
+    interval=settings.USER_PURGE_INTERVAL_SECONDS,
+    grace_seconds=settings.USER_PURGE_GRACE_SECONDS,
+    batch_size=settings.USER_PURGE_BATCH_SIZE,
+    max_batches=settings.USER_PURGE_MAX_BATCHES,
+)
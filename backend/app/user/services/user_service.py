@@ -6,25 +6,64 @@ This module provides CRUD operations for user management.
 
 import logging
 from datetime import datetime
-from typing import List, Optional
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Tuple
 
+from app.audit.services.audit_service import AuditEventType, audit_writer
 from app.auth.utils import get_password_hash
-from app.user.models.user import User
-from app.user.schemas.user import UserCreate, UserUpdate
+from app.core.database import (
+    SHARD_ID_STRIDE,
+    SHARDING_ENABLED,
+    scatter_gather,
+    shard_for_username,
+    shard_hint,
+    tag_user_id,
+)
+from app.core.response_cache import bump_generation
+from app.todo.models.todo import Todo
+from app.user.models.user import User, user_shard_sequence
+from app.user.schemas.user import UserBulkUpdate, UserCreate, UserInDB, UserUpdate
+from app.user.services.change_feed_service import UserChangeType, record_user_changes
 from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, func, lambda_stmt, or_, select, update
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
+# Response cache namespace of the user listings; bumped by every user write
+USERS_CACHE_NAMESPACE = "users"
+
 
 class UserService:
 
+    # The single-user lookups run on every authenticated request. They are
+    # lambda statements: the statement is built and its cache key computed once
+    # per code path, and later calls only extract the new parameter values
+    # before hitting the compiled-SQL cache.
+    #
+    # With SHARD_DATABASE_URLS set, lookups by id or username go to one shard
+    # (shard_hint), lookups by email ask every shard, and listings and search
+    # query all shards in parallel and merge the pages (scatter_gather).
+
     @staticmethod
-    def get_user(db: Session, user_id: int) -> Optional[User]:
+    def get_user(db: Session, user_id: int, with_todos: bool = False) -> Optional[User]:
+        """
+        Get a live user by id.
+
+        ``User.todos`` is never lazy loaded; pass ``with_todos`` to load the
+        collection up front with one extra SELECT ... WHERE owner_id IN (...).
+        """
+        stmt = lambda_stmt(
+            lambda: select(User)
+            .where(User.id == user_id, User.deleted_at.is_(None))
+            .limit(1)
+        )
+        if with_todos:
+            stmt += lambda s: s.options(selectinload(User.todos))
         try:
-            return db.query(User).filter(User.id == user_id).first()
+            return db.scalars(stmt, bind_arguments=shard_hint(user_id=user_id)).first()
         except SQLAlchemyError as e:
             logger.error(f"Error retrieving user {user_id}: {str(e)}")
             raise HTTPException(
@@ -33,9 +72,14 @@ class UserService:
             )
 
     @staticmethod
-    def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    def get_user_by_email(
+        db: Session, email: str, include_deleted: bool = False
+    ) -> Optional[User]:
+        stmt = lambda_stmt(lambda: select(User).where(User.email == email).limit(1))
+        if not include_deleted:
+            stmt += lambda s: s.where(User.deleted_at.is_(None))
         try:
-            return db.query(User).filter(User.email == email).first()
+            return db.scalars(stmt).first()
         except SQLAlchemyError as e:
             logger.error(f"Error retrieving user by email {email}: {str(e)}")
             raise HTTPException(
@@ -44,9 +88,14 @@ class UserService:
             )
 
     @staticmethod
-    def get_user_by_username(db: Session, username: str) -> Optional[User]:
+    def get_user_by_username(
+        db: Session, username: str, include_deleted: bool = False
+    ) -> Optional[User]:
+        stmt = lambda_stmt(lambda: select(User).where(User.username == username).limit(1))
+        if not include_deleted:
+            stmt += lambda s: s.where(User.deleted_at.is_(None))
         try:
-            return db.query(User).filter(User.username == username).first()
+            return db.scalars(stmt, bind_arguments=shard_hint(username=username)).first()
         except SQLAlchemyError as e:
             logger.error(f"Error retrieving user by username {username}: {str(e)}")
             raise HTTPException(
@@ -56,8 +105,17 @@ class UserService:
 
     @staticmethod
     def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
+        stmt = select(User).where(User.deleted_at.is_(None)).order_by(User.id)
         try:
-            return db.query(User).offset(skip).limit(limit).all()
+            if SHARDING_ENABLED:
+                # Each shard returns its first skip + limit users; the merge
+                # keeps the global page
+                return scatter_gather(
+                    lambda session: list(session.scalars(stmt.limit(skip + limit))),
+                    key=attrgetter("id"),
+                    limit=skip + limit,
+                )[skip:]
+            return list(db.scalars(stmt.offset(skip).limit(limit)))
         except SQLAlchemyError as e:
             logger.error(f"Error retrieving users: {str(e)}")
             raise HTTPException(
@@ -66,10 +124,148 @@ class UserService:
             )
 
     @staticmethod
-    def create_user(db: Session, user: UserCreate) -> User:
+    def get_users_with_todo_counts(
+        db: Session, skip: int = 0, limit: int = 100
+    ) -> List[Tuple[User, int]]:
+        """
+        List users together with the number of todos each owns.
+
+        Counts come from a grouped subquery joined to the page of users, so
+        the whole listing is a single query and no collection is loaded.
+        """
+        # Todos live on the shard of their owner, so each shard counts its own
+        # users' todos and the pages are merged like get_users
+        offset = 0 if SHARDING_ENABLED else skip
+        page = (
+            select(User.id)
+            .where(User.deleted_at.is_(None))
+            .order_by(User.id)
+            .offset(offset)
+            .limit(limit + skip - offset)
+            .subquery()
+        )
+        todo_counts = (
+            select(Todo.owner_id, func.count(Todo.id).label("todo_count"))
+            .where(Todo.owner_id.in_(select(page.c.id)))
+            .group_by(Todo.owner_id)
+            .subquery()
+        )
+        stmt = (
+            select(User, func.coalesce(todo_counts.c.todo_count, 0))
+            .join(page, page.c.id == User.id)
+            .outerjoin(todo_counts, todo_counts.c.owner_id == User.id)
+            .order_by(User.id)
+        )
+
+        def query(session: Session) -> List[Tuple[User, int]]:
+            return [(user, count) for user, count in session.execute(stmt)]
+
+        try:
+            if SHARDING_ENABLED:
+                return scatter_gather(
+                    query, key=lambda row: row[0].id, limit=skip + limit
+                )[skip:]
+            return query(db)
+        except SQLAlchemyError as e:
+            logger.error(f"Error retrieving users with todo counts: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error retrieving users",
+            )
+
+    @staticmethod
+    def search_conditions(query: str, dialect: str) -> Dict[str, ColumnElement[bool]]:
+        """
+        Match conditions of a user search on one dialect, by matched column.
+
+        ``username`` and ``email`` are case-insensitive prefix matches;
+        ``fullname`` is a pg_trgm similarity match on Postgres and a substring
+        LIKE elsewhere. ``benchmarks.user_search`` times each of them.
+        """
+        term = query.strip().lower()
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        prefix = escaped + "%"
+        if dialect == "postgresql":
+            fullname = User.fullname.op("%")(term)
+        else:
+            fullname = func.lower(User.fullname).like("%" + escaped + "%", escape="\\")
+        return {
+            "username": func.lower(User.username).like(prefix, escape="\\"),
+            "email": func.lower(User.email).like(prefix, escape="\\"),
+            "fullname": fullname,
+        }
+
+    @staticmethod
+    def search_users(
+        db: Session, query: str, limit: int = 20, cursor: Optional[int] = None
+    ) -> List[User]:
+        """
+        Find users by username or email prefix, or by a fuzzy fullname match.
+
+        Prefix matches are case-insensitive and served by the ``lower()``
+        expression indexes. Fullname matching uses pg_trgm similarity on
+        Postgres and falls back to a substring LIKE elsewhere. Results are
+        ordered by id; pass the last id seen as ``cursor`` for the next page.
+        """
+
+        def search(session: Session) -> List[User]:
+            conditions = UserService.search_conditions(
+                query, session.get_bind().dialect.name
+            )
+            stmt = (
+                select(User)
+                .where(User.deleted_at.is_(None), or_(*conditions.values()))
+                .order_by(User.id)
+                .limit(limit)
+            )
+            if cursor is not None:
+                stmt = stmt.where(User.id > cursor)
+            return list(session.scalars(stmt))
+
+        try:
+            if SHARDING_ENABLED:
+                # Ids are unique across shards, so the id cursor works on the
+                # merged pages as it does on one database
+                return scatter_gather(search, key=attrgetter("id"), limit=limit)
+            return search(db)
+        except SQLAlchemyError as e:
+            logger.error(f"Error searching users for {query!r}: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error searching users",
+            )
+
+    @staticmethod
+    def _next_user_id(db: Session, shard_id: str) -> int:
+        """Allocate the id of a new user on a shard; the id carries the shard."""
+        hint: Dict[str, Any] = {"shard_id": shard_id}
+        if db.get_bind(**hint).dialect.name == "postgresql":
+            # Only called with sharding enabled, which creates the sequence
+            assert user_shard_sequence is not None
+            local_id: int = db.execute(
+                select(user_shard_sequence.next_value()), bind_arguments=hint
+            ).scalar_one()
+        else:
+            # SQLite stand-in shards: a concurrent insert fails on the primary
+            # key rather than reusing the id
+            highest = db.scalar(select(func.max(User.id)), bind_arguments=hint) or 0
+            local_id = highest // SHARD_ID_STRIDE + 1
+        return tag_user_id(local_id, shard_id)
+
+    @staticmethod
+    def create_user(
+        db: Session,
+        user: UserCreate,
+        event_type: str = AuditEventType.USER_CREATED,
+        ip_address: Optional[str] = None,
+    ) -> User:
         try:
-            # Check if email already exists
-            db_user = UserService.get_user_by_email(db, email=user.email)
+            # Check if email already exists; soft-deleted users keep theirs
+            # until they are purged. Emails are not the shard key: with sharding
+            # this asks every shard, and only the username is unique per shard
+            db_user = UserService.get_user_by_email(
+                db, email=user.email, include_deleted=True
+            )
             if db_user:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -77,7 +273,9 @@ class UserService:
                 )
 
             # Check if username already exists
-            db_user = UserService.get_user_by_username(db, username=user.username)
+            db_user = UserService.get_user_by_username(
+                db, username=user.username, include_deleted=True
+            )
             if db_user:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -96,10 +294,31 @@ class UserService:
                 is_active=True,
                 is_superuser=False,
             )
+            if SHARDING_ENABLED:
+                db_user.id = UserService._next_user_id(
+                    db, shard_for_username(user.username)
+                )
 
             db.add(db_user)
+            # Flush for the id; the change feed entry commits with the user
+            db.flush()
+            payload = UserInDB.model_validate(db_user).model_dump(mode="json")
+            record_user_changes(
+                db,
+                UserChangeType.CREATED,
+                [{"user_id": db_user.id, "payload": payload}],
+            )
             db.commit()
             db.refresh(db_user)
+            bump_generation(USERS_CACHE_NAMESPACE)
+
+            audit_writer.record(
+                event_type,
+                actor_id=db_user.id,
+                subject_id=db_user.id,
+                username=db_user.username,
+                ip_address=ip_address,
+            )
             return db_user
 
         except IntegrityError as e:
@@ -118,7 +337,12 @@ class UserService:
             )
 
     @staticmethod
-    def update_user(db: Session, db_user: User, user_update: UserUpdate) -> User:
+    def update_user(
+        db: Session,
+        db_user: User,
+        user_update: UserUpdate,
+        actor_id: Optional[int] = None,
+    ) -> User:
         try:
             update_data = user_update.dict(exclude_unset=True)
 
@@ -134,8 +358,29 @@ class UserService:
 
             db_user.updated_at = datetime.utcnow()
 
+            # The change feed carries the new public values (never the password)
+            changed = sorted(user_update.model_fields_set)
+            values = UserInDB.model_validate(db_user).model_dump(
+                mode="json", include=set(changed)
+            )
+            record_user_changes(
+                db,
+                UserChangeType.UPDATED,
+                [{"user_id": db_user.id, "payload": {"id": db_user.id, **values}}],
+            )
+
             db.commit()
             db.refresh(db_user)
+            bump_generation(USERS_CACHE_NAMESPACE)
+
+            # Record which fields changed, never their values
+            audit_writer.record(
+                AuditEventType.USER_UPDATED,
+                actor_id=actor_id,
+                subject_id=db_user.id,
+                username=db_user.username,
+                details={"fields": changed},
+            )
             return db_user
 
         except SQLAlchemyError as e:
@@ -147,15 +392,110 @@ class UserService:
             )
 
     @staticmethod
-    def delete_user(db: Session, user_id: int) -> bool:
+    def bulk_update_users(
+        db: Session, bulk_update: UserBulkUpdate, actor_id: Optional[int] = None
+    ) -> List[int]:
+        """
+        Apply is_active/is_superuser changes to every matching user.
+
+        The whole change is one ``UPDATE ... RETURNING id`` however many users
+        match, committed with one change feed entry per user. The acting user
+        is never part of the selection, so an admin cannot lock themselves out.
+
+        Returns:
+            List[int]: IDs of the updated users
+        """
+        conditions: List[ColumnElement[bool]] = [User.deleted_at.is_(None)]
+        if actor_id is not None:
+            conditions.append(User.id != actor_id)
+        if bulk_update.ids is not None:
+            conditions.append(User.id.in_(bulk_update.ids))
+        if bulk_update.email_domain is not None:
+            # The schema only allows letters, digits, dots and hyphens, so the
+            # domain needs no LIKE escaping
+            domain = bulk_update.email_domain.lower()
+            conditions.append(func.lower(User.email).like(f"%@{domain}"))
+        if bulk_update.created_after is not None:
+            conditions.append(User.created_at >= bulk_update.created_after)
+        if bulk_update.created_before is not None:
+            conditions.append(User.created_at < bulk_update.created_before)
+
+        changes = bulk_update.model_dump(
+            include={"is_active", "is_superuser"}, exclude_none=True
+        )
+        # Runs on every shard when sharded, RETURNING rows merged
+        stmt = (
+            update(User)
+            .where(*conditions)
+            .values(**changes, updated_at=func.now())
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+
         try:
-            db_user = UserService.get_user(db, user_id)
-            if not db_user:
-                return False
+            user_ids = sorted(db.scalars(stmt))
+            record_user_changes(
+                db,
+                UserChangeType.UPDATED,
+                [
+                    {"user_id": user_id, "payload": {"id": user_id, **changes}}
+                    for user_id in user_ids
+                ],
+            )
+            db.commit()
+            bump_generation(USERS_CACHE_NAMESPACE)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Error bulk updating users: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error updating users",
+            )
+
+        logger.info(f"Bulk update of {len(user_ids)} users: {changes}")
+        audit_writer.record(
+            AuditEventType.USERS_BULK_UPDATED,
+            actor_id=actor_id,
+            details={"changes": changes, "user_ids": user_ids},
+        )
+        return user_ids
 
-            db.delete(db_user)
+    @staticmethod
+    def delete_user(db: Session, user_id: int, actor_id: Optional[int] = None) -> bool:
+        """
+        Soft delete a user.
+
+        A single UPDATE marks the user deleted and inactive, whatever the number
+        of todos it owns; the rows are removed later by the background purger
+        (see app.user.services.purge_service).
+        """
+        try:
+            deleted = db.scalars(
+                update(User)
+                .where(User.id == user_id, User.deleted_at.is_(None))
+                .values(deleted_at=func.now(), is_active=False)
+                .returning(User.username)
+                .execution_options(synchronize_session=False),
+                bind_arguments=shard_hint(user_id=user_id),
+            ).first()
+            if deleted is not None:
+                record_user_changes(
+                    db,
+                    UserChangeType.DELETED,
+                    [{"user_id": user_id, "payload": {"id": user_id}}],
+                )
             db.commit()
+            if deleted is None:
+                return False
+            bump_generation(USERS_CACHE_NAMESPACE)
+
             logger.info(f"User {user_id} deleted successfully")
+            audit_writer.record(
+                AuditEventType.USER_DELETED,
+                actor_id=actor_id,
+                subject_id=user_id,
+                username=deleted,
+            )
             return True
 
         except SQLAlchemyError as e:
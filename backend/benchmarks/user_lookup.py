@@ -0,0 +1,150 @@
+"""
+Micro-benchmark of the per-call overhead of the hot user lookups.
+
+``get_user``, ``get_user_by_email`` and ``get_user_by_username`` run on every
+authenticated request. They are lambda statements, whose SQL is built, keyed
+and compiled once per code path. This times them against the legacy
+``db.query(User).filter(...)`` form they replaced, which rebuilds the
+statement and its cache key on every call, so that the gain can be measured
+again after a SQLAlchemy upgrade or a change to the lookups.
+
+Each lookup runs ``--calls`` times in one session, ``--repeat`` times; the
+best run is reported per call. Run it against a scratch database, seeded with
+the same users as ``benchmarks.user_search`` (it imports the application, so
+the usual settings must be set, but it only connects to ``--database-url``):
+
+    python -m benchmarks.user_lookup --database-url sqlite:///lookup.db
+    python -m benchmarks.user_lookup --database-url postgresql://.../bench --rows 100000
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.user.models.user import User
+from app.user.services.user_service import UserService
+from benchmarks.user_search import seed
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+# A lookup called with a session and one key of a seeded user
+Lookup = Callable[[Session, str], Optional[User]]
+
+
+class Timing(NamedTuple):
+    """Best per-call time of one lookup before and after, in microseconds."""
+
+    lookup: str
+    before_us: float
+    after_us: float
+
+
+def legacy_get_user(db: Session, user_id: str) -> Optional[User]:
+    return (
+        db.query(User).filter(User.id == int(user_id), User.deleted_at.is_(None)).first()
+    )
+
+
+def legacy_get_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email, User.deleted_at.is_(None)).first()
+
+
+def legacy_get_user_by_username(db: Session, username: str) -> Optional[User]:
+    return (
+        db.query(User)
+        .filter(User.username == username, User.deleted_at.is_(None))
+        .first()
+    )
+
+
+# Name, key column, legacy form and current UserService method
+LOOKUPS: List[Tuple[str, InstrumentedAttribute[Any], Lookup, Lookup]] = [
+    (
+        "get_user",
+        User.id,
+        legacy_get_user,
+        lambda db, key: UserService.get_user(db, user_id=int(key)),
+    ),
+    (
+        "get_user_by_email",
+        User.email,
+        legacy_get_user_by_email,
+        lambda db, key: UserService.get_user_by_email(db, email=key),
+    ),
+    (
+        "get_user_by_username",
+        User.username,
+        legacy_get_user_by_username,
+        lambda db, key: UserService.get_user_by_username(db, username=key),
+    ),
+]
+
+
+def best_per_call_us(
+    session: Session, lookup: Lookup, keys: List[str], repeat: int
+) -> float:
+    """Best of ``repeat`` runs over every key, per call, in microseconds."""
+    lookup(session, keys[0])  # builds and caches the statement
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for key in keys:
+            if lookup(session, key) is None:
+                sys.exit(f"Lookup of {key!r} found no user")
+        best = min(best, time.perf_counter() - started)
+        # Identity map state should not favour the later runs
+        session.expunge_all()
+    return best / len(keys) * 1_000_000
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point for the lookup benchmark.
+    """
+    parser = argparse.ArgumentParser(description="User lookup micro-benchmark")
+    parser.add_argument("--database-url", required=True, help="Scratch database")
+    parser.add_argument("--rows", type=int, default=1000, help="Users to seed")
+    parser.add_argument("--calls", type=int, default=5000, help="Lookups per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per lookup")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args(argv)
+
+    # The compiled-SQL cache as the application sizes it
+    db_engine = create_engine(
+        args.database_url, query_cache_size=settings.DB_QUERY_CACHE_SIZE
+    )
+    seed(db_engine, args.rows, args.seed)
+
+    rng = random.Random(args.seed)
+    timings = []
+    with Session(db_engine) as session:
+        for name, column, before, after in LOOKUPS:
+            values = session.scalars(select(column).limit(args.calls)).all()
+            keys = [str(rng.choice(values)) for _ in range(args.calls)]
+            timings.append(
+                Timing(
+                    name,
+                    best_per_call_us(session, before, keys, args.repeat),
+                    best_per_call_us(session, after, keys, args.repeat),
+                )
+            )
+
+    print(
+        f"\n{args.rows} users, best of {args.repeat} x {args.calls} calls, "
+        f"{db_engine.dialect.name}"
+    )
+    print(f"{'lookup':<22} {'before [us]':>12} {'after [us]':>11} {'speedup':>8}")
+    for timing in timings:
+        print(
+            f"{timing.lookup:<22} {timing.before_us:>12.0f} {timing.after_us:>11.0f}"
+            f" {timing.before_us / timing.after_us:>7.2f}x"
+        )
+    db_engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
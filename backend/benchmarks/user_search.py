@@ -0,0 +1,221 @@
+"""
+Benchmark of the user search at scale.
+
+Seeds a database with a reproducible set of users (1M by default) and times
+each match condition of ``GET /users/search`` on its own, then the combined
+search as the endpoint runs it, printing the query plan of each so the index
+choice can be checked:
+
+- ``username`` and ``email``: case-insensitive prefix, served by the
+  ``lower()`` expression indexes with ``text_pattern_ops``;
+- ``fullname``: pg_trgm similarity on the GIN trigram index on Postgres,
+  substring LIKE (a full scan) elsewhere.
+
+Run it against a scratch database; it creates the tables, and seeds them
+unless they already hold the requested number of users. It imports the
+application, so the usual settings must be set, but it only connects to
+``--database-url``:
+
+    python -m benchmarks.user_search --database-url postgresql://.../bench
+    python -m benchmarks.user_search --database-url sqlite:///bench.db --rows 100000
+"""
+
+import argparse
+import random
+import statistics
+import string
+import sys
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from app.core.database import Base
+from app.user.models.user import User
+from app.user.services.user_service import UserService
+from sqlalchemy import (
+    ColumnElement,
+    Engine,
+    create_engine,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.orm import Session
+
+FIRST_NAMES = [
+    "Ada", "Alan", "Barbara", "Charles", "Donald", "Edsger", "Frances", "Grace",
+    "Hedy", "Ivan", "John", "Katherine", "Leslie", "Margaret", "Niklaus", "Radia",
+    "Shafi", "Tim", "Vint", "Yukihiro",
+]  # fmt: skip
+LAST_NAMES = [
+    "Allen", "Backus", "Berners-Lee", "Cerf", "Dijkstra", "Goldwasser", "Hamilton",
+    "Hopper", "Johnson", "Kay", "Knuth", "Lamport", "Liskov", "Lovelace",
+    "Matsumoto", "Perlman", "Ritchie", "Shannon", "Sutherland", "Wirth",
+]  # fmt: skip
+DOMAINS = ["example.com", "example.org", "mail.example.net"]
+
+SEED_BATCH_SIZE = 10000
+
+
+class Timing(NamedTuple):
+    """Latencies of one query kind over every term, in milliseconds."""
+
+    kind: str
+    median_ms: float
+    p95_ms: float
+    rows: int
+
+
+def generate_users(rows: int, seed: int) -> Iterator[Dict[str, Any]]:
+    """Reproducible user rows; usernames and emails are unique."""
+    rng = random.Random(seed)
+    for n in range(rows):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        handle = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8)))
+        yield {
+            "username": f"{handle}{n}",
+            "email": f"{first.lower()}.{last.lower()}{n}@{rng.choice(DOMAINS)}",
+            # Same placeholder for every row; hashing 1M passwords is not the point
+            "hashed_password": "x",
+            "fullname": f"{first} {last}",
+            "is_active": True,
+            "is_superuser": False,
+        }
+
+
+def seed(db_engine: Engine, rows: int, seed_value: int) -> None:
+    """Create the tables and insert ``rows`` users unless they are there already."""
+    Base.metadata.create_all(db_engine)
+    with db_engine.begin() as connection:
+        existing = connection.scalar(select(func.count()).select_from(User))
+    if existing == rows:
+        print(f"Reusing {rows} seeded users")
+        return
+    if existing:
+        sys.exit(f"Users table holds {existing} rows, not {rows}; use an empty database")
+
+    started = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+    for row in generate_users(rows, seed_value):
+        batch.append(row)
+        if len(batch) == SEED_BATCH_SIZE:
+            with db_engine.begin() as connection:
+                connection.execute(insert(User), batch)
+            batch = []
+    if batch:
+        with db_engine.begin() as connection:
+            connection.execute(insert(User), batch)
+
+    with db_engine.begin() as connection:
+        # Fresh statistics, or the planner guesses on a table it thinks is empty
+        connection.execute(text("ANALYZE"))
+    print(f"Seeded {rows} users in {time.perf_counter() - started:.1f}s")
+
+
+def search_terms(rows: int, count: int, seed_value: int) -> List[str]:
+    """Terms an admin would type: username and email prefixes, and names."""
+    rng = random.Random(seed_value + 1)
+    samples = list(generate_users(min(rows, 10000), seed_value))
+    terms = []
+    for _ in range(count):
+        user = rng.choice(samples)
+        terms.append(
+            rng.choice(
+                [
+                    user["username"][:3],
+                    user["email"][:5],
+                    user["fullname"].split()[rng.randint(0, 1)].lower(),
+                ]
+            )
+        )
+    return terms
+
+
+def explain(session: Session, stmt: Any) -> str:
+    """The query plan of a statement, as the database prints it."""
+    dialect = session.get_bind().dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        lines = session.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars()
+        return "\n".join(lines)
+    if dialect.name == "sqlite":
+        plan = session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return "\n".join(row[-1] for row in plan)
+    return "(no plan for this dialect)"
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def time_query(
+    session: Session,
+    kind: str,
+    terms: List[str],
+    limit: int,
+    show_plan: bool,
+) -> Timing:
+    """Run one query kind for every term and collect the latencies."""
+    dialect = session.get_bind().dialect.name
+    latencies: List[float] = []
+    rows = 0
+    for term in terms:
+        conditions = UserService.search_conditions(term, dialect)
+        # "combined" is the search as GET /users/search runs it
+        condition: ColumnElement[bool] = (
+            conditions[kind] if kind in conditions else or_(*conditions.values())
+        )
+        stmt = (
+            select(User.id)
+            .where(User.deleted_at.is_(None), condition)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        started = time.perf_counter()
+        rows += len(session.scalars(stmt).all())
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    if show_plan:
+        print(f"\n--- {kind}: {terms[0]!r}\n{explain(session, stmt)}")
+    return Timing(kind, statistics.median(latencies), percentile(latencies, 0.95), rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point for the search benchmark.
+    """
+    parser = argparse.ArgumentParser(description="User search benchmark")
+    parser.add_argument("--database-url", required=True, help="Scratch database")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Users to seed")
+    parser.add_argument("--queries", type=int, default=200, help="Terms per query kind")
+    parser.add_argument("--limit", type=int, default=20, help="Page size")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--no-plan", action="store_true", help="Skip the query plans")
+    args = parser.parse_args(argv)
+
+    db_engine = create_engine(args.database_url)
+    seed(db_engine, args.rows, args.seed)
+    terms = search_terms(args.rows, args.queries, args.seed)
+
+    timings = []
+    with Session(db_engine) as session:
+        for kind in ("username", "email", "fullname", "combined"):
+            # One untimed pass warms the caches of the database and of SQLAlchemy
+            time_query(session, kind, terms[:10], args.limit, show_plan=False)
+            timings.append(time_query(session, kind, terms, args.limit, not args.no_plan))
+
+    print(f"\n{args.rows} users, {len(terms)} queries per kind, limit {args.limit}")
+    print(f"{'query':<10} {'median [ms]':>12} {'p95 [ms]':>10} {'rows':>8}")
+    for timing in timings:
+        print(
+            f"{timing.kind:<10} {timing.median_ms:>12.2f} {timing.p95_ms:>10.2f}"
+            f" {timing.rows:>8}"
+        )
+    db_engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
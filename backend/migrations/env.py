@@ -3,15 +3,20 @@ import sys
 from logging.config import fileConfig
 
 from alembic import context
-
-# Import your models and settings
-from app.core.config import settings
-from app.core.database import Base
 from sqlalchemy import engine_from_config, pool
 
-# Add the backend directory to Python path
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+# Add the backend directory to Python path, before anything from app is
+# imported, so that migrations run from any working directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Import your models and settings; every model must be imported so that its
+# table is in the metadata
+from app.audit.models.audit_event import AuditEvent  # noqa: E402,F401
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.todo.models.todo import Todo  # noqa: E402,F401
+from app.user.models.user import User  # noqa: E402,F401
+from app.user.models.user_outbox import UserOutbox  # noqa: E402,F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -22,10 +27,6 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-# Import all models to ensure they are loaded
-from app.todo.models.todo import Todo  # noqa
-from app.user.models.user import User  # noqa
-
 # Set the metadata for Alembic to use
 target_metadata = Base.metadata
 
@@ -53,6 +54,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
     )
 
     with context.begin_transaction():
@@ -65,22 +67,33 @@ def run_migrations_online() -> None:
     In this scenario we need to create an Engine
     and associate a connection with the context.
 
+    Every revision commits on its own, so that a failure keeps the revisions
+    before it and the online-safe helpers (migrations.helpers) can step out
+    of the transaction without committing other revisions' work. With
+    sharding, DATABASE_URL and then every shard are migrated in turn, each
+    with its own version table.
     """
-    # Use the database URL from settings
-    configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = settings.DATABASE_URL
-
-    connectable = engine_from_config(
-        configuration,
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-
-        with context.begin_transaction():
-            context.run_migrations()
+    # Use the database URLs from settings
+    configuration = config.get_section(config.config_ini_section, {})
+
+    for url in [settings.DATABASE_URL, *settings.SHARD_DATABASE_URLS]:
+        configuration["sqlalchemy.url"] = url
+        connectable = engine_from_config(
+            configuration,
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
+        )
+
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                transaction_per_migration=True,
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
+        connectable.dispose()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,245 @@
+"""
+Online-safe operations for revisions that touch large tables.
+
+Alembic runs each revision in a transaction, and Postgres holds every lock a
+revision takes until it commits: an index build blocks writes for as long as
+it reads the table, and an ``UPDATE`` of every row holds every row lock until
+the end. These helpers keep such work outside the revision's transaction.
+
+Use them from a revision with:
+
+    from migrations.helpers import backfill, create_index_concurrently
+
+``create_index_concurrently`` builds an index without blocking writes.
+``backfill`` updates a table in small committed batches, sleeping between
+them, and records its progress in ``migration_backfill_progress`` so that an
+interrupted upgrade resumes where it stopped instead of starting over.
+
+Check new revisions for blocking operations with ``python -m migrations.lint``.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+progress_table = sa.Table(
+    "migration_backfill_progress",
+    sa.MetaData(),
+    sa.Column("name", sa.String(255), primary_key=True),
+    sa.Column("last_key", sa.BigInteger, nullable=True),
+    sa.Column("rows_done", sa.BigInteger, nullable=False, server_default="0"),
+    sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+)
+
+
+def _is_postgresql() -> bool:
+    return op.get_context().dialect.name == "postgresql"
+
+
+def create_index_concurrently(
+    index_name: str,
+    table_name: str,
+    columns: Sequence[Union[str, sa.TextClause, sa.Function[Any]]],
+    unique: bool = False,
+    **kw: Any,
+) -> None:
+    """
+    Create an index without blocking writes to the table.
+
+    On Postgres this runs ``CREATE INDEX CONCURRENTLY`` in an autocommit block,
+    since it cannot run in a transaction. A build that failed earlier leaves an
+    invalid index behind; it is dropped and built again. Elsewhere this is a
+    plain ``op.create_index``. Either way an existing index is kept, so a
+    revision that failed after this step can run again.
+
+    Args:
+        index_name: Name of the index
+        table_name: Table to index
+        columns: Column names or expressions, as for ``op.create_index``
+        unique: Whether to create a unique index
+        **kw: Passed on to ``op.create_index`` (e.g. ``postgresql_where``)
+    """
+    if not _is_postgresql():
+        op.create_index(
+            index_name, table_name, columns, unique=unique, if_not_exists=True, **kw
+        )
+        return
+
+    with op.get_context().autocommit_block():
+        valid = op.get_bind().scalar(
+            sa.text(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+            ),
+            {"name": index_name},
+        )
+        if valid is False:
+            logger.warning(f"Dropping invalid index {index_name} left by a failed build")
+            op.drop_index(
+                index_name,
+                table_name=table_name,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+        op.create_index(
+            index_name,
+            table_name,
+            columns,
+            unique=unique,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+            **kw,
+        )
+
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    """
+    Drop an index without blocking reads and writes of the table.
+
+    Like ``create_index_concurrently``, this runs outside the transaction on
+    Postgres and is a plain ``op.drop_index`` elsewhere.
+    """
+    if not _is_postgresql():
+        op.drop_index(index_name, table_name=table_name, if_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            index_name,
+            table_name=table_name,
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def _progress(connection: sa.Connection, name: str) -> Optional[sa.Row[Any]]:
+    return connection.execute(
+        sa.select(progress_table).where(progress_table.c.name == name)
+    ).first()
+
+
+def backfill(
+    name: str,
+    table_name: str,
+    values: Dict[str, Any],
+    where: Optional[sa.ColumnElement[bool]] = None,
+    key: str = "id",
+    batch_size: int = 1000,
+    pause: float = 0.1,
+) -> int:
+    """
+    Update every matching row of a table in batches, each its own transaction.
+
+    Rows are visited in ``key`` order. Each batch updates the next
+    ``batch_size`` rows and records the last key it reached in the same
+    transaction, then sleeps ``pause`` seconds so that replication and other
+    writers keep up. Running the revision again after an interruption resumes
+    after the last committed batch; once the backfill is complete it is not
+    run again.
+
+    What the revision did before the backfill is committed first, and the
+    batches commit independently of it: if a later step of the revision fails,
+    the backfilled values stay. ``values`` should therefore be
+    safe to apply twice, and ``where`` should select only rows that still need
+    the change (e.g. ``sa.column("email_lower").is_(None)``).
+
+    Args:
+        name: Unique name of the backfill, the key of its progress row
+        table_name: Table to update
+        values: Column name to value or SQL expression, as for ``update().values``
+        where: Additional condition on the rows to update
+        key: Integer column the batches are ordered by, usually the primary key
+        batch_size: Rows per batch
+        pause: Seconds to sleep between batches
+
+    Returns:
+        int: Rows updated by this run
+    """
+    if context.is_offline_mode():
+        raise RuntimeError(f"Backfill {name} needs a database connection, not --sql")
+
+    # The batches run on connections of their own; commit what the revision did
+    # so far, or its locks (e.g. from add_column) would block them
+    with op.get_context().autocommit_block():
+        return _backfill(
+            op.get_bind().engine, name, table_name, values, where, key, batch_size, pause
+        )
+
+
+def _backfill(
+    db_engine: sa.Engine,
+    name: str,
+    table_name: str,
+    values: Dict[str, Any],
+    where: Optional[sa.ColumnElement[bool]],
+    key: str,
+    batch_size: int,
+    pause: float,
+) -> int:
+    key_column = sa.column(key, sa.BigInteger)
+    table = sa.table(table_name, key_column, *(sa.column(c) for c in values))
+
+    with db_engine.begin() as connection:
+        progress_table.create(connection, checkfirst=True)
+        row = _progress(connection, name)
+        if row is None:
+            connection.execute(
+                sa.insert(progress_table).values(name=name, updated_at=sa.func.now())
+            )
+        elif row.completed_at is not None:
+            logger.info(f"Backfill {name} already completed, skipping")
+            return 0
+    last_key = row.last_key if row is not None else None
+    rows_done = row.rows_done if row is not None else 0
+    if last_key is not None:
+        logger.info(f"Backfill {name} resuming after {key} {last_key}")
+
+    started = time.monotonic()
+    updated = 0
+    while True:
+        with db_engine.begin() as connection:
+            batch = sa.select(key_column).select_from(table).order_by(key_column)
+            if last_key is not None:
+                batch = batch.where(key_column > last_key)
+            if where is not None:
+                batch = batch.where(where)
+            keys: List[int] = list(connection.scalars(batch.limit(batch_size)))
+
+            if keys:
+                stmt = sa.update(table).where(key_column.in_(keys)).values(values)
+                if where is not None:
+                    stmt = stmt.where(where)
+                count = connection.execute(stmt).rowcount
+                last_key = keys[-1]
+                rows_done += count
+                updated += count
+            connection.execute(
+                sa.update(progress_table)
+                .where(progress_table.c.name == name)
+                .values(
+                    last_key=last_key,
+                    rows_done=rows_done,
+                    updated_at=sa.func.now(),
+                    completed_at=sa.func.now() if len(keys) < batch_size else None,
+                )
+            )
+
+        if len(keys) < batch_size:
+            break
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Backfill {name}: {rows_done} rows, up to {key} {last_key} "
+            f"({updated / max(elapsed, 1e-6):.0f} rows/s)"
+        )
+        time.sleep(pause)
+
+    logger.info(f"Backfill {name} completed: {rows_done} rows")
+    return updated
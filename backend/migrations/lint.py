@@ -0,0 +1,208 @@
+"""
+Lint Alembic revisions for operations that block a large table.
+
+Flags the operations in ``upgrade()`` that take a lock for as long as they
+read or rewrite a whole table on Postgres, with the online-safe alternative.
+Run it on new revisions before merging them:
+
+    python -m migrations.lint                    # every revision
+    python -m migrations.lint migrations/versions/1234_add_index.py
+
+Operations on a table created in the same ``upgrade()`` are not flagged: the
+table is still empty. A reviewed operation is accepted with a
+``# migration-lint: ignore`` comment on its line. Exits with status 1 when
+something is flagged.
+"""
+
+import argparse
+import ast
+import re
+import sys
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+VERSIONS_DIR = Path(__file__).parent / "versions"
+IGNORE_COMMENT = "migration-lint: ignore"
+
+# Position of the table name in the arguments of the checked operations
+TABLE_ARGUMENT = {
+    "create_index": (1, "table_name"),
+    "drop_index": (1, "table_name"),
+    "add_column": (0, "table_name"),
+    "alter_column": (0, "table_name"),
+    "create_foreign_key": (1, "source_table"),
+    "create_check_constraint": (1, "table_name"),
+    "create_unique_constraint": (1, "table_name"),
+    "create_primary_key": (1, "table_name"),
+}
+
+# Raw SQL in op.execute(): pattern, code and message
+SQL_RULES = [
+    (
+        re.compile(r"\bCREATE\s+(UNIQUE\s+)?INDEX\b(?!\s+CONCURRENTLY)", re.I),
+        "MIG001",
+        "CREATE INDEX blocks writes, use create_index_concurrently()",
+    ),
+    (
+        re.compile(r"\bDROP\s+INDEX\b(?!\s+CONCURRENTLY)", re.I),
+        "MIG002",
+        "DROP INDEX blocks the table, use drop_index_concurrently()",
+    ),
+    (
+        re.compile(r"^\s*(UPDATE|DELETE)\b", re.I | re.M),
+        "MIG008",
+        "UPDATE/DELETE of a whole table holds its row locks, use backfill()",
+    ),
+    (
+        re.compile(r"\b(LOCK\s+TABLE|VACUUM\s+FULL|CLUSTER)\b", re.I),
+        "MIG009",
+        "takes an ACCESS EXCLUSIVE lock on the table",
+    ),
+]
+
+
+class Finding(NamedTuple):
+    path: Path
+    line: int
+    code: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line}: {self.code} {self.message}"
+
+
+def _keyword(call: ast.Call, name: str) -> Optional[ast.expr]:
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def _is_true(node: Optional[ast.expr]) -> bool:
+    return isinstance(node, ast.Constant) and node.value is True
+
+
+def _is_false(node: Optional[ast.expr]) -> bool:
+    return isinstance(node, ast.Constant) and node.value is False
+
+
+def _table_name(operation: str, call: ast.Call) -> Optional[str]:
+    if operation not in TABLE_ARGUMENT:
+        return None
+    position, name = TABLE_ARGUMENT[operation]
+    node = call.args[position] if len(call.args) > position else _keyword(call, name)
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def _sql_text(call: ast.Call) -> Optional[str]:
+    # op.execute("...") or op.execute(sa.text("..."))
+    if not call.args:
+        return None
+    arg = call.args[0]
+    if isinstance(arg, ast.Call) and arg.args:
+        arg = arg.args[0]
+    if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+        return arg.value
+    return None
+
+
+def check_operation(operation: str, call: ast.Call) -> Iterator[Tuple[str, str]]:
+    """Yield ``(code, message)`` for a blocking ``op.<operation>(...)`` call."""
+    if operation == "create_index":
+        if not _is_true(_keyword(call, "postgresql_concurrently")):
+            yield "MIG001", "create_index blocks writes, use create_index_concurrently()"
+    elif operation == "drop_index":
+        if not _is_true(_keyword(call, "postgresql_concurrently")):
+            yield "MIG002", "drop_index blocks the table, use drop_index_concurrently()"
+    elif operation == "add_column":
+        column = call.args[1] if len(call.args) > 1 else _keyword(call, "column")
+        if (
+            isinstance(column, ast.Call)
+            and _is_false(_keyword(column, "nullable"))
+            and _keyword(column, "server_default") is None
+        ):
+            yield "MIG003", (
+                "NOT NULL column without server_default fails on existing rows; "
+                "add it nullable, backfill(), then set NOT NULL"
+            )
+    elif operation == "alter_column":
+        if _keyword(call, "type_") is not None:
+            yield "MIG004", "changing the type rewrites the table under an exclusive lock"
+        if _is_false(_keyword(call, "nullable")):
+            yield "MIG005", (
+                "SET NOT NULL scans the table under an exclusive lock; add a CHECK "
+                "constraint NOT VALID and validate it first"
+            )
+    elif operation in ("create_foreign_key", "create_check_constraint"):
+        if not _is_true(_keyword(call, "postgresql_not_valid")):
+            yield "MIG006", (
+                f"{operation} validates every row under lock, pass "
+                "postgresql_not_valid=True and VALIDATE CONSTRAINT separately"
+            )
+    elif operation in ("create_unique_constraint", "create_primary_key"):
+        yield "MIG007", (
+            f"{operation} builds its index under lock; build a unique index with "
+            "create_index_concurrently() and add the constraint USING INDEX"
+        )
+    elif operation == "execute":
+        sql = _sql_text(call)
+        if sql is not None:
+            for pattern, code, message in SQL_RULES:
+                if pattern.search(sql):
+                    yield code, message
+
+
+def lint_revision(path: Path) -> List[Finding]:
+    """Check the ``upgrade()`` of one revision file."""
+    source = path.read_text()
+    lines = source.splitlines()
+    findings = []
+    for node in ast.parse(source, filename=str(path)).body:
+        if not (isinstance(node, ast.FunctionDef) and node.name == "upgrade"):
+            continue
+        calls = [
+            (call.func.attr, call)
+            for call in ast.walk(node)
+            if isinstance(call, ast.Call)
+            and isinstance(call.func, ast.Attribute)
+            and isinstance(call.func.value, ast.Name)
+            and call.func.value.id == "op"
+        ]
+        new_tables = {
+            call.args[0].value
+            for operation, call in calls
+            if operation == "create_table"
+            and call.args
+            and isinstance(call.args[0], ast.Constant)
+        }
+        for operation, call in calls:
+            if IGNORE_COMMENT in lines[call.lineno - 1]:
+                continue
+            if _table_name(operation, call) in new_tables:
+                continue
+            for code, message in check_operation(operation, call):
+                findings.append(Finding(path, call.lineno, code, message))
+    return findings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point for the revision lint.
+    """
+    parser = argparse.ArgumentParser(description="Lint revisions for blocking operations")
+    parser.add_argument(
+        "paths", nargs="*", type=Path, help="Revision files, every revision by default"
+    )
+    args = parser.parse_args(argv)
+
+    paths = args.paths or sorted(VERSIONS_DIR.glob("*.py"))
+    findings = [finding for path in paths for finding in lint_revision(path)]
+    for finding in findings:
+        print(finding)
+    return 1 if findings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Shared fixtures of the test suite.
+
+Settings are read from the environment when ``app`` is first imported, so the
+defaults below are set before anything imports it. Tests run against a SQLite
+database in a temporary directory and without the application lifespan (no
+Redis, no background workers); tests that need a worker start it themselves.
+"""
+
+import os
+import tempfile
+from typing import Callable, Dict, Iterator
+
+import pytest
+
+_test_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_test_dir}/test.db")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-0123456789abcdef0123456789")
+os.environ.setdefault("FIRST_SUPERUSER_EMAIL", "admin@example.com")
+os.environ.setdefault("FIRST_SUPERUSER_PASSWORD", "Passw0rd!")
+
+from app.auth.utils import generate_access_token  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.core.response_cache import response_cache  # noqa: E402
+from app.main import app  # noqa: E402
+from app.user.models.user import User  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+# Creates a user in the test database
+UserFactory = Callable[..., User]
+
+
+@pytest.fixture
+def db() -> Iterator[Session]:
+    """A session on a freshly created schema."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db: Session) -> TestClient:
+    """A client of the application, without its lifespan."""
+    # Responses cached by an earlier test describe another database
+    response_cache._entries.clear()
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_user(db: Session) -> UserFactory:
+    def make_user(username: str, **fields: object) -> User:
+        values: Dict[str, object] = {
+            "email": f"{username}@example.com",
+            "fullname": username.title(),
+            # Never checked: tests authenticate with auth_headers
+            "hashed_password": "x",
+            **fields,
+        }
+        user = User(username=username, **values)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+
+    return make_user
+
+
+def auth_headers(user: User) -> Dict[str, str]:
+    """Bearer token headers of a user, as issued by a login."""
+    token = generate_access_token({"sub": user.username})
+    return {"Authorization": f"Bearer {token.access_token}"}
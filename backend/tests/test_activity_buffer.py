@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+import pytest
+from app.core.database import engine
+from app.user.services.activity_service import ActivityBuffer, PendingActivity
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from tests.conftest import UserFactory
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def at(minutes: int) -> datetime:
+    return T0 + timedelta(minutes=minutes)
+
+
+@pytest.fixture
+def buffer() -> ActivityBuffer:
+    return ActivityBuffer({"0": engine}, interval=60, max_batch=2)
+
+
+def test_activity_is_coalesced_and_written(
+    buffer: ActivityBuffer, db: Session, make_user: UserFactory
+) -> None:
+    alice, bob = make_user("alice"), make_user("bob")
+    buffer.record_login(alice.id)
+    buffer.record_seen(alice.id)
+    buffer.record_seen(bob.id)
+    assert len(buffer._pending) == 2
+
+    buffer.run_once()
+    assert buffer._pending == {}
+
+    db.expire_all()
+    assert alice.last_login_at is not None
+    assert alice.last_seen_at is not None and alice.last_seen_at >= alice.last_login_at
+    assert bob.last_login_at is None and bob.last_seen_at is not None
+
+
+def test_failed_flush_requeues_every_unwritten_batch(
+    buffer: ActivityBuffer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    buffer._pending = {user_id: (None, at(user_id)) for user_id in range(1, 6)}
+    written: List[List[Tuple[int, PendingActivity]]] = []
+
+    def flush(db_engine: Engine, batch: List[Tuple[int, PendingActivity]]) -> None:
+        if written:
+            raise RuntimeError("database unavailable")
+        written.append(batch)
+
+    monkeypatch.setattr(buffer, "flush", flush)
+    with pytest.raises(RuntimeError):
+        buffer.run_once()
+
+    # The first batch of two was written, the failed one and the last are kept
+    assert [user_id for user_id, _ in written[0]] == [1, 2]
+    assert buffer._pending == {3: (None, at(3)), 4: (None, at(4)), 5: (None, at(5))}
+
+
+def test_requeue_keeps_the_newest_timestamps(buffer: ActivityBuffer) -> None:
+    # Recorded while the failed flush was running
+    buffer._pending = {1: (None, at(10)), 2: (at(10), at(10))}
+    buffer._requeue([(1, (at(5), at(5))), (2, (at(5), at(20))), (3, (at(1), at(1)))])
+
+    assert buffer._pending == {
+        1: (at(5), at(10)),
+        2: (at(10), at(20)),
+        3: (at(1), at(1)),
+    }
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List
+
+import pytest
+from app.audit.models.audit_event import AuditEvent
+from app.audit.services.audit_service import AuditEventType, AuditWriter
+from app.core.database import engine
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+def make_writer(buffer_size: int = 2, backpressure_timeout: float = 1.0) -> AuditWriter:
+    return AuditWriter(
+        engine,
+        interval=60,
+        batch_size=2,
+        buffer_size=buffer_size,
+        backpressure_timeout=backpressure_timeout,
+    )
+
+
+def fill(writer: AuditWriter) -> None:
+    while len(writer._buffer) < writer.buffer_size:
+        writer.record(AuditEventType.LOGIN)
+
+
+def test_events_are_written_in_batches(db: Session) -> None:
+    writer = make_writer(buffer_size=10)
+    for user_id in range(5):
+        assert writer.record(AuditEventType.LOGIN, actor_id=user_id, details={"n": 1})
+    writer.run_once()
+
+    events = db.scalars(select(AuditEvent).order_by(AuditEvent.id)).all()
+    assert [event.actor_id for event in events] == list(range(5))
+    assert events[0].details == {"n": 1}
+    assert writer._buffer == []
+
+
+def test_full_buffer_makes_the_event_loop_wait_for_room(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    writer = make_writer(backpressure_timeout=5.0)
+    monkeypatch.setattr(writer, "write", lambda events: None)
+    fill(writer)
+    run_once = writer.run_once
+
+    def slow_run_once() -> None:
+        time.sleep(0.05)
+        run_once()
+
+    monkeypatch.setattr(writer, "run_once", slow_run_once)
+
+    async def record_from_endpoint() -> bool:
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticker = asyncio.create_task(tick())
+        # wait_for_room wakes the writer, which makes room from its own thread
+        assert await writer.wait_for_room()
+        ticker.cancel()
+        assert ticks > 0  # the loop kept running while the endpoint waited
+        return writer.record(AuditEventType.LOGIN)
+
+    writer.start()
+    try:
+        assert asyncio.run(record_from_endpoint()) is True
+    finally:
+        writer.stop(flush=False)
+    assert writer._room_waiters == []
+
+
+def test_event_is_dropped_only_after_the_wait_times_out() -> None:
+    writer = make_writer(backpressure_timeout=0.05)
+    fill(writer)
+
+    async def record_from_endpoint() -> bool:
+        # Nobody makes room: the writer thread is not running
+        assert await writer.wait_for_room() is False
+        return writer.record(AuditEventType.LOGIN)
+
+    started = time.monotonic()
+    assert asyncio.run(record_from_endpoint()) is False
+    assert 0.05 <= time.monotonic() - started < 1.0
+    assert len(writer._buffer) == writer.buffer_size
+
+
+def test_full_buffer_waits_for_room_on_a_thread(monkeypatch: pytest.MonkeyPatch) -> None:
+    writer = make_writer(backpressure_timeout=5.0)
+    monkeypatch.setattr(writer, "write", lambda events: None)
+    fill(writer)
+
+    results: List[bool] = []
+    caller = threading.Thread(
+        target=lambda: results.append(writer.record(AuditEventType.LOGIN))
+    )
+    caller.start()
+    time.sleep(0.05)
+    assert caller.is_alive()
+
+    writer.run_once()
+    caller.join(1)
+    assert results == [True]
+    assert len(writer._buffer) == 1
+
+
+def test_failed_write_requeues_the_unwritten_events(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    writer = make_writer(buffer_size=10)
+    for user_id in range(5):
+        writer.record(AuditEventType.LOGIN, actor_id=user_id)
+    written: List[List[Dict[str, Any]]] = []
+
+    def write(events: List[Dict[str, Any]]) -> None:
+        if written:
+            raise RuntimeError("database unavailable")
+        written.append(events)
+
+    monkeypatch.setattr(writer, "write", write)
+    with pytest.raises(RuntimeError):
+        writer.run_once()
+    assert [event["actor_id"] for event in writer._buffer] == [2, 3, 4]
@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from tests.conftest import UserFactory, auth_headers
+
+
+def test_token_of_deleted_user_is_rejected(
+    client: TestClient, make_user: UserFactory
+) -> None:
+    admin = make_user("admin", is_superuser=True)
+    bob = make_user("bob")
+    headers = auth_headers(bob)
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 200
+
+    response = client.delete(f"/api/v1/users/{bob.id}", headers=auth_headers(admin))
+    assert response.status_code == 204
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 401
+
+
+def test_deactivated_user_token_stops_working(
+    client: TestClient, make_user: UserFactory
+) -> None:
+    admin = make_user("admin", is_superuser=True)
+    alice, bob = make_user("alice"), make_user("bob")
+    alice_headers, bob_headers = auth_headers(alice), auth_headers(bob)
+    assert client.get("/api/v1/users/me", headers=alice_headers).status_code == 200
+
+    response = client.patch(
+        "/api/v1/users/bulk",
+        json={"ids": [alice.id], "is_active": False},
+        headers=auth_headers(admin),
+    )
+    assert response.json() == {"updated": 1, "ids": [alice.id]}
+
+    # The token issued before the deactivation is refused from the next request on
+    response = client.get("/api/v1/users/me", headers=alice_headers)
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Inactive user"}
+    assert client.get("/api/v1/users/me", headers=bob_headers).status_code == 200
+
+    client.patch(
+        "/api/v1/users/bulk",
+        json={"ids": [alice.id], "is_active": True},
+        headers=auth_headers(admin),
+    )
+    assert client.get("/api/v1/users/me", headers=alice_headers).status_code == 200
+
+
+def test_invalid_token_is_rejected(client: TestClient) -> None:
+    response = client.get("/api/v1/users/me", headers={"Authorization": "Bearer nope"})
+    assert response.status_code == 401
@@ -0,0 +1,35 @@
+from typing import Any
+
+import pytest
+from app.core.config import Settings
+from pydantic import ValidationError
+
+POSTGRES_URL = "postgresql://app:secret@db/app"
+
+
+def make_settings(url: str = POSTGRES_URL, **overrides: Any) -> Settings:
+    return Settings(DATABASE_URL=url, **overrides)
+
+
+def test_default_pools_fit_the_budget() -> None:
+    settings = make_settings(DB_MAX_CONNECTIONS=60, WEB_CONCURRENCY=4)
+    assert settings.pool_connections(0.5) == 7
+
+
+def test_auth_and_bulk_shares_leave_room_for_the_default_pool() -> None:
+    with pytest.raises(ValidationError, match="must be below 1"):
+        make_settings(DB_AUTH_POOL_SHARE=0.6, DB_BULK_POOL_SHARE=0.5)
+    with pytest.raises(ValidationError, match="must be below 1"):
+        make_settings(DB_AUTH_POOL_SHARE=0.5, DB_BULK_POOL_SHARE=0.5)
+
+
+def test_pools_clamped_to_one_connection_must_fit_the_budget() -> None:
+    # 60 // 20 = 3 connections per worker for four pools of at least 1
+    with pytest.raises(ValidationError, match="need 4 connections"):
+        make_settings(DB_MAX_CONNECTIONS=60, WEB_CONCURRENCY=20)
+    # 60 // 12 = 5: the clamped pools take 2 + 1 + 1 + 1
+    make_settings(DB_MAX_CONNECTIONS=60, WEB_CONCURRENCY=12)
+
+
+def test_sqlite_is_not_sized_from_the_budget() -> None:
+    make_settings("sqlite:///app.db", DB_MAX_CONNECTIONS=1, WEB_CONCURRENCY=4)
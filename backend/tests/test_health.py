@@ -0,0 +1,79 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+import pytest
+from app.health.services import health_service
+from app.health.services.health_service import HealthMonitor
+from app.main import app
+from fastapi.testclient import TestClient
+
+
+class FakeRedis:
+    async def ping(self) -> bool:
+        return True
+
+
+def run_checks(
+    monkeypatch: pytest.MonkeyPatch,
+    saturation: Dict[str, float],
+    capacity: Optional[Dict[str, int]] = None,
+) -> HealthMonitor:
+    async def check_readiness(redis_connection: Any) -> Dict[str, bool]:
+        return {"database": True, "redis": True}
+
+    def pool_saturation(db_engine: str) -> Optional[float]:
+        return saturation[db_engine]
+
+    monkeypatch.setattr(health_service, "check_readiness", check_readiness)
+
+    def pool_capacity(db_engine: str) -> Optional[int]:
+        return (capacity or {}).get(db_engine, 10)
+
+    monkeypatch.setattr(health_service, "pool_saturation", pool_saturation)
+    monkeypatch.setattr(health_service, "pool_capacity", pool_capacity)
+    monkeypatch.setattr(health_service, "engines", {name: name for name in saturation})
+
+    monitor = HealthMonitor()
+    monitor._redis = FakeRedis()
+    asyncio.run(monitor.run_checks())
+    return monitor
+
+
+def test_saturated_bulk_pools_only_warn(monkeypatch: pytest.MonkeyPatch) -> None:
+    monitor = run_checks(
+        monkeypatch, {"auth": 0.1, "default": 0.5, "bulk": 1.0, "bulk_shard1": 0.95}
+    )
+    assert monitor.healthy
+    body = json.loads(monitor.body)
+    assert body["status"] == "ok"
+    assert body["checks"]["db_pool_bulk"] == {"ok": False, "value": 1.0, "advisory": True}
+    assert "advisory" not in body["checks"]["db_pool_auth"]
+
+
+@pytest.mark.parametrize("pool", ["auth", "default", "default_shard1"])
+def test_saturated_request_pools_fail_readiness(
+    monkeypatch: pytest.MonkeyPatch, pool: str
+) -> None:
+    monitor = run_checks(monkeypatch, {"bulk": 0.1, pool: 0.95})
+    assert not monitor.healthy
+    assert json.loads(monitor.body)["status"] == "degraded"
+
+
+def test_saturated_small_pools_only_warn(monkeypatch: pytest.MonkeyPatch) -> None:
+    # One login in flight fills an auth pool of one connection
+    monitor = run_checks(
+        monkeypatch, {"auth": 1.0, "default": 0.5}, capacity={"auth": 1, "default": 7}
+    )
+    assert monitor.healthy
+    assert json.loads(monitor.body)["checks"]["db_pool_auth"]["advisory"] is True
+
+    monitor = run_checks(monkeypatch, {"auth": 1.0}, capacity={"auth": 4})
+    assert not monitor.healthy
+
+
+def test_readiness_before_startup() -> None:
+    # Without the lifespan the application never becomes ready
+    response = TestClient(app).get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"status": "not ready"}
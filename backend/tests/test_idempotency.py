@@ -0,0 +1,122 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+from app.core.idempotency import (
+    MemoryIdempotencyStore,
+    RedisIdempotencyStore,
+    StoredResponse,
+)
+from app.user.models.user import User
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+RESPONSE = StoredResponse(201, b'{"id":1}', "fingerprint")
+
+
+def test_waiters_get_the_owners_response() -> None:
+    async def scenario() -> List[Optional[StoredResponse]]:
+        store = MemoryIdempotencyStore(ttl=60)
+        assert await store.begin("key", timeout=1) is None
+
+        waiters = [asyncio.create_task(store.begin("key", timeout=1)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert not any(waiter.done() for waiter in waiters)
+
+        await store.complete("key", RESPONSE)
+        return list(await asyncio.gather(*waiters))
+
+    assert asyncio.run(scenario()) == [RESPONSE] * 3
+
+
+def test_released_key_is_taken_over_by_one_waiter() -> None:
+    async def scenario() -> List[Optional[StoredResponse]]:
+        store = MemoryIdempotencyStore(ttl=60)
+        assert await store.begin("key", timeout=1) is None
+        waiters = [asyncio.create_task(store.begin("key", timeout=0.2)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        # The owner failed: one waiter runs the handler, the other waits for it
+        await store.release("key")
+        owner = await asyncio.wait_for(asyncio.shield(waiters[0]), 0.1)
+        assert owner is None
+        await store.complete("key", RESPONSE)
+        return [owner, await waiters[1]]
+
+    assert asyncio.run(scenario()) == [None, RESPONSE]
+
+
+def test_waiter_times_out_with_409() -> None:
+    async def scenario() -> None:
+        store = MemoryIdempotencyStore(ttl=60)
+        await store.begin("key", timeout=1)
+        await store.begin("key", timeout=0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(scenario())
+    assert exc_info.value.status_code == 409
+
+
+def test_recorded_responses_expire_and_are_bounded(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def scenario() -> None:
+        store = MemoryIdempotencyStore(ttl=60, max_entries=2)
+        for key in ("a", "b", "c"):
+            await store.begin(key, timeout=1)
+            await store.complete(key, RESPONSE)
+        # Oldest entry evicted: its key runs again
+        assert await store.begin("a", timeout=1) is None
+        assert await store.begin("c", timeout=1) == RESPONSE
+
+        now = asyncio.get_running_loop().time()
+        monkeypatch.setattr("app.core.idempotency.time.monotonic", lambda: now + 3600)
+        assert await store.begin("c", timeout=1) is None
+
+    asyncio.run(scenario())
+
+
+def test_redis_store_shares_responses_between_stores() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def scenario() -> None:
+        redis_connection = fakeredis.FakeAsyncRedis()
+        first = RedisIdempotencyStore(redis_connection, ttl=60, lock_timeout=5)
+        second = RedisIdempotencyStore(redis_connection, ttl=60, lock_timeout=5)
+
+        assert await first.begin("key", timeout=1) is None
+        waiter = asyncio.create_task(second.begin("key", timeout=1))
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+        await first.complete("key", RESPONSE)
+        assert await waiter == RESPONSE
+
+        assert await first.begin("other", timeout=1) is None
+        await first.release("other")
+        assert await second.begin("other", timeout=1) is None
+
+    asyncio.run(scenario())
+
+
+def test_register_is_replayed_for_the_same_key(client: TestClient, db: Session) -> None:
+    payload = {
+        "email": "erin@example.com",
+        "username": "erin",
+        "fullname": "Erin Example",
+        "password": "Passw0rd!",
+    }
+    headers = {"Idempotency-Key": "register-erin"}
+    first = client.post("/api/v1/auth/register", json=payload, headers=headers)
+    second = client.post("/api/v1/auth/register", json=payload, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.content == first.content
+    assert db.scalar(select(func.count()).select_from(User)) == 1
+
+    reused = client.post(
+        "/api/v1/auth/register", json={**payload, "username": "erin2"}, headers=headers
+    )
+    assert reused.status_code == 422
@@ -0,0 +1,46 @@
+import os
+from typing import List
+
+import pytest
+from app.core.importtime import ImportTiming, profile_imports
+
+# Generous enough for a loaded CI runner; lower it locally with
+# IMPORT_TIME_BUDGET_MS to catch smaller regressions
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "1500"))
+
+# Imported on first use only, never by importing the application; the process
+# launcher imports the application, not the reverse, and the lifespan starts
+# the memory diagnostics
+LAZY_MODULES = (
+    "asyncpg",
+    "brotli",
+    "zstandard",
+    "app.core.server",
+    "app.diagnostics.services.memory_service",
+    "tracemalloc",
+)
+
+
+@pytest.fixture(scope="module")
+def timings() -> List[ImportTiming]:
+    return profile_imports("app.main")
+
+
+def test_import_within_budget(timings: List[ImportTiming]) -> None:
+    total = next(t for t in reversed(timings) if t.module == "app.main")
+    assert total.cumulative_us / 1000 <= IMPORT_TIME_BUDGET_MS, (
+        f"importing app.main took {total.cumulative_us / 1000:.0f} ms, "
+        f"budget {IMPORT_TIME_BUDGET_MS:.0f} ms"
+    )
+
+
+def test_optional_modules_are_not_imported(timings: List[ImportTiming]) -> None:
+    imported = {timing.module for timing in timings}
+    assert imported.isdisjoint(LAZY_MODULES)
+
+
+def test_main_reports_budget_exceeded(capsys: pytest.CaptureFixture[str]) -> None:
+    from app.core.importtime import main
+
+    assert main(["--module", "json", "--top", "1", "--budget-ms", "0"]) == 1
+    assert "budget of 0 ms exceeded" in capsys.readouterr().out
@@ -0,0 +1,145 @@
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from app.diagnostics.services import memory_service
+from app.diagnostics.services.memory_service import (
+    MemoryMonitor,
+    TracingDisabled,
+    memory_monitor,
+    module_name,
+)
+from fastapi.testclient import TestClient
+from tests.conftest import UserFactory, auth_headers
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def monitor(tmp_path: Path) -> Iterator[MemoryMonitor]:
+    monitor = MemoryMonitor(
+        interval=60,
+        tracemalloc_frames=1,
+        dump_growth_bytes=10 * MB,
+        dump_dir=str(tmp_path),
+        max_dump_files=2,
+    )
+    yield monitor
+    monitor.stop_tracing()
+
+
+def set_rss(monkeypatch: pytest.MonkeyPatch, rss: int) -> None:
+    monkeypatch.setattr(memory_service, "current_rss_bytes", lambda: rss)
+
+
+def test_module_name_groups_by_package() -> None:
+    assert module_name(memory_service.__file__, 2) == "app.diagnostics"
+    assert module_name(memory_service.__file__, 10) == (
+        "app.diagnostics.services.memory_service"
+    )
+    assert module_name("<string>", 3) == "<string>"
+
+
+def test_allocations_are_compared_with_the_baseline(monitor: MemoryMonitor) -> None:
+    with pytest.raises(TracingDisabled):
+        monitor.allocations()
+
+    monitor.take_baseline()
+    assert monitor.tracing
+    retained: List[bytes] = [bytes(1000) + bytes([n % 256]) for n in range(2000)]
+    report = monitor.allocations(depth=1)
+    growth = {diff.module: diff.size_diff_bytes for diff in report.modules}
+    assert growth.get("tests", 0) >= 1000 * len(retained)
+
+    monitor.stop_tracing()
+    assert not tracemalloc.is_tracing()
+    with pytest.raises(TracingDisabled):
+        monitor.allocations()
+
+
+def test_object_histogram_reports_the_change(monitor: MemoryMonitor) -> None:
+    monitor.object_histogram()
+
+    class Leak:
+        pass
+
+    leaked = [Leak() for _ in range(500)]
+    counts = {item.type: item for item in monitor.object_histogram(limit=100000).types}
+    leak = counts[f"{Leak.__module__}.{Leak.__qualname__}"]
+    assert leak.count == len(leaked) and leak.count_diff == len(leaked)
+
+
+def test_rss_growth_dumps_once_per_step(
+    monitor: MemoryMonitor, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    set_rss(monkeypatch, 100 * MB)
+    monitor.start()
+    monitor.stop(flush=False)
+
+    set_rss(monkeypatch, 125 * MB)
+    monitor.run_once()
+    set_rss(monkeypatch, 129 * MB)
+    monitor.run_once()
+    reports = sorted(tmp_path.glob("memory-*-threshold.json"))
+    assert len(reports) == 1
+    report = json.loads(reports[0].read_text())
+    assert report["status"]["rss_growth_bytes"] == 25 * MB
+
+    # The next dump comes after another full step of growth
+    set_rss(monkeypatch, 131 * MB)
+    monitor.run_once()
+    assert len(list(tmp_path.glob("memory-*-threshold.json"))) == 2
+    assert monitor.peak_rss == 131 * MB
+
+
+def test_dumps_are_rotated(monitor: MemoryMonitor, tmp_path: Path) -> None:
+    monitor.take_baseline()
+    dumps = []
+    for _ in range(3):
+        dumps.append(monitor.dump())
+        time.sleep(0.01)  # dump names have millisecond resolution
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        Path(name).name
+        for dump in dumps[1:]
+        for name in (dump.report, dump.snapshot)
+        if name is not None
+    )
+    snapshot = dumps[-1].snapshot
+    assert snapshot is not None
+    assert tracemalloc.Snapshot.load(snapshot).traces is not None
+    assert monitor.status().dumps == [Path(dump.report).name for dump in dumps[1:]]
+
+
+def test_diagnostics_routes(client: TestClient, make_user: UserFactory) -> None:
+    admin, user = make_user("admin", is_superuser=True), make_user("user")
+    headers = auth_headers(admin)
+    try:
+        assert (
+            client.get("/api/v1/diagnostics/memory", headers=auth_headers(user))
+        ).status_code == 403
+        status = client.get("/api/v1/diagnostics/memory", headers=headers).json()
+        assert status["rss_bytes"] > 0 and status["tracing"] is False
+
+        response = client.get("/api/v1/diagnostics/memory/allocations", headers=headers)
+        assert response.status_code == 409
+
+        response = client.post("/api/v1/diagnostics/memory/baseline", headers=headers)
+        assert response.json()["tracing"] is True
+        response = client.get(
+            "/api/v1/diagnostics/memory/allocations?depth=2", headers=headers
+        )
+        assert response.status_code == 200 and response.json()["pid"] == status["pid"]
+        objects = client.get(
+            "/api/v1/diagnostics/memory/objects?limit=5", headers=headers
+        )
+        assert len(objects.json()["types"]) == 5
+
+        response = client.delete("/api/v1/diagnostics/memory/tracing", headers=headers)
+        assert response.status_code == 204
+        assert not tracemalloc.is_tracing()
+    finally:
+        memory_monitor.stop_tracing()
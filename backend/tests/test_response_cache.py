@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from app.core.response_cache import ResponseCache
+from fastapi.testclient import TestClient
+from tests.conftest import UserFactory, auth_headers
+
+
+def test_generation_bump_invalidates_the_namespace() -> None:
+    async def scenario() -> None:
+        cache = ResponseCache(max_entries=10, ttl=60)
+        renders = 0
+
+        def render() -> bytes:
+            nonlocal renders
+            renders += 1
+            return f"body {renders}".encode()
+
+        assert await cache.get_or_render("users", "limit=1", render) == (b"body 1", False)
+        assert await cache.get_or_render("users", "limit=1", render) == (b"body 1", True)
+        # Other parameters and other namespaces have entries of their own
+        assert await cache.get_or_render("users", "limit=2", render) == (b"body 2", False)
+        assert await cache.get_or_render("todos", "limit=1", render) == (b"body 3", False)
+
+        cache.bump_generation("users")
+        assert await cache.get_or_render("users", "limit=1", render) == (b"body 4", False)
+        assert await cache.get_or_render("todos", "limit=1", render) == (b"body 3", True)
+
+    asyncio.run(scenario())
+
+
+def test_body_rendered_during_a_write_is_not_stored() -> None:
+    async def scenario() -> None:
+        cache = ResponseCache(max_entries=10, ttl=60)
+
+        def render_racing_a_write() -> bytes:
+            cache.bump_generation("users")
+            return b"stale"
+
+        await cache.get_or_render("users", "", render_racing_a_write)
+        body, hit = await cache.get_or_render("users", "", lambda: b"fresh")
+        assert (body, hit) == (b"fresh", False)
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire_and_are_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def scenario() -> None:
+        cache = ResponseCache(max_entries=2, ttl=5)
+        for params in ("a", "b", "c"):
+            await cache.get_or_render("users", params, lambda: b"old")
+        # "a" was evicted, "c" is still there until its TTL passes
+        assert await cache.get_or_render("users", "a", lambda: b"new") == (b"new", False)
+        assert await cache.get_or_render("users", "c", lambda: b"new") == (b"old", True)
+
+        now = asyncio.get_running_loop().time()
+        monkeypatch.setattr("app.core.response_cache.time.monotonic", lambda: now + 10)
+        assert await cache.get_or_render("users", "c", lambda: b"new") == (b"new", False)
+
+    asyncio.run(scenario())
+
+
+def test_redis_generations_are_shared_between_workers() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def scenario() -> None:
+        redis_connection = fakeredis.FakeAsyncRedis()
+        first, second = ResponseCache(10, 60), ResponseCache(10, 60)
+        first.configure(redis_connection)
+        second.configure(redis_connection)
+
+        await first.get_or_render("users", "", lambda: b"v1")
+        # Rendered by the first worker, served by the second
+        assert await second.get_or_render("users", "", lambda: b"v2") == (b"v1", True)
+
+        first.bump_generation("users")
+        await asyncio.sleep(0.05)  # the shared bump is scheduled on the loop
+        assert await second.get_or_render("users", "", lambda: b"v2") == (b"v2", False)
+
+    asyncio.run(scenario())
+
+
+def test_user_listing_is_cached_and_invalidated_by_writes(
+    client: TestClient, make_user: UserFactory
+) -> None:
+    admin = make_user("admin", is_superuser=True)
+    headers = auth_headers(admin)
+
+    first = client.get("/api/v1/users/", headers=headers)
+    assert first.headers["X-Cache"] == "MISS"
+    assert client.get("/api/v1/users/", headers=headers).headers["X-Cache"] == "HIT"
+    # todo_count is only part of the listing when asked for
+    assert "todo_count" not in first.json()[0]
+    counted = client.get("/api/v1/users/?with_todo_counts=true", headers=headers)
+    assert counted.json()[0]["todo_count"] == 0
+
+    response = client.put(
+        f"/api/v1/users/{admin.id}", json={"fullname": "Renamed"}, headers=headers
+    )
+    assert response.status_code == 200
+    after_write = client.get("/api/v1/users/", headers=headers)
+    assert after_write.headers["X-Cache"] == "MISS"
+    assert after_write.json()[0]["fullname"] == "Renamed"
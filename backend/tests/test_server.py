@@ -0,0 +1,100 @@
+from typing import Optional
+
+import pytest
+from app.core.server import WORKER_STABLE_UPTIME, Supervisor
+
+
+class FakeProcess:
+    """Stands in for a worker process; exits when told to."""
+
+    def __init__(self) -> None:
+        self.exitcode: Optional[int] = None
+        self.pid = 1000
+
+    def is_alive(self) -> bool:
+        return self.exitcode is None
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        pass
+
+
+class FakeSupervisor(Supervisor):
+    """Supervisor whose workers are fake processes started at ``clock``."""
+
+    clock = 0.0
+
+    def _spawn(self, slot: int) -> None:
+        self.processes[slot] = FakeProcess()  # type: ignore[assignment]
+        self.started_at[slot] = self.clock
+
+    def crash(self, now: float, exitcode: int = 1) -> None:
+        self.processes[0].exitcode = exitcode  # type: ignore[misc]
+        self.reap(now)
+
+    def restart(self, now: float) -> None:
+        self.clock = now
+        self.respawn(now)
+
+
+@pytest.fixture
+def supervisor() -> FakeSupervisor:
+    supervisor = FakeSupervisor(
+        "127.0.0.1",
+        0,
+        workers=1,
+        log_level="info",
+        restart_backoff=1.0,
+        restart_backoff_max=4.0,
+        max_consecutive_failures=5,
+    )
+    supervisor._spawn(0)
+    return supervisor
+
+
+def test_clean_exit_is_replaced_immediately(supervisor: FakeSupervisor) -> None:
+    supervisor.crash(now=10.0, exitcode=0)
+    assert supervisor.restart_at == {0: 10.0}
+    supervisor.restart(10.0)
+    assert 0 in supervisor.processes and not supervisor.restart_at
+
+
+def test_crash_backoff_doubles_up_to_the_maximum(supervisor: FakeSupervisor) -> None:
+    now = 0.0
+    delays = []
+    for _ in range(4):
+        supervisor.crash(now)
+        delays.append(supervisor.restart_at[0] - now)
+
+        # Not restarted before the backoff elapsed
+        supervisor.respawn(now)
+        assert 0 not in supervisor.processes
+        now = supervisor.restart_at[0]
+        supervisor.restart(now)
+    assert delays == [1.0, 2.0, 4.0, 4.0]
+
+
+def test_gives_up_after_consecutive_failures(supervisor: FakeSupervisor) -> None:
+    now = 0.0
+    for _ in range(4):
+        supervisor.crash(now)
+        now = supervisor.restart_at[0]
+        supervisor.restart(now)
+    assert not supervisor.should_exit.is_set()
+
+    supervisor.crash(now)
+    assert supervisor.should_exit.is_set()
+    assert supervisor.exit_code == 1
+    assert not supervisor.restart_at
+
+
+def test_stable_worker_clears_the_crash_count(supervisor: FakeSupervisor) -> None:
+    supervisor.crash(now=0.0)
+    now = supervisor.restart_at[0]
+    supervisor.restart(now)
+
+    now += WORKER_STABLE_UPTIME
+    supervisor.reap(now)
+    assert supervisor.failures[0] == 0
+
+    supervisor.crash(now + 1)
+    assert supervisor.restart_at[0] == now + 2
@@ -0,0 +1,58 @@
+from collections import Counter
+
+import pytest
+from app.core import database
+from app.core.database import (
+    SHARD_ID_STRIDE,
+    ShardRing,
+    shard_for_user_id,
+    shard_hint,
+    tag_user_id,
+)
+
+SHARDS = ["0", "1", "2"]
+
+
+@pytest.fixture
+def sharded(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(database, "SHARDING_ENABLED", True)
+    monkeypatch.setattr(database, "SHARD_IDS", SHARDS)
+    monkeypatch.setattr(database, "shard_ring", ShardRing(SHARDS, virtual_nodes=64))
+
+
+def test_ring_spreads_keys_and_moves_few_when_a_shard_is_added() -> None:
+    usernames = [f"user{index}" for index in range(3000)]
+    before = ShardRing(SHARDS, virtual_nodes=64)
+    placement = {name: before.shard_for(name) for name in usernames}
+    assert all(count > 600 for count in Counter(placement.values()).values())
+
+    after = ShardRing(SHARDS + ["3"], virtual_nodes=64)
+    moved = [name for name in usernames if after.shard_for(name) != placement[name]]
+    # Only keys now on the new shard move, about a quarter of them
+    assert {after.shard_for(name) for name in moved} == {"3"}
+    assert len(moved) < len(usernames) / 2
+
+
+def test_user_ids_carry_their_shard(sharded: None) -> None:
+    user_id = tag_user_id(5, "2")
+    assert user_id == 5 * SHARD_ID_STRIDE + 2
+    assert shard_for_user_id(user_id) == "2"
+    # Ids past 2**31 stay routable, hence the 64-bit id columns
+    assert shard_for_user_id(tag_user_id(2**40, "1")) == "1"
+    assert shard_for_user_id(tag_user_id(5, "7")) is None
+
+
+def test_shard_hint(sharded: None) -> None:
+    assert shard_hint(user_id=tag_user_id(1, "1")) == {"shard_id": "1"}
+    assert shard_hint(username="alice") == {
+        "shard_id": database.shard_ring.shard_for("alice")
+    }
+    # Unknown shard or no key: the statement runs on every shard
+    assert shard_hint(user_id=tag_user_id(1, "9")) is None
+    assert shard_hint() is None
+
+
+def test_unsharded_database_is_the_single_shard() -> None:
+    assert shard_for_user_id(12345) == database.SINGLE_SHARD_ID
+    assert shard_hint(user_id=12345) is None
+    assert database.user_engines("default") == {"0": database.engines["default"]}
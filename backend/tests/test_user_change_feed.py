@@ -0,0 +1,153 @@
+import asyncio
+import json
+from typing import List, Optional
+
+import pytest
+from app.core.database import engine
+from app.user.models.user_outbox import UserOutbox
+from app.user.services.change_feed_service import (
+    FeedEvent,
+    UserChangeRelay,
+    UserChangeType,
+    fetch_changes,
+    record_user_changes,
+    sequence_changes,
+)
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def relay(db: Session) -> UserChangeRelay:
+    return UserChangeRelay(
+        "0",
+        engine,
+        poll_interval=0.01,
+        safety_poll_interval=0.01,
+        batch_size=2,
+        queue_size=2,
+        max_subscribers=2,
+        keepalive=0.01,
+        retention_seconds=3600,
+    )
+
+
+def record(db: Session, *user_ids: int) -> None:
+    record_user_changes(
+        db,
+        UserChangeType.UPDATED,
+        [{"user_id": user_id, "payload": {"id": user_id}} for user_id in user_ids],
+    )
+
+
+def commit_changes(db: Session, *user_ids: int) -> None:
+    record(db, *user_ids)
+    db.commit()
+
+
+def test_changes_are_published_only_when_committed(
+    relay: UserChangeRelay, db: Session
+) -> None:
+    record(db, 1)
+    db.rollback()
+    commit_changes(db, 2, 3)
+
+    # Nothing is read before the rows have their position
+    assert fetch_changes(engine, 0, None, limit=10) == []
+    assert sequence_changes(engine, limit=10) == 2
+    events = fetch_changes(engine, 0, None, limit=10)
+    assert [event.id for event in events] == [1, 2]
+    assert [event.type for event in events] == [UserChangeType.UPDATED] * 2
+    assert '"user_id":2' in events[0].body
+
+    async def scenario() -> List[Optional[FeedEvent]]:
+        relay.last_id = 0
+        subscription = relay.subscribe()
+        assert subscription is not None
+        await relay.relay_pending()
+        assert relay.last_id == events[-1].id
+        return [subscription.queue.get_nowait() for _ in events]
+
+    assert asyncio.run(scenario()) == events
+
+
+def test_stream_replays_the_table_then_goes_live(
+    relay: UserChangeRelay, db: Session
+) -> None:
+    commit_changes(db, 1, 2, 3)
+
+    async def scenario() -> List[int]:
+        await asyncio.to_thread(sequence_changes, engine, 10)
+        relay.last_id = await asyncio.to_thread(relay.tail_id)
+        received: List[int] = []
+        stream = relay.events_after(0)
+        async for event in stream:
+            assert event is not None
+            received.append(event.id)
+            if len(received) == 3:
+                # Committed while the stream is open, relayed live
+                await asyncio.to_thread(commit_changes, db, 4)
+                await relay.relay_pending()
+            if len(received) == 4:
+                break
+        await stream.aclose()
+        return received
+
+    received = asyncio.run(scenario())
+    assert received == sorted(received)
+    assert len(set(received)) == 4
+    assert relay._subscribers == set()
+
+
+def test_slow_stream_is_dropped_and_catches_up(
+    relay: UserChangeRelay, db: Session
+) -> None:
+    async def scenario() -> None:
+        relay.last_id = 0
+        subscription = relay.subscribe()
+        assert subscription is not None
+        commit_changes(db, *range(1, 6))
+        await relay.relay_pending()
+        # queue_size is 2: the stream fell behind and reads the table instead
+        assert subscription.overflowed
+        assert subscription not in relay._subscribers
+        assert relay.last_id == 5
+        assert relay.cursor_expired(0) is False
+
+    asyncio.run(scenario())
+
+
+def test_late_commit_of_an_earlier_id_is_still_published(
+    relay: UserChangeRelay, db: Session
+) -> None:
+    outbox = UserOutbox.__table__
+
+    def commit_row(outbox_id: int, user_id: int) -> None:
+        db.execute(
+            insert(outbox).values(
+                id=outbox_id, event_type=UserChangeType.UPDATED, user_id=user_id
+            )
+        )
+        db.commit()
+
+    async def scenario() -> List[int]:
+        relay.last_id = 0
+        subscription = relay.subscribe()
+        assert subscription is not None
+        # Id 2 commits first, while the transaction that took id 1 is in flight
+        commit_row(2, user_id=2)
+        await relay.relay_pending()
+        commit_row(1, user_id=1)
+        await relay.relay_pending()
+
+        received = []
+        while not subscription.queue.empty():
+            event = subscription.queue.get_nowait()
+            assert event is not None
+            received.append(json.loads(event.body)["user_id"])
+        return received
+
+    # Published in commit order, the late one included, with increasing positions
+    assert asyncio.run(scenario()) == [2, 1]
+    assert [event.id for event in fetch_changes(engine, 0, None, limit=10)] == [1, 2]
+    assert relay.last_id == 2
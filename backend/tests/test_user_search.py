@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from typing import List, Union
+
+from app.user.models.user import User
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from tests.conftest import UserFactory, auth_headers
+
+
+def search(client: TestClient, user: User, **params: Union[str, int]) -> dict:
+    response = client.get(
+        "/api/v1/users/search", params=params, headers=auth_headers(user)
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def usernames(page: dict) -> List[str]:
+    return [item["username"] for item in page["items"]]
+
+
+def test_prefix_and_fullname_matches(client: TestClient, make_user: UserFactory) -> None:
+    admin = make_user("admin", is_superuser=True)
+    make_user("alice", fullname="Alice Liddell")
+    make_user("bob", email="ALBERT@example.com", fullname="Bob Stone")
+    make_user("carol", fullname="Carol Felicity")
+
+    # Prefix of a username or (case-insensitive) email, or part of a fullname
+    assert usernames(search(client, admin, q="AL")) == ["alice", "bob"]
+    assert usernames(search(client, admin, q="lic")) == ["alice", "carol"]
+    # LIKE wildcards in the query are literal
+    assert usernames(search(client, admin, q="%")) == []
+
+
+def test_cursor_pagination(client: TestClient, make_user: UserFactory) -> None:
+    admin = make_user("admin", is_superuser=True)
+    for n in range(5):
+        make_user(f"user{n}")
+
+    page = search(client, admin, q="user", limit=2)
+    seen = usernames(page)
+    while page["next_cursor"] is not None:
+        page = search(client, admin, q="user", limit=2, cursor=page["next_cursor"])
+        seen += usernames(page)
+    assert seen == [f"user{n}" for n in range(5)]
+
+
+def test_deleted_users_are_not_found(
+    client: TestClient, db: Session, make_user: UserFactory
+) -> None:
+    admin = make_user("admin", is_superuser=True)
+    make_user("dave", deleted_at=datetime.now(timezone.utc))
+    assert search(client, admin, q="dave")["items"] == []